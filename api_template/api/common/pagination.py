@@ -1,7 +1,17 @@
-from typing import Generic, List, TypeVar
+import base64
+import json
+import time
+from datetime import datetime
+from typing import Any, Generic, List, Optional, Sequence, Tuple, TypeVar
 
+from cachetools import TTLCache
 from fastapi import Query
 from pydantic import BaseModel
+from sqlalchemy import Select, func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.status import HTTP_400_BAD_REQUEST
+
+from api_template.api.common.errors import APIError
 
 T = TypeVar("T")
 
@@ -31,3 +41,120 @@ def paginate(items: List[T], paginator: Paginator, total: int) -> Page[T]:
         size=paginator.size,
         pages=(total + paginator.size - 1) // paginator.size,
     )
+
+
+class CursorPage(BaseModel, Generic[T]):
+    items: List[T]
+    size: int
+    # Cursor of the next page, None on the last page
+    next_cursor: Optional[str] = None
+    # Only when requested, and possibly estimated on large tables
+    total: Optional[int] = None
+
+    class Config:
+        arbitrary_types_allowed = True
+
+
+class CursorPaginator:
+    """
+    Keyset pagination parameters: the page after cursor (the first page without one), and
+    whether to include the total.
+    """
+
+    def __init__(
+        self,
+        cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+        size: int = Query(10, ge=1, le=100),
+        include_total: bool = Query(False),
+    ):
+        self.after = decode_cursor(cursor) if cursor else None
+        self.size = size
+        self.include_total = include_total
+
+
+class InvalidCursor(APIError):
+    def __init__(self):
+        super().__init__(status_code=HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """
+    Encodes the sort key of the last item of a page into an opaque, URL-safe cursor.
+    :param values: Sort key values, datetimes and JSON-serializable values.
+    :return:
+    """
+    encoded = [
+        {"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values
+    ]
+    data = json.dumps(encoded, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, ...]:
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(data)
+        if not isinstance(values, list):
+            raise ValueError(cursor)
+        return tuple(
+            datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+            for value in values
+        )
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor()
+
+
+def keyset_page(statement: Select, keyset: Sequence, after: Optional[Sequence], size: int):
+    """
+    Restricts a query to the page after the given sort key, ordered by keyset. The seek is a
+    row comparison, so an index on the keyset columns serves any page as fast as the first.
+    One more row than size is selected to tell whether there is a next page.
+    :param statement:
+    :param keyset: Columns of a unique sort key, e.g. (User.created_at, User.id).
+    :param after: Sort key of the last item of the previous page, or None for the first page.
+    :param size:
+    :return:
+    """
+    if after is not None:
+        if len(after) != len(keyset):
+            raise InvalidCursor()
+        statement = statement.where(tuple_(*keyset) > tuple_(*after))
+    return statement.order_by(*keyset).limit(size + 1)
+
+
+class TableCounter:
+    """
+    Row counts of whole tables, cached for ttl seconds. On PostgreSQL, tables with more than
+    exact_threshold rows are estimated from the planner statistics (pg_class.reltuples) instead
+    of counted, since COUNT(*) scans the whole table.
+    """
+
+    def __init__(self, ttl: float = 60.0, exact_threshold: int = 100_000, timer=time.monotonic):
+        self.exact_threshold = exact_threshold
+        self._cache = TTLCache(maxsize=256, ttl=ttl, timer=timer)
+
+    async def count(self, db: AsyncSession, model) -> int:
+        table = model.__table__
+        total = self._cache.get(table.name)
+        if total is None:
+            total = await self._estimate(db, table)
+            if total is None or total < self.exact_threshold:
+                total = await db.scalar(select(func.count()).select_from(table))
+            self._cache[table.name] = total
+        return total
+
+    async def _estimate(self, db: AsyncSession, table) -> Optional[int]:
+        if db.get_bind().dialect.name != "postgresql":
+            return None
+        # -1 until the table has been vacuumed or analyzed
+        estimate = await db.scalar(
+            text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:name)"),
+            {"name": table.fullname},
+        )
+        return estimate if estimate is not None and estimate >= 0 else None
+
+    def invalidate(self, model):
+        self._cache.pop(model.__table__.name, None)
+
+
+table_counter = TableCounter()
@@ -0,0 +1,21 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from api_template.api.common.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    values = (datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=timezone.utc), 42)
+
+    cursor = encode_cursor(values)
+
+    assert decode_cursor(cursor) == values
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor
+
+
+@pytest.mark.parametrize("cursor", ["not a cursor", "e30", "bnVsbA", "W3siZHQiOiJ4In1d"])
+def test_invalid_cursors(cursor):
+    with pytest.raises(InvalidCursor) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
@@ -1,34 +1,50 @@
 from datetime import datetime, timedelta
 from typing import Any, Optional
+from uuid import uuid4
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from api_template.api.v1.auth.password_hasher import password_hasher, pwd_context
+from api_template.api.v1.auth.revocation import token_revocations
+from api_template.api.v1.auth.token_cache import UserSnapshot, VerifiedToken, token_cache
 from api_template.api.v1.dependencies import get_db
 from api_template.api.v1.repositories.user_repository import UserRepository
 from api_template.api.v1.schemas.user_schemas import TokenData
 from api_template.config.security import security_settings
 from api_template.db.models.user import User
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# "type" claim of the tokens, so that a token is only accepted where its type is expected, even
+# when both types are signed with the same key
+TOKEN_TYPE_CLAIM = "type"
+ACCESS_TOKEN_TYPE = "access"
+REFRESH_TOKEN_TYPE = "refresh"
+
 
 async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> User:
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
+) -> UserSnapshot:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    # Tokens verified recently skip the signature check and the user query
+    verified = token_cache.get(token)
+    if verified is None:
+        verified = await _verify_token(token, db, credentials_exception)
+    if await token_revocations.is_revoked(verified.claims.get("jti")):
+        raise credentials_exception
+    return verified.user
+
+
+async def _verify_token(token: str, db: AsyncSession, credentials_exception) -> VerifiedToken:
     try:
-        payload = jwt.decode(
-            token, security_settings.SECRET_KEY, algorithms=[security_settings.ALGORITHM]
-        )
+        payload = decode_token(token, ACCESS_TOKEN_TYPE)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -39,10 +55,10 @@ async def get_current_user(
     user = await get_user(username=token_data.username, db=db)
     if user is None:
         raise credentials_exception
-    return user
+    return token_cache.put(token, payload, UserSnapshot.from_user(user))
 
 
-def require_auth(current_user: User = Depends(get_current_user)):
+def require_auth(current_user: UserSnapshot = Depends(get_current_user)):
     if not current_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -52,6 +68,7 @@ def require_auth(current_user: User = Depends(get_current_user)):
     return current_user
 
 
+# Blocking versions, async code must use password_hasher instead
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -69,7 +86,14 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
             minutes=security_settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
 
-    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
+    to_encode.update(
+        {
+            "exp": expire,
+            "iat": datetime.utcnow(),
+            "jti": uuid4().hex,
+            TOKEN_TYPE_CLAIM: ACCESS_TOKEN_TYPE,
+        }
+    )
     encoded_jwt = jwt.encode(
         to_encode, security_settings.SECRET_KEY, algorithm=security_settings.ALGORITHM
     )
@@ -79,42 +103,88 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=security_settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
+    to_encode.update(
+        {
+            "exp": expire,
+            "iat": datetime.utcnow(),
+            "jti": uuid4().hex,
+            TOKEN_TYPE_CLAIM: REFRESH_TOKEN_TYPE,
+        }
+    )
     encoded_jwt = jwt.encode(
-        to_encode, security_settings.REFRESH_SECRET_KEY, algorithm=security_settings.ALGORITHM
+        to_encode, _refresh_secret_key(), algorithm=security_settings.ALGORITHM
     )
     return encoded_jwt
 
 
-async def get_user(username: str, db: Session) -> Optional[User]:
+def _refresh_secret_key() -> str:
+    return security_settings.REFRESH_SECRET_KEY or security_settings.SECRET_KEY
+
+
+def decode_token(token: str, token_type: str) -> dict:
+    """
+    Verifies a token and returns its claims.
+    :param token:
+    :param token_type: ACCESS_TOKEN_TYPE or REFRESH_TOKEN_TYPE.
+    :return:
+    :raises JWTError: When the token is invalid, expired, or not of token_type.
+    """
+    secret_key = (
+        _refresh_secret_key() if token_type == REFRESH_TOKEN_TYPE else security_settings.SECRET_KEY
+    )
+    payload = jwt.decode(token, secret_key, algorithms=[security_settings.ALGORITHM])
+    if payload.get(TOKEN_TYPE_CLAIM) != token_type:
+        raise JWTError(f"Expected a token of type {token_type}")
+    return payload
+
+
+async def get_user(username: str, db: AsyncSession) -> Optional[User]:
     user_repo = UserRepository(db)
     return await user_repo.get_by_username(username)
 
 
-async def authenticate_user(username: str, password: str, db: Session) -> Optional[User]:
+async def authenticate_user(username: str, password: str, db: AsyncSession) -> Optional[User]:
     user = await get_user(username, db)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash:
+        # The hash was made with other parameters than the current ones
+        await UserRepository(db).set_password_hash(user, new_hash)
     return user
 
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
-    if current_user.disabled:
+async def get_current_active_user(
+    current_user: UserSnapshot = Depends(get_current_user),
+) -> UserSnapshot:
+    if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
 
-def validate_token(token: str) -> Optional[Any]:
+def validate_token(token: str, token_type: str = ACCESS_TOKEN_TYPE) -> Optional[Any]:
     try:
-        payload = jwt.decode(
-            token, security_settings.SECRET_KEY, algorithms=[security_settings.ALGORITHM]
-        )
-        return payload
+        return decode_token(token, token_type)
     except JWTError:
         return None
 
 
-async def revoke_token(token: str, db: Session):
-    pass
+async def revoke_token(token: str, refresh: bool = False) -> bool:
+    """
+    Revokes a token until it expires.
+    :param token:
+    :param refresh: Whether token is a refresh token.
+    :return: False when the token is invalid, expired, of the other type or has no jti.
+    """
+    try:
+        payload = decode_token(token, REFRESH_TOKEN_TYPE if refresh else ACCESS_TOKEN_TYPE)
+    except JWTError:
+        return False
+    if not payload.get("jti") or payload.get("exp") is None:
+        return False
+
+    await token_revocations.revoke(payload["jti"], payload["exp"])
+    token_cache.invalidate(token)
+    return True
@@ -0,0 +1,112 @@
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from api_template.config.security import security_settings
+
+
+class PasswordHasherBusy(HTTPException):
+    def __init__(self, retry_after: int = 1):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many password operations in progress",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification in a bounded worker pool, so that bcrypt (about
+    100 ms per call at the default cost) never blocks the event loop. bcrypt releases the GIL,
+    so threads hash in parallel.
+
+    At most max_pending operations are running or queued; further callers wait up to
+    queue_timeout seconds for a slot, then get a PasswordHasherBusy (503) error.
+    """
+
+    def __init__(
+        self,
+        context: CryptContext,
+        max_workers: int = 2,
+        max_pending: int = 32,
+        queue_timeout: float = 5.0,
+        executor: Executor = None,
+    ):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="password-hasher"
+        )
+        self._loop = None
+        self._semaphore = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # A semaphore is bound to the event loop that first waits on it
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._semaphore = loop, asyncio.Semaphore(self.max_pending)
+        return self._semaphore
+
+    async def _run(self, func, *args):
+        semaphore = self._get_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise PasswordHasherBusy()
+        try:
+            return await self._loop.run_in_executor(self._executor, func, *args)
+        finally:
+            semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def hash_many(self, passwords: Sequence[str]) -> List[str]:
+        """
+        Hashes passwords in parallel, keeping at most max_workers of them pending so that
+        interactive logins still get slots while a batch is hashed.
+        :param passwords:
+        :return: The hashes, in the order of passwords.
+        """
+        limit = asyncio.Semaphore(self.max_workers)
+
+        async def hash_one(password: str) -> str:
+            async with limit:
+                return await self.hash(password)
+
+        return await asyncio.gather(*(hash_one(password) for password in passwords))
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(
+        self, password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Verifies a password and, when its hash uses outdated parameters (e.g. fewer bcrypt
+        rounds than configured), also computes the new hash.
+        :param password:
+        :param hashed_password:
+        :return: Whether the password is valid, and the new hash to store or None.
+        """
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=security_settings.BCRYPT_ROUNDS
+)
+
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=security_settings.PASSWORD_HASH_WORKERS,
+    max_pending=security_settings.PASSWORD_HASH_MAX_PENDING,
+    queue_timeout=security_settings.PASSWORD_HASH_QUEUE_TIMEOUT,
+)
@@ -0,0 +1,339 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from api_template.config.security import security_settings
+from api_template.db.models.revoked_token import RevokedToken
+from api_template.db.session import PrimarySessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class BloomFilter:
+    """
+    Bloom filter of strings: membership answers are never false negatives, and false
+    positives happen at about error_rate while at most capacity items are added. Positions
+    come from one BLAKE2b digest by double hashing, so a check costs the same whatever the
+    number of items.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate must be between 0 and 1")
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.num_bits = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing: position i is h1 + i * h2 modulo the number of bits
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        num_bits = self.num_bits
+        position = int.from_bytes(digest[:8], "little") % num_bits
+        step = (int.from_bytes(digest[8:], "little") | 1) % num_bits
+        positions = [position]
+        for _ in range(self.num_hashes - 1):
+            position += step
+            if position >= num_bits:
+                position -= num_bits
+            positions.append(position)
+        return positions
+
+    def add(self, item: str):
+        bits = self.bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[str]):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        for position in self._positions(item):
+            if not bits[position >> 3] >> (position & 7) & 1:
+                return False
+        return True
+
+
+class RevocationStore(ABC):
+    """
+    Shared storage of revoked token ids (jti), each kept until its token expires. Times are
+    seconds since the epoch.
+    """
+
+    @abstractmethod
+    async def revoke(self, jti: str, expires_at: float):
+        pass
+
+    @abstractmethod
+    async def is_revoked(self, jti: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def load(self, since: Optional[float] = None) -> Tuple[List[str], Optional[float]]:
+        """
+        Returns the ids of unexpired tokens, only those revoked after since when given, and
+        the latest revocation time among them.
+        """
+        pass
+
+    @abstractmethod
+    async def purge_expired(self) -> int:
+        """
+        Deletes the ids of expired tokens and returns how many were deleted.
+        """
+        pass
+
+
+def _to_datetime(timestamp: float) -> datetime:
+    return datetime.fromtimestamp(timestamp, timezone.utc)
+
+
+def _to_timestamp(value: datetime) -> float:
+    # SQLite returns naive datetimes, in UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+class DatabaseRevocationStore(RevocationStore):
+    """
+    Revoked ids in the revoked_tokens table, each operation in its own session. Bulk loads are
+    streamed in batches, yielding to the event loop between them.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, batch_size: int = 10000):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+
+    async def revoke(self, jti: str, expires_at: float):
+        async with self.session_factory() as db:
+            # Same clock as the Redis store, incremental loads tolerate skew between workers
+            await db.merge(
+                RevokedToken(
+                    jti=jti,
+                    expires_at=_to_datetime(expires_at),
+                    revoked_at=_to_datetime(time.time()),
+                )
+            )
+            await db.commit()
+
+    async def is_revoked(self, jti: str) -> bool:
+        async with self.session_factory() as db:
+            expires_at = await db.scalar(
+                select(RevokedToken.expires_at).where(RevokedToken.jti == jti)
+            )
+        return expires_at is not None and _to_timestamp(expires_at) > time.time()
+
+    async def load(self, since: Optional[float] = None) -> Tuple[List[str], Optional[float]]:
+        query = select(RevokedToken.jti).where(RevokedToken.expires_at > _to_datetime(time.time()))
+        if since is not None:
+            query = query.where(RevokedToken.revoked_at > _to_datetime(since))
+        async with self.session_factory() as db:
+            latest = await db.scalar(select(func.max(RevokedToken.revoked_at)))
+            result = await db.stream_scalars(query.execution_options(yield_per=self.batch_size))
+            ids = []
+            async for batch in result.partitions():
+                ids.extend(batch)
+        return ids, _to_timestamp(latest) if latest is not None else None
+
+    async def purge_expired(self) -> int:
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(RevokedToken).where(RevokedToken.expires_at <= _to_datetime(time.time()))
+            )
+            await db.commit()
+        return result.rowcount
+
+
+class RedisRevocationStore(RevocationStore):
+    """
+    Revoked ids in two Redis sorted sets, scored by expiry and by revocation time.
+    """
+
+    def __init__(self, client: aioredis.Redis, prefix: str = "revoked_tokens:"):
+        self.client = client
+        self.expires_key = f"{prefix}expires"
+        self.revoked_key = f"{prefix}revoked"
+
+    async def revoke(self, jti: str, expires_at: float):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.expires_key, {jti: expires_at})
+            pipe.zadd(self.revoked_key, {jti: time.time()})
+            await pipe.execute()
+
+    async def is_revoked(self, jti: str) -> bool:
+        expires_at = await self.client.zscore(self.expires_key, jti)
+        return expires_at is not None and expires_at > time.time()
+
+    async def load(self, since: Optional[float] = None) -> Tuple[List[str], Optional[float]]:
+        if since is None:
+            ids = await self.client.zrangebyscore(self.expires_key, f"({time.time()}", "+inf")
+            latest = await self.client.zrange(self.revoked_key, -1, -1, withscores=True)
+        else:
+            latest = await self.client.zrangebyscore(
+                self.revoked_key, f"({since}", "+inf", withscores=True
+            )
+            ids = [jti for jti, _ in latest]
+            latest = latest[-1:]
+        return [_decode(jti) for jti in ids], latest[0][1] if latest else None
+
+    async def purge_expired(self) -> int:
+        expired = await self.client.zrangebyscore(self.expires_key, "-inf", time.time())
+        if not expired:
+            return 0
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zrem(self.expires_key, *expired)
+            pipe.zrem(self.revoked_key, *expired)
+            await pipe.execute()
+        return len(expired)
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class TokenRevocationList:
+    """
+    Checks token ids against the revoked ones without a network round-trip in the common
+    case: ids not in the in-memory Bloom filter are not revoked, and only filter hits (revoked
+    ids and rare false positives) are confirmed by the store. When the store cannot confirm,
+    the token is considered revoked.
+
+    The filter holds the ids revoked by this process and, refreshed every refresh_interval
+    seconds, those revoked by other processes, which are therefore accepted for up to
+    refresh_interval seconds. It is rebuilt every rebuild_interval seconds without expired ids.
+    Incremental loads overlap the previous one by `overlap` seconds, to tolerate clock skew
+    and late commits between writers.
+    """
+
+    def __init__(
+        self,
+        store: RevocationStore,
+        capacity: int = 1_000_000,
+        error_rate: float = 0.001,
+        refresh_interval: float = 5.0,
+        rebuild_interval: float = 3600.0,
+        overlap: float = 60.0,
+    ):
+        self.store = store
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.overlap = overlap
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.stats = Counter()
+        self._latest = None
+        self._task = None
+
+    async def is_revoked(self, jti: Optional[str]) -> bool:
+        if jti is None or jti not in self.bloom:
+            return False
+        self.stats["store_checks"] += 1
+        try:
+            return await self.store.is_revoked(jti)
+        except Exception as e:
+            logger.warning(f"Could not check token revocation, rejecting the token: {e}")
+            return True
+
+    async def revoke(self, jti: str, expires_at: float):
+        await self.store.revoke(jti, expires_at)
+        self.bloom.add(jti)
+
+    def _build(self, ids: List[str]) -> BloomFilter:
+        bloom = BloomFilter(max(self.capacity, 2 * len(ids)), self.error_rate)
+        bloom.update(ids)
+        return bloom
+
+    async def rebuild(self):
+        """
+        Replaces the filter by one built from every unexpired revoked id of the store.
+        """
+        await self.store.purge_expired()
+        ids, latest = await self.store.load()
+        # Hashing a million ids takes seconds, so build the filter in a worker thread
+        self.bloom = await asyncio.to_thread(self._build, ids)
+        self._latest = latest
+        self.stats["rebuilds"] += 1
+        logger.info(f"Token revocation list loaded: {len(ids)} revoked tokens")
+
+    async def refresh(self):
+        """
+        Adds the ids revoked since the last load to the filter.
+        """
+        since = self._latest - self.overlap if self._latest is not None else None
+        ids, latest = await self.store.load(since)
+        self.bloom.update(ids)
+        if latest is not None:
+            self._latest = max(latest, self._latest or latest)
+        self.stats["refreshes"] += 1
+
+    async def _run(self):
+        next_rebuild = time.monotonic() + self.rebuild_interval
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                if time.monotonic() >= next_rebuild:
+                    next_rebuild = time.monotonic() + self.rebuild_interval
+                    await self.rebuild()
+                else:
+                    await self.refresh()
+            except Exception as e:
+                logger.error(f"Could not refresh the token revocation list: {e}")
+
+    async def start(self):
+        """
+        Loads the revoked ids and starts refreshing them in the background.
+        """
+        try:
+            await self.rebuild()
+        except Exception as e:
+            logger.error(f"Could not load the token revocation list: {e}")
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+def create_revocation_list() -> TokenRevocationList:
+    """
+    Returns the revocation list on Redis when a Redis URL is configured, else on the database.
+    :return:
+    """
+    if security_settings.REVOCATION_REDIS_URL:
+        store = RedisRevocationStore(
+            aioredis.Redis.from_url(security_settings.REVOCATION_REDIS_URL)
+        )
+    else:
+        store = DatabaseRevocationStore(PrimarySessionLocal)
+    return TokenRevocationList(
+        store,
+        capacity=security_settings.REVOCATION_BLOOM_CAPACITY,
+        error_rate=security_settings.REVOCATION_BLOOM_ERROR_RATE,
+        refresh_interval=security_settings.REVOCATION_REFRESH_INTERVAL,
+        rebuild_interval=security_settings.REVOCATION_REBUILD_INTERVAL,
+    )
+
+
+token_revocations = create_revocation_list()
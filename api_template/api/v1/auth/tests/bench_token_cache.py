@@ -0,0 +1,63 @@
+"""
+Cost of authenticating a request with get_current_user + get_current_active_user: without the
+verified-token cache (jwt.decode and a user query on every request) and with it, for 100 users
+making repeated requests. The database is SQLite in a temporary file, so a real PostgreSQL
+round-trip would widen the gap.
+
+Run with: python -m api_template.api.v1.auth.tests.bench_token_cache
+"""
+
+import asyncio
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api_template.api.v1.auth import auth
+from api_template.api.v1.auth.token_cache import token_cache
+from api_template.db.models.user import User
+
+USERS = 100
+REQUESTS = 5000
+
+
+async def authenticate(tokens, db):
+    start = time.perf_counter()
+    for i in range(REQUESTS):
+        await auth.get_current_active_user(await auth.get_current_user(tokens[i % USERS], db))
+    return (time.perf_counter() - start) / REQUESTS
+
+
+async def run(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as connection:
+        await connection.run_sync(User.__table__.create)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+        db.add_all(
+            User(email=f"user{i}@example.com", username=f"user{i}", hashed_password="x")
+            for i in range(USERS)
+        )
+        await db.commit()
+        tokens = [
+            auth.create_access_token({"sub": f"user{i}"}, timedelta(minutes=30))
+            for i in range(USERS)
+        ]
+
+        for name, enabled in (("uncached", False), ("cached", True)):
+            token_cache.enabled = enabled
+            token_cache.clear()
+            cost = await authenticate(tokens, db)
+            print(f"{name:>8}: {cost * 1e6:7.1f} us/request")
+        print(f"hits: {token_cache.metrics()['hits']:,} of {REQUESTS:,} requests")
+    await engine.dispose()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(os.path.join(directory, "bench.db")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from passlib.context import CryptContext
+from sqlalchemy import select
+
+from api_template.api.v1.auth import auth
+from api_template.api.v1.auth.password_hasher import PasswordHasher, PasswordHasherBusy
+from api_template.db.models.user import User
+
+PASSWORD = "Secret-password1"
+
+
+def make_context(rounds):
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(make_context(4), max_workers=2)
+    yield hasher
+    hasher.close()
+
+
+async def add_user(db, hashed_password, username="alice"):
+    db.add(
+        User(email=f"{username}@example.com", username=username, hashed_password=hashed_password)
+    )
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify(hasher):
+    hashed = await hasher.hash(PASSWORD)
+
+    assert await hasher.verify(PASSWORD, hashed)
+    assert not await hasher.verify("wrong", hashed)
+
+
+@pytest.mark.asyncio
+async def test_verify_and_update_rehashes_outdated_hashes(hasher):
+    old_hash = make_context(5).hash(PASSWORD)
+
+    valid, new_hash = await hasher.verify_and_update(PASSWORD, old_hash)
+
+    assert valid
+    assert new_hash.startswith("$2b$04$")
+    assert await hasher.verify_and_update(PASSWORD, new_hash) == (True, None)
+
+
+@pytest.mark.asyncio
+async def test_callers_beyond_max_pending_get_busy():
+    slow = PasswordHasher(make_context(10), max_pending=1, queue_timeout=0.01)
+    try:
+        results = await asyncio.gather(
+            slow.hash(PASSWORD), slow.hash(PASSWORD), return_exceptions=True
+        )
+    finally:
+        slow.close()
+
+    assert isinstance(results[0], str)
+    assert isinstance(results[1], PasswordHasherBusy)
+    assert results[1].status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_authenticate_user_updates_outdated_hashes(db, hasher, monkeypatch):
+    monkeypatch.setattr(auth, "password_hasher", hasher)
+    await add_user(db, make_context(5).hash(PASSWORD))
+
+    assert await auth.authenticate_user("alice", "wrong", db) is None
+    user = await auth.authenticate_user("alice", PASSWORD, db)
+
+    assert user.username == "alice"
+    db.expire_all()
+    assert (await db.scalar(select(User))).hashed_password.startswith("$2b$04$")
+
+
+@pytest.mark.asyncio
+async def test_other_endpoints_stay_responsive_during_logins(db, monkeypatch):
+    context = make_context(10)
+    hasher = PasswordHasher(context, max_workers=2)
+    monkeypatch.setattr(auth, "password_hasher", hasher)
+    await add_user(db, context.hash(PASSWORD))
+    start = time.perf_counter()
+    context.hash(PASSWORD)
+    hash_time = time.perf_counter() - start
+
+    app = FastAPI()
+
+    @app.post("/login")
+    async def login(password: str, session=Depends(lambda: db)):
+        if await auth.authenticate_user("alice", password, session) is None:
+            raise HTTPException(status_code=401)
+        return {}
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            interval = hash_time / 4
+            start = time.perf_counter()
+
+            async def timed_login(i):
+                await asyncio.sleep(i * interval)
+                return await client.post("/login", params={"password": PASSWORD})
+
+            async def pings():
+                # Delay of each ping from its schedule, so stalls of the event loop count too
+                delays = []
+                for i in range(16):
+                    await asyncio.sleep(max(0.0, start + i * interval - time.perf_counter()))
+                    assert (await client.get("/ping")).status_code == 200
+                    delays.append(time.perf_counter() - (start + i * interval))
+                return delays
+
+            *responses, delays = await asyncio.gather(*(timed_login(i) for i in range(8)), pings())
+    finally:
+        hasher.close()
+
+    assert [response.status_code for response in responses] == [200] * 8
+    # With bcrypt on the event loop, pings would wait for whole hashes
+    assert max(delays) < hash_time / 2, (delays, hash_time)
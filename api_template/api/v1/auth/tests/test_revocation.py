@@ -0,0 +1,173 @@
+import time
+from datetime import timedelta
+from uuid import uuid4
+
+import pytest
+from fastapi import HTTPException
+
+from api_template.api.v1.auth import auth
+from api_template.api.v1.auth.revocation import (
+    BloomFilter,
+    DatabaseRevocationStore,
+    RedisRevocationStore,
+    TokenRevocationList,
+)
+from api_template.api.v1.auth.token_cache import token_cache
+from api_template.db.models.user import User
+
+
+class CountingStore(DatabaseRevocationStore):
+    def __init__(self, session_factory):
+        super().__init__(session_factory)
+        self.checks = 0
+        self.fail = False
+
+    async def is_revoked(self, jti):
+        self.checks += 1
+        if self.fail:
+            raise ConnectionError("database is down")
+        return await super().is_revoked(jti)
+
+
+@pytest.fixture
+def store(session_factory):
+    return CountingStore(session_factory)
+
+
+@pytest.fixture
+def redis_store():
+    fakeredis = pytest.importorskip("fakeredis")
+    return RedisRevocationStore(fakeredis.FakeAsyncRedis())
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(10_000, 0.01)
+    members = [uuid4().hex for _ in range(10_000)]
+    bloom.update(members)
+
+    assert all(member in bloom for member in members)
+    false_positives = sum(uuid4().hex in bloom for _ in range(20_000))
+    assert false_positives / 20_000 < 0.02
+    assert bloom.nbytes == (bloom.num_bits + 7) // 8
+
+
+@pytest.fixture(params=["store", "redis_store"])
+def any_store(request):
+    # Async fixtures cannot be requested from the running test, so resolve them here
+    return request.getfixturevalue(request.param)
+
+
+@pytest.mark.asyncio
+async def test_stores(any_store):
+    store = any_store
+    now = time.time()
+    await store.revoke("active", now + 60)
+    await store.revoke("expired", now - 1)
+
+    assert await store.is_revoked("active")
+    assert not await store.is_revoked("expired")
+    assert not await store.is_revoked("unknown")
+
+    ids, latest = await store.load()
+    assert ids == ["active"]
+    assert latest == pytest.approx(time.time(), abs=5)
+
+    await store.revoke("later", now + 60)
+    ids, _ = await store.load(since=time.time() - 0.5)
+    assert "later" in ids
+
+    assert await store.purge_expired() == 1
+    assert not await store.is_revoked("expired")
+
+
+@pytest.mark.asyncio
+async def test_ids_not_in_the_filter_do_not_reach_the_store(store):
+    revocations = TokenRevocationList(store, capacity=1000)
+    await revocations.revoke("revoked", time.time() + 60)
+
+    assert not await revocations.is_revoked(None)
+    for _ in range(100):
+        assert not await revocations.is_revoked(uuid4().hex)
+    assert await revocations.is_revoked("revoked")
+    assert store.checks == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_loads_ids_revoked_by_other_processes(session_factory):
+    this_process = TokenRevocationList(DatabaseRevocationStore(session_factory), capacity=1000)
+    other_process = TokenRevocationList(DatabaseRevocationStore(session_factory), capacity=1000)
+    await other_process.revoke("old", time.time() + 60)
+    await this_process.rebuild()
+    await other_process.revoke("new", time.time() + 60)
+
+    assert not await this_process.is_revoked("new")
+    await this_process.refresh()
+
+    assert await this_process.is_revoked("old")
+    assert await this_process.is_revoked("new")
+
+
+@pytest.mark.asyncio
+async def test_rebuild_drops_expired_ids(store):
+    revocations = TokenRevocationList(store, capacity=1000)
+    await revocations.revoke("expired", time.time() - 1)
+    await revocations.revoke("active", time.time() + 60)
+
+    await revocations.rebuild()
+
+    assert revocations.bloom.count == 1
+    assert "active" in revocations.bloom
+
+
+@pytest.mark.asyncio
+async def test_filter_hits_are_rejected_when_the_store_fails(store):
+    revocations = TokenRevocationList(store, capacity=1000)
+    await revocations.revoke("revoked", time.time() + 60)
+    store.fail = True
+
+    assert await revocations.is_revoked("revoked")
+    assert not await revocations.is_revoked("other")
+
+
+@pytest.fixture
+def revocations(store, monkeypatch):
+    revocations = TokenRevocationList(store, capacity=1000)
+    monkeypatch.setattr(auth, "token_revocations", revocations)
+    token_cache.clear()
+    yield revocations
+    token_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_revoked_tokens_are_rejected_even_when_cached(db, revocations):
+    db.add(User(email="alice@example.com", username="alice", hashed_password="x"))
+    await db.commit()
+    token = auth.create_access_token({"sub": "alice"}, timedelta(minutes=5))
+    other_token = auth.create_access_token({"sub": "alice"}, timedelta(minutes=5))
+    assert (await auth.get_current_user(token, db)).username == "alice"
+
+    assert await auth.revoke_token(token)
+
+    with pytest.raises(HTTPException) as error:
+        await auth.get_current_user(token, db)
+    assert error.value.status_code == 401
+    assert (await auth.get_current_user(other_token, db)).username == "alice"
+
+
+@pytest.mark.asyncio
+async def test_revoke_refresh_token(revocations):
+    token = auth.create_refresh_token({"sub": "alice"})
+
+    assert await auth.revoke_token(token, refresh=True)
+    assert not await auth.revoke_token("not-a-token")
+    assert await revocations.store.is_revoked(auth.jwt.get_unverified_claims(token)["jti"])
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_only_revoked_as_their_type(revocations):
+    access_token = auth.create_access_token({"sub": "alice"}, timedelta(minutes=5))
+    refresh_token = auth.create_refresh_token({"sub": "alice"})
+
+    assert not await auth.revoke_token(access_token, refresh=True)
+    assert not await auth.revoke_token(refresh_token)
+    assert auth.validate_token(access_token, auth.REFRESH_TOKEN_TYPE) is None
@@ -0,0 +1,164 @@
+import time
+from datetime import timedelta
+
+import pytest
+import pytest_asyncio
+from fastapi import HTTPException
+
+from api_template.api.v1.auth import auth
+from api_template.api.v1.auth.token_cache import TokenCache, UserSnapshot, token_cache
+from api_template.api.v1.services.user_service import UserService
+from api_template.db.models.user import User
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def snapshot(user_id=1, username="alice"):
+    return UserSnapshot(user_id, username, f"{username}@example.com", None, None, True)
+
+
+def test_hit_after_put():
+    cache = TokenCache(maxsize=10, ttl=60)
+    cache.put("token", {"sub": "alice"}, snapshot())
+
+    entry = cache.get("token")
+
+    assert entry.user.username == "alice"
+    assert entry.claims == {"sub": "alice"}
+    assert cache.get("other") is None
+    assert cache.metrics() == {"hits": 1, "misses": 1, "invalidations": 0, "size": 1}
+
+
+def test_entries_are_keyed_by_digest():
+    cache = TokenCache(maxsize=10, ttl=60)
+    cache.put("secret-token", {}, snapshot())
+
+    assert all(isinstance(key, bytes) and b"secret" not in key for key in cache._cache.keys())
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = TokenCache(maxsize=10, ttl=60, clock=clock)
+    cache.put("token", {"exp": time.time() + 3600}, snapshot())
+
+    clock.now += 59
+    assert cache.get("token") is not None
+    clock.now += 2
+    assert cache.get("token") is None
+
+
+def test_entries_expire_at_token_exp():
+    clock = FakeClock()
+    cache = TokenCache(maxsize=10, ttl=60, clock=clock)
+    cache.put("token", {"exp": time.time() + 5}, snapshot())
+
+    clock.now += 6
+    assert cache.get("token") is None
+
+
+def test_expired_tokens_are_not_cached():
+    cache = TokenCache(maxsize=10, ttl=60)
+    cache.put("token", {"exp": time.time() - 1}, snapshot())
+
+    assert len(cache) == 0
+
+
+def test_cache_is_bounded():
+    cache = TokenCache(maxsize=2, ttl=60)
+    for i in range(5):
+        cache.put(f"token-{i}", {}, snapshot())
+
+    assert len(cache) == 2
+
+
+def test_invalidate_user_drops_only_its_tokens():
+    cache = TokenCache(maxsize=10, ttl=60)
+    cache.put("alice-1", {}, snapshot(1, "alice"))
+    cache.put("alice-2", {}, snapshot(1, "alice"))
+    cache.put("bob", {}, snapshot(2, "bob"))
+
+    assert cache.invalidate_user(1) == 2
+    assert cache.get("alice-1") is None
+    assert cache.get("bob") is not None
+
+
+def test_disabled_cache():
+    cache = TokenCache(maxsize=0, ttl=60)
+    cache.put("token", {}, snapshot())
+
+    assert cache.get("token") is None
+
+
+@pytest_asyncio.fixture
+async def db(db):
+    db.add(User(email="alice@example.com", username="alice", hashed_password="x"))
+    await db.commit()
+    token_cache.clear()
+    yield db
+    token_cache.clear()
+
+
+@pytest.fixture
+def user_queries(monkeypatch):
+    queries = []
+    get_user = auth.get_user
+
+    async def counting_get_user(username, db):
+        queries.append(username)
+        return await get_user(username, db)
+
+    monkeypatch.setattr(auth, "get_user", counting_get_user)
+    return queries
+
+
+@pytest.mark.asyncio
+async def test_get_current_user_skips_the_query_for_cached_tokens(db, user_queries):
+    token = auth.create_access_token({"sub": "alice"}, timedelta(minutes=5))
+
+    first = await auth.get_current_user(token, db)
+    second = await auth.get_current_user(token, db)
+
+    assert first == second
+    assert first.username == "alice"
+    assert user_queries == ["alice"]
+
+
+@pytest.mark.asyncio
+async def test_invalid_tokens_are_rejected_and_not_cached(db, user_queries):
+    with pytest.raises(HTTPException) as error:
+        await auth.get_current_user("not-a-token", db)
+
+    assert error.value.status_code == 401
+    assert len(token_cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_disabling_a_user_invalidates_its_tokens(db, user_queries):
+    token = auth.create_access_token({"sub": "alice"}, timedelta(minutes=5))
+    user = await auth.get_current_active_user(await auth.get_current_user(token, db))
+
+    await UserService(db).disable_user(user.id)
+
+    with pytest.raises(HTTPException) as error:
+        await auth.get_current_active_user(await auth.get_current_user(token, db))
+    assert error.value.status_code == 400
+    assert user_queries == ["alice", "alice"]
+
+
+@pytest.mark.asyncio
+async def test_refresh_tokens_are_not_access_tokens(db, user_queries):
+    refresh_token = auth.create_refresh_token({"sub": "alice"})
+
+    with pytest.raises(HTTPException) as error:
+        await auth.get_current_user(refresh_token, db)
+
+    assert error.value.status_code == 401
+    assert len(token_cache) == 0
+    assert auth.validate_token(refresh_token) is None
+    assert auth.validate_token(refresh_token, auth.REFRESH_TOKEN_TYPE)["sub"] == "alice"
@@ -0,0 +1,142 @@
+import hashlib
+import time
+from collections import Counter
+from typing import Iterable, NamedTuple, Optional
+
+from cachetools import TLRUCache
+
+from api_template.config.security import security_settings
+
+
+class UserSnapshot(NamedTuple):
+    """
+    Detached copy of the user fields that authenticated endpoints need.
+    """
+
+    id: int
+    username: str
+    email: str
+    first_name: Optional[str]
+    last_name: Optional[str]
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            first_name=user.first_name,
+            last_name=user.last_name,
+            is_active=bool(user.is_active),
+        )
+
+
+class VerifiedToken(NamedTuple):
+    # Decoded claims of the token, not to be mutated
+    claims: dict
+    user: UserSnapshot
+    # Time of the cache's clock after which the entry is dropped
+    expires_at: float
+
+
+class TokenCache:
+    """
+    Bounded cache of verified access tokens, keyed by the SHA-256 digest of the token so the
+    tokens themselves are not kept in memory. An entry holds the decoded claims and a snapshot
+    of the user, and expires at the token's exp or after ttl seconds, whichever comes first.
+
+    Entries of a user must be dropped with invalidate_user when the user changes. The cache is
+    per process: other workers see the change at the latest after ttl seconds.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0, clock=time.monotonic):
+        self.ttl = ttl
+        self.stats = Counter()
+        self._clock = clock
+        self._cache = TLRUCache(max(maxsize, 1), lambda key, value, now: value.expires_at, clock)
+        self.enabled = maxsize > 0 and ttl > 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str) -> Optional[VerifiedToken]:
+        """
+        Returns the cached verification of token, or None.
+        :param token:
+        :return:
+        """
+        if not self.enabled:
+            return None
+        entry = self._cache.get(self._key(token))
+        self.stats["hits" if entry is not None else "misses"] += 1
+        return entry
+
+    def put(self, token: str, claims: dict, user: UserSnapshot) -> VerifiedToken:
+        """
+        Caches a verified token, unless it is already expired.
+        :param token:
+        :param claims: Decoded claims of the token.
+        :param user:
+        :return:
+        """
+        lifetime = self.ttl
+        exp = claims.get("exp")
+        if exp is not None:
+            lifetime = min(lifetime, float(exp) - time.time())
+        entry = VerifiedToken(claims, user, self._clock() + lifetime)
+        if self.enabled and lifetime > 0:
+            self._cache[self._key(token)] = entry
+        return entry
+
+    def invalidate(self, token: str):
+        self._cache.pop(self._key(token), None)
+
+    def invalidate_user(self, user_id: int) -> int:
+        """
+        Drops the cached tokens of a user.
+        :param user_id:
+        :return: Number of tokens dropped.
+        """
+        keys = [key for key, entry in self._cache.items() if entry.user.id == user_id]
+        for key in keys:
+            self._cache.pop(key, None)
+        self.stats["invalidations"] += len(keys)
+        return len(keys)
+
+    def invalidate_users(self, user_ids: Iterable[int]) -> int:
+        """
+        Drops the cached tokens of several users, in one pass over the cache.
+        :param user_ids:
+        :return: Number of tokens dropped.
+        """
+        user_ids = set(user_ids)
+        if not user_ids:
+            return 0
+        keys = [key for key, entry in self._cache.items() if entry.user.id in user_ids]
+        for key in keys:
+            self._cache.pop(key, None)
+        self.stats["invalidations"] += len(keys)
+        return len(keys)
+
+    def metrics(self) -> dict:
+        """
+        Returns the hit/miss/invalidation counters and the current size of the cache.
+        :return:
+        """
+        return {
+            "hits": self.stats["hits"],
+            "misses": self.stats["misses"],
+            "invalidations": self.stats["invalidations"],
+            "size": len(self._cache),
+        }
+
+    def clear(self):
+        self._cache.clear()
+
+
+token_cache = TokenCache(security_settings.TOKEN_CACHE_MAXSIZE, security_settings.TOKEN_CACHE_TTL)
@@ -1,15 +1,29 @@
 import logging
+from typing import Optional
 
 from celery.result import AsyncResult
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.security import OAuth2PasswordBearer
 from starlette.status import HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
 
 from api_template.api.common.errors import APIError
-from api_template.api.common.pagination import Page, Paginator, paginate
+from api_template.api.common.pagination import (
+    CursorPage,
+    CursorPaginator,
+    Page,
+    Paginator,
+    encode_cursor,
+    paginate,
+)
 from api_template.api.v1.auth.auth import get_current_active_user, require_auth
 from api_template.api.v1.dependencies import get_db
-from api_template.api.v1.schemas.user_schemas import UserCreate, UserResponse, UserUpdate
+from api_template.api.v1.schemas.user_schemas import (
+    UserCreate,
+    UserImportReport,
+    UserResponse,
+    UserUpdate,
+)
+from api_template.api.v1.services.user_import import ImportFormat, read_records
 from api_template.api.v1.services.user_service import UserService
 from api_template.celery.tasks.general_tasks import example_task
 from api_template.db.models.user import User
@@ -45,6 +59,29 @@ async def create_user(
         raise HTTPException(status_code=HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.post("/import", response_model=UserImportReport)
+async def import_users(
+    request: Request,
+    format: Optional[ImportFormat] = Query(None, description="Defaults from the Content-Type"),
+    update_existing: bool = Query(False),
+    current_user: User = Depends(get_current_active_user),
+    user_service: UserService = Depends(get_user_service),
+):
+    """
+    Import users.
+
+    This endpoint creates users in bulk from an NDJSON upload (one user object per line) or a
+    CSV upload (with a header line), with the fields of user creation. The upload is read as
+    a stream and imported in batches. With update_existing, users whose email already exists
+    are updated instead. Rows that fail are skipped and listed in the report.
+    Only authenticated users can import users.
+    """
+    format = format or ImportFormat.from_content_type(request.headers.get("content-type", ""))
+    return await user_service.import_users(
+        read_records(request.stream(), format), update_existing=update_existing
+    )
+
+
 @router.put("/{user_id}", response_model=UserUpdate)
 async def update_user(
     user_id: int,
@@ -98,6 +135,29 @@ async def list_users(
     return paginate(users, paginator, total)
 
 
+@router.get("/cursor", response_model=CursorPage[UserResponse])
+async def list_users_by_cursor(
+    paginator: CursorPaginator = Depends(),
+    user_service: UserService = Depends(get_user_service),
+):
+    """
+    List users by cursor.
+
+    This endpoint returns users by creation time, a page at a time: pass the next_cursor of a
+    page to get the next one. Unlike page numbers, deep pages are as fast as the first one.
+    The total is only returned with include_total, and may be an estimate on large tables.
+    """
+    users, next_key, total = await user_service.get_users_page(
+        paginator.after, paginator.size, paginator.include_total
+    )
+    return CursorPage(
+        items=users,
+        size=paginator.size,
+        next_cursor=encode_cursor(next_key) if next_key else None,
+        total=total,
+    )
+
+
 @router.get("/test-queue", response_model=dict)
 async def test_queue(message: str, request: Request):
     channel = "user_channel"
@@ -27,7 +27,7 @@ async def websearch(request: WebSearchRequest, external: APISetup = Depends(APIS
     try:
         api_adapter = external.get_api_manager().get_api("tavily_service")
 
-        response = api_adapter.execute_operation(
+        response = await api_adapter.aexecute_operation(
             operation_id="search", data={"api_key": settings.TAVILY_API_KEY, "query": request.query}
         )
         return WebSearchResponse(
@@ -1,9 +1,10 @@
-from api_template.db.session import SessionLocal
+from typing import AsyncIterator
 
+from sqlalchemy.ext.asyncio import AsyncSession
 
-def get_db():
-    db = SessionLocal()
-    try:
+from api_template.db.session import AsyncSessionLocal
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
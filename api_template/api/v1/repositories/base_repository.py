@@ -1,7 +1,11 @@
 from abc import ABC, abstractmethod
-from typing import Generic, List, Optional, TypeVar
+from typing import Generic, List, Optional, Sequence, Tuple, Type, TypeVar
 
 from pydantic import BaseModel
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api_template.api.common.pagination import keyset_page
 
 T = TypeVar("T")
 
@@ -26,3 +30,69 @@ class BaseRepository(ABC, Generic[T]):
     @abstractmethod
     async def delete(self, id: int) -> bool:
         pass
+
+
+class SQLAlchemyRepository(BaseRepository[T]):
+    """
+    Repository of a SQLAlchemy model on an AsyncSession. Subclasses set model, and keyset when
+    pages should not be ordered by id.
+    """
+
+    model: Type[T]
+    # Columns of a unique sort key for get_page, backed by an index
+    keyset: Tuple = ()
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create(self, entity: T) -> T:
+        self.db.add(entity)
+        await self.db.commit()
+        # Loads the columns set by the database, e.g. the id and server defaults
+        await self.db.refresh(entity)
+        return entity
+
+    async def get_by_id(self, id: int) -> Optional[T]:
+        return await self.db.get(self.model, id)
+
+    async def get_all(self, skip: int = 0, limit: int = 100) -> List[T]:
+        result = await self.db.scalars(
+            select(self.model).order_by(self.model.id).offset(skip).limit(limit)
+        )
+        return list(result.all())
+
+    async def get_page(
+        self, after: Optional[Sequence] = None, size: int = 100
+    ) -> Tuple[List[T], Optional[Tuple]]:
+        """
+        Returns the entities after a sort key, the cost of which does not depend on how many
+        come before, unlike get_all with an offset.
+        :param after: Sort key of the last entity of the previous page, None for the first page.
+        :param size:
+        :return: Up to size entities, and the sort key of the last one if more follow.
+        """
+        keyset = self.keyset or (self.model.id,)
+        result = await self.db.scalars(keyset_page(select(self.model), keyset, after, size))
+        entities = list(result.all())
+        if len(entities) <= size:
+            return entities, None
+        last = entities[size - 1]
+        return entities[:size], tuple(getattr(last, column.key) for column in keyset)
+
+    async def count(self) -> int:
+        return await self.db.scalar(select(func.count()).select_from(self.model))
+
+    async def update(self, entity: T, data: BaseModel) -> T:
+        for key, value in data.model_dump(exclude_unset=True).items():
+            setattr(entity, key, value)
+        await self.db.commit()
+        await self.db.refresh(entity)
+        return entity
+
+    async def delete(self, id: int) -> bool:
+        entity = await self.get_by_id(id)
+        if entity is None:
+            return False
+        await self.db.delete(entity)
+        await self.db.commit()
+        return True
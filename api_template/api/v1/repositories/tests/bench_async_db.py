@@ -0,0 +1,160 @@
+"""
+Throughput of GET /users/{user_id} under 50 concurrent clients, with a blocking Session used
+from the async endpoint (the previous data path) and with an AsyncSession from the async
+engine (pool of DB_POOL_SIZE + DB_MAX_OVERFLOW connections).
+
+The database is SQLite in a temporary file. A database round-trip is simulated by a SQL
+function that sleeps inside the driver: in the caller's thread for the blocking driver,
+as a PostgreSQL round-trip would with psycopg2, and in the connection's thread for aiosqlite,
+leaving the event loop free as asyncpg does.
+
+Run with: python -m api_template.api.v1.repositories.tests.bench_async_db
+"""
+
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from api_template.api.v1.repositories.user_repository import UserRepository
+from api_template.db.models.user import User
+from api_template.db.session import create_db_engine
+
+USERS = 1000
+CLIENTS = 50
+REQUESTS = 1000
+LATENCIES_MS = (0, 5)
+
+latency = 0.0
+
+
+def db_latency() -> int:
+    if latency:
+        time.sleep(latency)
+    return 0
+
+
+def add_latency_function(dbapi_connection, connection_record):
+    dbapi_connection.create_function("db_latency", 0, db_latency)
+
+
+def create_database(path):
+    engine = create_engine(f"sqlite:///{path}")
+    User.__table__.create(engine)
+    with engine.begin() as connection:
+        connection.execute(
+            User.__table__.insert(),
+            [
+                {"email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x"}
+                for i in range(USERS)
+            ],
+        )
+        # Every query on users goes through the view, and pays the latency once per row
+        connection.execute(text("ALTER TABLE users RENAME TO users_data"))
+        connection.execute(
+            text("CREATE VIEW users AS SELECT * FROM users_data WHERE db_latency() = 0")
+        )
+    engine.dispose()
+
+
+def sync_app(path) -> FastAPI:
+    # One connection per client: a checkout waiting on the event loop would block it
+    engine = create_engine(
+        f"sqlite:///{path}",
+        connect_args={"check_same_thread": False},
+        pool_size=CLIENTS,
+    )
+    event.listen(engine, "connect", add_latency_function)
+    session_factory = sessionmaker(bind=engine)
+    app = FastAPI()
+
+    def get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/users/{user_id}")
+    async def get_user(user_id: int, db=Depends(get_db)):
+        user = db.get(User, user_id)
+        return {"id": user.id, "username": user.username}
+
+    app.state.engine = engine
+    return app
+
+
+def async_app(path) -> FastAPI:
+    engine = create_db_engine(f"sqlite+aiosqlite:///{path}")
+    event.listen(engine.sync_engine, "connect", add_latency_function)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    app = FastAPI()
+
+    async def get_db():
+        async with session_factory() as db:
+            yield db
+
+    @app.get("/users/{user_id}")
+    async def get_user(user_id: int, db=Depends(get_db)):
+        user = await UserRepository(db).get_by_id(user_id)
+        return {"id": user.id, "username": user.username}
+
+    app.state.engine = engine
+    return app
+
+
+async def load(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        durations = []
+
+        async def run_client(index):
+            for i in range(index, REQUESTS, CLIENTS):
+                start = time.perf_counter()
+                response = await client.get(f"/users/{i % USERS + 1}")
+                durations.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+
+        # Warms up the pools
+        await asyncio.gather(*(run_client(REQUESTS - CLIENTS + i) for i in range(CLIENTS)))
+        durations.clear()
+        start = time.perf_counter()
+        await asyncio.gather(*(run_client(i) for i in range(CLIENTS)))
+        elapsed = time.perf_counter() - start
+    durations.sort()
+    return REQUESTS / elapsed, statistics.median(durations), durations[int(len(durations) * 0.99)]
+
+
+async def run(path):
+    global latency
+    for latency_ms in LATENCIES_MS:
+        latency = latency_ms / 1000
+        for name, create_app in (("blocking Session", sync_app), ("AsyncSession", async_app)):
+            app = create_app(path)
+            throughput, p50, p99 = await load(app)
+            if name == "AsyncSession":
+                await app.state.engine.dispose()
+            else:
+                app.state.engine.dispose()
+            print(
+                f"{latency_ms} ms round-trip, {name:>16}: {throughput:7.0f} req/s, "
+                f"p50 {p50 * 1e3:6.1f} ms, p99 {p99 * 1e3:6.1f} ms"
+            )
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        create_database(path)
+        asyncio.run(run(path))
+
+
+if __name__ == "__main__":
+    main()
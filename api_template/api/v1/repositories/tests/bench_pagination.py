@@ -0,0 +1,112 @@
+"""
+Latency of listing users at page 1 and page 10,000 (50 users per page) of a 5M-row users
+table: with an offset (get_all), with a cursor (get_page, seeking on the (created_at, id)
+index), and of the total with COUNT(*) against the cached count.
+
+The database is SQLite in a temporary file, about 1 GB for 5M rows. Filling it takes a few
+minutes, pass a smaller number of rows as argument for a quicker run.
+
+Run with: python -m api_template.api.v1.repositories.tests.bench_pagination [rows]
+"""
+
+import asyncio
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.schema import CreateTable
+
+from api_template.api.common.pagination import TableCounter
+from api_template.api.v1.repositories.user_repository import UserRepository
+from api_template.db.models.user import User
+
+ROWS = 5_000_000
+SIZE = 50
+DEEP_PAGE = 10_000
+REPEATS = 20
+
+
+def create_database(path, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        connection.execute(CreateTable(User.__table__))
+    start = datetime(2020, 1, 1)
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = OFF")
+    connection.execute("PRAGMA synchronous = OFF")
+    # Same text format as SQLAlchemy's SQLite DateTime, two users per timestamp
+    connection.executemany(
+        "INSERT INTO users (id, email, username, hashed_password, is_active, created_at) "
+        "VALUES (?, ?, ?, 'x', 1, ?)",
+        (
+            (
+                i + 1,
+                f"user{i}@example.com",
+                f"user{i}",
+                (start + timedelta(milliseconds=10 * (i // 2))).strftime("%Y-%m-%d %H:%M:%S.%f"),
+            )
+            for i in range(rows)
+        ),
+    )
+    connection.commit()
+    connection.close()
+    # Indexes are faster to build after the bulk insert
+    for index in User.__table__.indexes:
+        index.create(engine)
+    engine.dispose()
+
+
+async def median(func, repeats=REPEATS):
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await func()
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+async def run(path, rows):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+        repository = UserRepository(db)
+        deep_page = min(DEEP_PAGE, rows // SIZE)
+        # Sort key of the last user before the deep page
+        previous_key = None
+        if deep_page > 1:
+            last = (await repository.get_all(skip=(deep_page - 1) * SIZE - 1, limit=1))[0]
+            previous_key = (last.created_at, last.id)
+
+        for page, skip, after in ((1, 0, None), (deep_page, (deep_page - 1) * SIZE, previous_key)):
+            by_offset = await repository.get_all(skip=skip, limit=SIZE)
+            by_cursor, _ = await repository.get_page(after, SIZE)
+            assert [user.id for user in by_offset] == [user.id for user in by_cursor]
+            offset = await median(lambda: repository.get_all(skip=skip, limit=SIZE))
+            cursor = await median(lambda: repository.get_page(after, SIZE))
+            print(f"page {page:>6,}: offset {offset * 1e3:8.2f} ms | cursor {cursor * 1e3:6.2f} ms")
+            db.expunge_all()
+
+        counter = TableCounter(ttl=60)
+        exact = await median(lambda: repository.count(), 3)
+        cached = await median(lambda: counter.count(db, User))
+        print(f"total: COUNT(*) {exact * 1e3:8.2f} ms | cached {cached * 1e3:6.3f} ms")
+    await engine.dispose()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else ROWS
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        start = time.perf_counter()
+        create_database(path, rows)
+        print(f"{rows:,} users created in {time.perf_counter() - start:.0f} s")
+        asyncio.run(run(path, rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from api_template.api.common.pagination import decode_cursor, encode_cursor, table_counter
+from api_template.api.v1.repositories.user_repository import UserRepository
+from api_template.api.v1.schemas.user_schemas import UserCreate, UserUpdate
+from api_template.api.v1.services.user_service import UserService
+from api_template.db.models.user import User
+
+
+def new_user(username):
+    return UserCreate(
+        email=f"{username}@example.com", username=username, password="Secret-password1!"
+    )
+
+
+@pytest.mark.asyncio
+async def test_create_and_get(db):
+    repository = UserRepository(db)
+
+    user = await repository.create(new_user("alice"), "hash")
+
+    assert user.id is not None
+    assert user.is_active
+    assert await repository.get_by_id(user.id) is user
+    assert (await repository.get_by_username("alice")).id == user.id
+    assert (await repository.get_by_email("alice@example.com")).id == user.id
+    assert await repository.get_by_username("bob") is None
+
+
+@pytest.mark.asyncio
+async def test_get_all_and_count(db):
+    repository = UserRepository(db)
+    for i in range(5):
+        await repository.create(new_user(f"user{i}"), "hash")
+
+    users = await repository.get_all(skip=1, limit=3)
+
+    assert [user.username for user in users] == ["user1", "user2", "user3"]
+    assert await repository.count() == 5
+
+
+@pytest.mark.asyncio
+async def test_update_and_delete(db, session_factory):
+    repository = UserRepository(db)
+    user = await repository.create(new_user("alice"), "hash")
+
+    updated = await repository.update(user.id, UserUpdate(first_name="Alice"))
+    assert updated.first_name == "Alice"
+    assert await repository.update(user.id + 1, UserUpdate(first_name="Bob")) is None
+
+    assert await repository.delete(user.id)
+    assert not await repository.delete(user.id)
+    # Committed, so other sessions see the deletion
+    async with session_factory() as other:
+        assert await other.get(User, user.id) is None
+
+
+@pytest.mark.asyncio
+async def test_get_users_returns_the_total(db):
+    service = UserService(db)
+    for i in range(3):
+        await service.repository.create(new_user(f"user{i}"), "hash")
+
+    users, total = await service.get_users(skip=0, limit=2)
+
+    assert len(users) == 2
+    assert total == 3
+
+
+async def add_users(db, count, created_at):
+    db.add_all(
+        User(
+            email=f"user{i}@example.com",
+            username=f"user{i}",
+            hashed_password="hash",
+            # Several users per timestamp, so pages are also ordered by id
+            created_at=created_at + timedelta(seconds=i // 3),
+        )
+        for i in range(count)
+    )
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_get_page_walks_every_user_once(db):
+    await add_users(db, 25, datetime(2024, 1, 1, tzinfo=timezone.utc))
+    repository = UserRepository(db)
+
+    usernames, after, pages = [], None, 0
+    while True:
+        users, after = await repository.get_page(after, size=4)
+        usernames += [user.username for user in users]
+        pages += 1
+        if after is None:
+            break
+
+    assert usernames == [f"user{i}" for i in range(25)]
+    assert pages == 7
+
+
+@pytest.mark.asyncio
+async def test_get_page_resumes_from_an_encoded_cursor(db):
+    await add_users(db, 10, datetime(2024, 1, 1, tzinfo=timezone.utc))
+    repository = UserRepository(db)
+    first, after = await repository.get_page(size=5)
+
+    second, last = await repository.get_page(decode_cursor(encode_cursor(after)), size=5)
+
+    assert [user.username for user in second] == [f"user{i}" for i in range(5, 10)]
+    assert last is None
+
+
+@pytest.mark.asyncio
+async def test_get_users_page_total_is_optional_and_cached(db):
+    await add_users(db, 3, datetime(2024, 1, 1, tzinfo=timezone.utc))
+    service = UserService(db)
+    table_counter.invalidate(User)
+
+    users, after, total = await service.get_users_page(size=2)
+    assert (len(users), total) == (2, None)
+    users, after, total = await service.get_users_page(after, size=2, include_total=True)
+    assert (len(users), after, total) == (1, None, 3)
+
+    # Counted once, then cached until users are created or deleted through the service
+    late = [
+        User(email=f"late{i}@example.com", username=f"late{i}", hashed_password="x") for i in (1, 2)
+    ]
+    db.add_all(late)
+    await db.commit()
+    assert (await service.get_users_page(include_total=True))[2] == 3
+    await service.delete_user(late[0].id)
+    assert (await service.get_users_page(include_total=True))[2] == 4
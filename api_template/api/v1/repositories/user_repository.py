@@ -1,52 +1,93 @@
-from sqlalchemy.orm import Session
+from typing import Dict, List, Sequence, Tuple
 
-from api_template.api.v1.repositories.base_repository import BaseRepository
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from api_template.api.v1.repositories.base_repository import SQLAlchemyRepository
 from api_template.api.v1.schemas.user_schemas import UserCreate, UserUpdate
 from api_template.db.models.user import User
 
 
-class UserRepository(BaseRepository[User]):
-    def __init__(self, db: Session):
-        self.db = db
-
-    async def get_by_id(self, user_id: int) -> User | None:
-        return self.db.query(User).filter(User.id == user_id).first()
+class UserRepository(SQLAlchemyRepository[User]):
+    model = User
+    keyset = (User.created_at, User.id)
 
     async def get_by_username(self, username: str) -> User | None:
-        return self.db.query(User).filter(User.username == username).first()
+        return await self.db.scalar(select(User).where(User.username == username))
 
     async def get_by_email(self, email: str) -> User | None:
-        return self.db.query(User).filter(User.email == email).first()
+        return await self.db.scalar(select(User).where(User.email == email))
 
-    async def create(self, user: UserCreate) -> User:
+    async def create(self, user: UserCreate, hashed_password: str) -> User:
         db_user = User(
             email=user.email,
-            hashed_password=user.password,  # In reality, hash the password
+            username=user.username,
+            hashed_password=hashed_password,
             first_name=user.first_name,
             last_name=user.last_name,
         )
-        self.db.add(db_user)
-        self.db.commit()
-        self.db.refresh(db_user)
-        return db_user
+        return await super().create(db_user)
 
     async def update(self, user_id: int, user_update: UserUpdate) -> User | None:
-        db_user = self.get_by_id(user_id)
+        db_user = await self.get_by_id(user_id)
         if db_user:
-            update_data = user_update.model_dump(exclude_unset=True)
-            for key, value in update_data.items():
-                setattr(db_user, key, value)
-            self.db.commit()
-            self.db.refresh(db_user)
+            db_user = await super().update(db_user, user_update)
         return db_user
 
-    async def delete(self, user_id: int) -> bool:
-        db_user = self.get_by_id(user_id)
+    async def get_existing(
+        self, emails: Sequence[str], usernames: Sequence[str]
+    ) -> List[Tuple[int, str, str]]:
+        """
+        Returns the (id, email, username) of the users with any of the emails or usernames.
+        """
+        result = await self.db.execute(
+            select(User.id, User.email, User.username).where(
+                or_(User.email.in_(emails), User.username.in_(usernames))
+            )
+        )
+        return [tuple(row) for row in result]
+
+    async def bulk_upsert(self, rows: List[Dict], update_existing: bool = False):
+        """
+        Writes users with one multi-row INSERT ... ON CONFLICT (email) statement, then commits.
+        Rows with the email of an existing user update it, or are skipped when not
+        update_existing. Rows must have distinct emails and usernames, and their usernames
+        must not belong to other users.
+        :param rows: Column values of User, with email, username and hashed_password.
+        :param update_existing:
+        :return:
+        """
+        if not rows:
+            return
+        dialects = {"postgresql": postgresql, "sqlite": sqlite}
+        dialect = dialects.get(self.db.get_bind().dialect.name)
+        if dialect is None:
+            raise NotImplementedError(
+                f"Bulk upsert is not supported on {self.db.get_bind().dialect.name}"
+            )
+        statement = dialect.insert(User).values(rows)
+        if update_existing:
+            statement = statement.on_conflict_do_update(
+                index_elements=[User.email],
+                set_={
+                    **{key: statement.excluded[key] for key in rows[0] if key != "email"},
+                    "updated_at": func.now(),
+                },
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=[User.email])
+        await self.db.execute(statement)
+        await self.db.commit()
+
+    async def set_active(self, user_id: int, is_active: bool) -> User | None:
+        db_user = await self.get_by_id(user_id)
         if db_user:
-            self.db.delete(db_user)
-            self.db.commit()
-            return True
-        return False
+            db_user.is_active = is_active
+            await self.db.commit()
+            await self.db.refresh(db_user)
+        return db_user
 
-    async def get_all(self, skip: int = 0, limit: int = 100) -> list[User]:
-        return self.db.query(User).offset(skip).limit(limit).all()
+    async def set_password_hash(self, db_user: User, hashed_password: str) -> User:
+        db_user.hashed_password = hashed_password
+        await self.db.commit()
+        return db_user
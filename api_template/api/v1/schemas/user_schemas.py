@@ -1,5 +1,5 @@
 import re
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr, Field, validator
 
@@ -58,5 +58,19 @@ class UserResponse(UserBase):
         orm_mode = True
 
 
+class UserImportError(BaseModel):
+    line: int = Field(..., description="Line of the row in the upload, the CSV header is line 1")
+    email: Optional[str] = None
+    error: str
+
+
+class UserImportReport(BaseModel):
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    # The first errors only, failed counts them all
+    errors: List[UserImportError] = []
+
+
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -0,0 +1,88 @@
+"""
+Rows per second when creating users one request at a time (UserService.create_user in a
+session of its own: one hash, one INSERT and one commit per user) and with the bulk import of
+an NDJSON upload (UserService.import_users: parallel hashing, one INSERT ... ON CONFLICT and
+one commit per batch).
+
+bcrypt runs at 4 rounds for both, to measure the write path: at the default 12 rounds hashing
+dominates both, and the bulk import gains by hashing on PASSWORD_HASH_WORKERS threads, as many
+as there are cores. Even at 4 rounds, hashing and email validation bound the bulk import on a
+single core. The database is SQLite in a temporary file.
+
+Run with: python -m api_template.api.v1.services.tests.bench_user_import
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from passlib.context import CryptContext
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from api_template.api.v1.auth.password_hasher import PasswordHasher
+from api_template.api.v1.schemas.user_schemas import UserCreate
+from api_template.api.v1.services import user_service
+from api_template.api.v1.services.user_import import ImportFormat, read_records
+from api_template.api.v1.services.user_service import UserService
+from api_template.db.models.user import User
+
+ROWS = 5000
+BATCH_SIZES = (100, 1000)
+PASSWORD = "Secret-password1!"
+
+
+def record(prefix: str, i: int) -> dict:
+    return {"email": f"{prefix}{i}@example.com", "username": f"{prefix}{i}", "password": PASSWORD}
+
+
+async def upload(prefix: str, chunk_size: int = 64 * 1024):
+    data = b"".join(json.dumps(record(prefix, i)).encode() + b"\n" for i in range(ROWS))
+    for start in range(0, len(data), chunk_size):
+        yield data[start : start + chunk_size]
+
+
+async def per_request(session_factory) -> float:
+    start = time.perf_counter()
+    for i in range(ROWS):
+        async with session_factory() as db:
+            await UserService(db).create_user(UserCreate(**record("single", i)))
+    return ROWS / (time.perf_counter() - start)
+
+
+async def bulk(session_factory, batch_size: int) -> float:
+    start = time.perf_counter()
+    async with session_factory() as db:
+        report = await UserService(db).import_users(
+            read_records(upload(f"bulk{batch_size}_"), ImportFormat.NDJSON),
+            batch_size=batch_size,
+        )
+    assert report.created == ROWS, report
+    return ROWS / (time.perf_counter() - start)
+
+
+async def run(path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as connection:
+        await connection.run_sync(User.__table__.create)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    print(f"per request:         {await per_request(session_factory):8.0f} rows/s")
+    for batch_size in BATCH_SIZES:
+        rate = await bulk(session_factory, batch_size)
+        print(f"bulk, batches of {batch_size:>4}: {rate:8.0f} rows/s")
+    await engine.dispose()
+
+
+def main():
+    user_service.password_hasher = PasswordHasher(
+        CryptContext(schemes=["bcrypt"], bcrypt__rounds=4), max_workers=2
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(os.path.join(directory, "bench.db")))
+    user_service.password_hasher.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import json
+
+import pytest
+from passlib.context import CryptContext
+from sqlalchemy import select
+
+from api_template.api.v1.auth.password_hasher import PasswordHasher
+from api_template.api.v1.services import user_service
+from api_template.api.v1.services.user_import import (
+    ImportFormat,
+    LineTooLong,
+    iter_lines,
+    read_csv,
+    read_records,
+)
+from api_template.api.v1.services.user_service import UserService
+from api_template.db.models.user import User
+
+PASSWORD = "Secret-password1!"
+
+
+async def stream(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def collect(items):
+    return [item async for item in items]
+
+
+def ndjson(*records) -> bytes:
+    return b"".join(json.dumps(record).encode("utf-8") + b"\n" for record in records)
+
+
+def user(name, **fields):
+    return {
+        "email": f"{name}@example.com",
+        "username": name,
+        "password": PASSWORD,
+        **fields,
+    }
+
+
+@pytest.fixture
+def hasher(monkeypatch):
+    hasher = PasswordHasher(CryptContext(schemes=["bcrypt"], bcrypt__rounds=4), max_workers=2)
+    monkeypatch.setattr(user_service, "password_hasher", hasher)
+    yield hasher
+    hasher.close()
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_across_chunks():
+    data = "﻿name\r\nJosé\nlast".encode("utf-8")
+    # Splits the BOM, a line ending and a multi-byte character between chunks
+    chunks = [data[i : i + 3] for i in range(0, len(data), 3)]
+
+    assert await collect(iter_lines(stream(*chunks))) == ["name", "José", "last"]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_joins_a_line_spanning_many_chunks():
+    line = "x" * 100_000
+    chunks = [b"first\n"] + [b"x" * 1000] * 100 + [b"\r\nlast"]
+
+    assert await collect(iter_lines(stream(*chunks), max_length=len(line))) == [
+        "first",
+        line,
+        "last",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_lines_over_the_max_length_are_row_errors():
+    chunks = [ndjson(user("alice")), b"x" * 600, b"x" * 600 + b"\r\n", ndjson(user("bob"))]
+
+    lines = await collect(iter_lines(stream(*chunks), max_length=1000))
+    records = await collect(read_records(stream(*chunks), ImportFormat.NDJSON, 1000))
+
+    assert isinstance(lines[1], LineTooLong)
+    assert records == [
+        (1, user("alice")),
+        (2, "Line longer than 1000 characters"),
+        (3, user("bob")),
+    ]
+    # The limit applies without the line ending
+    assert await collect(iter_lines(stream(b"x" * 1000 + b"\r\n"), max_length=1000)) == ["x" * 1000]
+
+
+@pytest.mark.asyncio
+async def test_read_csv():
+    lines = stream(b'email,username,first_name\na@example.com,a,"Doe, Jane"\n\nb,c\n,x,\n')
+
+    records = await collect(read_csv(iter_lines(lines)))
+
+    assert records == [
+        (2, {"email": "a@example.com", "username": "a", "first_name": "Doe, Jane"}),
+        (4, "Expected 3 fields, got 2"),
+        (5, {"username": "x"}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_read_ndjson_reports_invalid_lines():
+    records = await collect(
+        read_records(stream(b'{"username": "a"}\nnot json\n[1]\n'), ImportFormat.NDJSON)
+    )
+
+    assert records[0] == (1, {"username": "a"})
+    assert records[1][0] == 2 and records[1][1].startswith("Invalid JSON")
+    assert records[2] == (3, "Expected a JSON object")
+
+
+@pytest.mark.asyncio
+async def test_import_users_in_batches_with_row_errors(db, hasher):
+    upload = (
+        ndjson(
+            user("alice"),
+            user("bob", first_name="Bob"),
+            user("weak", password="short"),
+            user("alice", username="alice2"),
+            user("carol"),
+        )
+        + b"{\n"
+    )
+
+    report = await UserService(db).import_users(
+        read_records(stream(upload), ImportFormat.NDJSON), batch_size=2
+    )
+
+    assert (report.created, report.updated, report.failed) == (3, 0, 3)
+    assert [(error.line, error.email) for error in report.errors] == [
+        (3, "weak@example.com"),
+        (4, "alice@example.com"),
+        (6, None),
+    ]
+    assert "password" in report.errors[0].error
+    assert report.errors[1].error == "Duplicate email in the upload"
+    users = (await db.scalars(select(User).order_by(User.id))).all()
+    assert [user.username for user in users] == ["alice", "bob", "carol"]
+    assert users[1].first_name == "Bob"
+    assert await hasher.verify(PASSWORD, users[0].hashed_password)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("update_existing", [False, True])
+async def test_import_users_with_existing_users(db, hasher, update_existing):
+    db.add_all(
+        [
+            User(email="alice@example.com", username="alice", hashed_password="old"),
+            User(email="bob@example.com", username="bob", hashed_password="old"),
+        ]
+    )
+    await db.commit()
+    upload = ndjson(
+        user("alice", last_name="Smith"),
+        user("bob", email="other@example.com"),
+        user("carol"),
+    )
+
+    report = await UserService(db).import_users(
+        read_records(stream(upload), ImportFormat.NDJSON), update_existing=update_existing
+    )
+
+    errors = [(error.line, error.error) for error in report.errors]
+    assert report.created == 1
+    assert errors[-1] == (2, "User with this username already exists")
+    alice = await db.scalar(
+        select(User).where(User.username == "alice").execution_options(populate_existing=True)
+    )
+    if update_existing:
+        assert report.updated == 1 and report.failed == 1
+        assert alice.last_name == "Smith"
+        assert alice.hashed_password != "old"
+    else:
+        assert report.updated == 0 and report.failed == 2
+        assert errors[0] == (1, "User with this email already exists")
+        assert alice.last_name is None
+
+
+@pytest.mark.asyncio
+async def test_import_report_lists_the_first_errors(db, hasher):
+    upload = b"not json\n" * 5
+
+    report = await UserService(db).import_users(
+        read_records(stream(upload), ImportFormat.NDJSON), max_errors=2
+    )
+
+    assert report.failed == 5
+    assert [error.line for error in report.errors] == [1, 2]
@@ -0,0 +1,167 @@
+import codecs
+import csv
+import json
+from enum import Enum
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+
+from api_template.api.v1.schemas.user_schemas import UserCreate
+from api_template.config.settings import settings
+
+
+class ImportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+    @classmethod
+    def from_content_type(cls, content_type: str) -> "ImportFormat":
+        return cls.CSV if "csv" in content_type.lower() else cls.NDJSON
+
+
+# A record of the upload: its line and either its fields or why it could not be parsed
+Record = Tuple[int, Union[Dict[str, Any], str]]
+
+
+class LineTooLong:
+    """
+    Yielded by iter_lines in place of a line longer than its max_length, which is not kept.
+    """
+
+    __slots__ = ("max_length",)
+
+    def __init__(self, max_length: int):
+        self.max_length = max_length
+
+    def __str__(self):
+        return f"Line longer than {self.max_length} characters"
+
+
+async def iter_lines(
+    chunks: AsyncIterable[bytes], max_length: Optional[int] = None
+) -> AsyncIterator[Union[str, LineTooLong]]:
+    """
+    Splits a stream of UTF-8 bytes into lines, without the line endings. A BOM is skipped.
+    Only the text of each chunk is split, the start of an unfinished line is kept aside until
+    its end arrives, so long lines cost linear time.
+    :param chunks:
+    :param max_length: Characters of a line beyond which it is skipped, and a LineTooLong
+        yielded instead, None for no limit.
+    :return:
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    # Parts of the unfinished line, None once it is too long
+    tail: Optional[List[str]] = []
+    tail_length = 0
+
+    def append(text: str):
+        nonlocal tail, tail_length
+        tail_length += len(text)
+        if tail is not None and max_length is not None and tail_length > max_length + 1:
+            # Its line ending (\r\n) may still come: one extra character is allowed
+            tail = None
+        elif tail is not None and text:
+            tail.append(text)
+
+    def finish() -> Union[str, LineTooLong]:
+        nonlocal tail, tail_length
+        line = None if tail is None else "".join(tail).rstrip("\r")
+        tail, tail_length = [], 0
+        if line is None or (max_length is not None and len(line) > max_length):
+            return LineTooLong(max_length)
+        return line
+
+    async for chunk in chunks:
+        parts = decoder.decode(chunk).split("\n")
+        for part in parts[:-1]:
+            append(part)
+            yield finish()
+        append(parts[-1])
+    append(decoder.decode(b"", final=True))
+    if tail_length:
+        yield finish()
+
+
+async def read_ndjson(lines: AsyncIterable[Union[str, LineTooLong]]) -> AsyncIterator[Record]:
+    """
+    Parses one JSON object per line, blank lines are skipped.
+    """
+    number = 0
+    async for line in lines:
+        number += 1
+        if isinstance(line, LineTooLong):
+            yield number, str(line)
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, f"Invalid JSON: {e}"
+            continue
+        yield number, record if isinstance(record, dict) else "Expected a JSON object"
+
+
+async def read_csv(lines: AsyncIterable[Union[str, LineTooLong]]) -> AsyncIterator[Record]:
+    """
+    Parses CSV with a header line naming the fields, blank lines are skipped. Values cannot
+    span lines.
+    """
+    header = None
+    number = 0
+    async for line in lines:
+        number += 1
+        if isinstance(line, LineTooLong):
+            yield number, str(line)
+            continue
+        if not line.strip():
+            continue
+        try:
+            values = next(csv.reader([line]))
+        except csv.Error as e:
+            yield number, f"Invalid CSV: {e}"
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+        elif len(values) != len(header):
+            yield number, f"Expected {len(header)} fields, got {len(values)}"
+        else:
+            # Empty cells are missing values, e.g. no last name
+            yield number, {name: value for name, value in zip(header, values) if value != ""}
+
+
+def read_records(
+    chunks: AsyncIterable[bytes],
+    format: ImportFormat,
+    max_line_length: Optional[int] = settings.USER_IMPORT_MAX_LINE_LENGTH,
+) -> AsyncIterator[Record]:
+    lines = iter_lines(chunks, max_line_length)
+    return read_csv(lines) if format == ImportFormat.CSV else read_ndjson(lines)
+
+
+def validate_record(record: Dict[str, Any]) -> Union[UserCreate, str]:
+    """
+    Validates a record as a new user.
+    :param record:
+    :return: The user, or the validation errors.
+    """
+    try:
+        return UserCreate.model_validate(record)
+    except ValidationError as e:
+        return "; ".join(_format_error(error) for error in e.errors())
+
+
+def _format_error(error: Dict[str, Any]) -> str:
+    location = ".".join(str(part) for part in error["loc"])
+    return f"{location}: {error['msg']}" if location else error["msg"]
+
+
+async def chunked(records: AsyncIterable[Record], size: int) -> AsyncIterator[List[Record]]:
+    chunk = []
+    async for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
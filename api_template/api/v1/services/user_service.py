@@ -1,12 +1,22 @@
 import logging
-from typing import List, Optional, Tuple
+from typing import AsyncIterable, List, Optional, Sequence, Tuple
 
 from fastapi import HTTPException
+from sqlalchemy.exc import IntegrityError
 from starlette.status import HTTP_400_BAD_REQUEST, HTTP_404_NOT_FOUND
 
-from api_template.api.v1.auth.auth import get_password_hash
+from api_template.api.common.pagination import table_counter
+from api_template.api.v1.auth.password_hasher import password_hasher
+from api_template.api.v1.auth.token_cache import token_cache
 from api_template.api.v1.repositories.user_repository import UserRepository
-from api_template.api.v1.schemas.user_schemas import UserCreate, UserUpdate
+from api_template.api.v1.schemas.user_schemas import (
+    UserCreate,
+    UserImportError,
+    UserImportReport,
+    UserUpdate,
+)
+from api_template.api.v1.services.user_import import Record, chunked, validate_record
+from api_template.config.settings import settings
 from api_template.db.models.user import User
 
 logger = logging.getLogger(__name__)
@@ -24,41 +34,173 @@ class UserService:
                 status_code=HTTP_400_BAD_REQUEST, detail="User with this email already exists"
             )
 
-        hashed_password = get_password_hash(user.password)
-        user_data = UserCreate(**user.dict(), hashed_password=hashed_password)
-        new_user = await self.repository.create(user_data)
+        hashed_password = await password_hasher.hash(user.password)
+        new_user = await self.repository.create(user, hashed_password)
+        table_counter.invalidate(User)
         logger.info(f"New user created: {new_user.id}")
         return new_user
 
     async def get_users(self, skip: int = 0, limit: int = 100) -> Tuple[List[User], int]:
         users = await self.repository.get_all(skip, limit)
-        total = users.count("*")
+        total = await table_counter.count(self.repository.db, User)
         return users, total
 
+    async def get_users_page(
+        self, after: Optional[Sequence] = None, size: int = 100, include_total: bool = False
+    ) -> Tuple[List[User], Optional[Tuple], Optional[int]]:
+        """
+        Returns a page of users by creation time, see UserRepository.get_page.
+        :param after: Sort key of the last user of the previous page.
+        :param size:
+        :param include_total: Whether to count the users, cached or estimated.
+        :return: The users, the sort key of the next page if any, and the total or None.
+        """
+        users, next_key = await self.repository.get_page(after, size)
+        total = await table_counter.count(self.repository.db, User) if include_total else None
+        return users, next_key, total
+
     async def get_user_by_email(self, email: str) -> Optional[User]:
         return await self.repository.get_by_email(email)
 
     async def update_user(self, user_id: int, user_update: UserUpdate) -> User:
-        existing_user = await self.repository.get(user_id)
+        existing_user = await self.repository.get_by_id(user_id)
         if not existing_user:
             logger.warning(f"Attempted to update non-existent user: {user_id}")
             raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="User not found")
 
         updated_user = await self.repository.update(user_id, user_update)
+        token_cache.invalidate_user(user_id)
         logger.info(f"User updated: {user_id}")
         return updated_user
 
+    async def disable_user(self, user_id: int) -> User:
+        disabled_user = await self.repository.set_active(user_id, False)
+        if not disabled_user:
+            logger.warning(f"Attempted to disable non-existent user: {user_id}")
+            raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="User not found")
+
+        token_cache.invalidate_user(user_id)
+        logger.info(f"User disabled: {user_id}")
+        return disabled_user
+
     async def delete_user(self, user_id: int) -> bool:
-        existing_user = await self.repository.get(user_id)
+        existing_user = await self.repository.get_by_id(user_id)
         if not existing_user:
             logger.warning(f"Attempted to delete non-existent user: {user_id}")
             raise HTTPException(status_code=HTTP_404_NOT_FOUND, detail="User not found")
 
         result = await self.repository.delete(user_id)
+        token_cache.invalidate_user(user_id)
+        table_counter.invalidate(User)
         if result:
             logger.info(f"User deleted: {user_id}")
         return result
 
+    async def import_users(
+        self,
+        records: AsyncIterable[Record],
+        update_existing: bool = False,
+        batch_size: int = settings.USER_IMPORT_BATCH_SIZE,
+        max_errors: int = settings.USER_IMPORT_MAX_ERRORS,
+    ) -> UserImportReport:
+        """
+        Creates users from the records of an upload, a batch at a time: the rows are validated,
+        their passwords hashed in parallel, and the batch written with a single statement.
+        Invalid or conflicting rows are reported and skipped, the other rows are imported.
+        :param records: Parsed records, see user_import.read_records.
+        :param update_existing: Whether rows with the email of an existing user update it,
+            password included, instead of failing.
+        :param batch_size:
+        :param max_errors: Number of row errors listed in the report, all are counted.
+        :return:
+        """
+        report = UserImportReport()
+        seen_emails, seen_usernames = set(), set()
+
+        def fail(line: int, error: str, email=None):
+            report.failed += 1
+            if len(report.errors) < max_errors:
+                email = email if isinstance(email, str) else None
+                report.errors.append(UserImportError(line=line, email=email, error=error))
+
+        async for chunk in chunked(records, batch_size):
+            batch = []
+            for line, record in chunk:
+                user = validate_record(record) if isinstance(record, dict) else record
+                if isinstance(user, str):
+                    fail(line, user, record.get("email") if isinstance(record, dict) else None)
+                elif user.email in seen_emails:
+                    fail(line, "Duplicate email in the upload", user.email)
+                elif user.username in seen_usernames:
+                    fail(line, "Duplicate username in the upload", user.email)
+                else:
+                    seen_emails.add(user.email)
+                    seen_usernames.add(user.username)
+                    batch.append((line, user))
+            await self._import_batch(batch, update_existing, report, fail)
+
+        if report.created or report.updated:
+            table_counter.invalidate(User)
+        logger.info(
+            f"Users imported: {report.created} created, {report.updated} updated, "
+            f"{report.failed} failed"
+        )
+        return report
+
+    async def _import_batch(
+        self, batch: List[Tuple[int, UserCreate]], update_existing: bool, report, fail
+    ):
+        if not batch:
+            return
+        existing = await self.repository.get_existing(
+            [user.email for _, user in batch], [user.username for _, user in batch]
+        )
+        user_ids = {email: user_id for user_id, email, _ in existing}
+        username_emails = {username: email for _, email, username in existing}
+
+        writable = []
+        for line, user in batch:
+            username_email = username_emails.get(user.username)
+            if user.email in user_ids and not update_existing:
+                fail(line, "User with this email already exists", user.email)
+            elif username_email is not None and username_email != user.email:
+                fail(line, "User with this username already exists", user.email)
+            else:
+                writable.append((line, user))
+        if not writable:
+            return
+
+        hashed_passwords = await password_hasher.hash_many([user.password for _, user in writable])
+        rows = [
+            {
+                "email": user.email,
+                "username": user.username,
+                "hashed_password": hashed_password,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+            }
+            for (_, user), hashed_password in zip(writable, hashed_passwords)
+        ]
+        try:
+            await self.repository.bulk_upsert(rows, update_existing)
+            written = writable
+        except IntegrityError:
+            # Conflicts with concurrent writes: write the rows one at a time to find them
+            await self.repository.db.rollback()
+            written = []
+            for (line, user), row in zip(writable, rows):
+                try:
+                    await self.repository.bulk_upsert([row], update_existing)
+                    written.append((line, user))
+                except IntegrityError:
+                    await self.repository.db.rollback()
+                    fail(line, "Conflicts with another user", user.email)
+
+        updated_ids = [user_ids[user.email] for _, user in written if user.email in user_ids]
+        report.updated += len(updated_ids)
+        report.created += len(written) - len(updated_ids)
+        token_cache.invalidate_users(updated_ids)
+
     async def notify_user(self, user_id: int, message_type: str, content: str):
         # Implement notification logic here
         logger.info(f"Notification sent to user {user_id}: {message_type}")
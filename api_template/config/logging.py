@@ -1,4 +1,208 @@
+import atexit
+import json
 import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+from api_template.middleware.request_middleware import get_correlation_id
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(correlation_id)s] %(message)s"
+QUEUE_FULL_POLICIES = ("drop", "block")
+
+_json_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def dumps(obj) -> str:
+    """
+    Serializes obj to compact JSON, with orjson when it is installed. Values JSON cannot
+    represent are serialized with str().
+    :param obj:
+    :return:
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=str).decode()
+        except TypeError:
+            # e.g. non-str dict keys or integers over 64 bits
+            pass
+    return _json_encoder.encode(obj)
+
+
+class StructuredMessage:
+    """
+    Log message made of fields, serialized to JSON only when the record is formatted. The JSON
+    formatter merges the fields into the record instead.
+    """
+
+    __slots__ = ("fields",)
+
+    def __init__(self, fields: dict):
+        self.fields = fields
+
+    def __str__(self):
+        return dumps(self.fields)
+
+
+class CorrelationIdFilter(logging.Filter):
+    """
+    Attaches the correlation id of the current request to records. It must run in the thread
+    that logs, before the record is queued, since the id lives in a context variable.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if getattr(record, "correlation_id", None) is None:
+            correlation_id = get_correlation_id()
+            if correlation_id is not None:
+                record.correlation_id = correlation_id
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        if isinstance(record.msg, StructuredMessage) and not record.args:
+            data.update(record.msg.fields)
+        else:
+            data["message"] = record.getMessage()
+        correlation_id = getattr(record, "correlation_id", None)
+        if correlation_id is not None:
+            data["correlation_id"] = correlation_id
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc_info"] = record.exc_text
+        if record.stack_info:
+            data["stack_info"] = self.formatStack(record.stack_info)
+        return dumps(data)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Puts records on a bounded queue, drained by a QueueListener thread which formats and
+    writes them. Unlike QueueHandler, records are queued as they are: the message and its
+    arguments are only formatted by the listener, so arguments must not be mutated after the
+    call that logs them.
+
+    When the queue is full, records are dropped (and counted in `dropped`) with the "drop"
+    policy, or the caller waits for room with the "block" policy.
+    """
+
+    def __init__(self, log_queue: queue.Queue, policy: str = "drop"):
+        if policy not in QUEUE_FULL_POLICIES:
+            raise ValueError(f"Unknown queue full policy: {policy}")
+        super().__init__(log_queue)
+        self.policy = policy
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.policy == "block":
+            self.queue.put(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[AsyncQueueHandler] = None
+
+
+def create_handler(json_format: bool = False, stream=None) -> logging.Handler:
+    """
+    Returns the handler that actually writes the records.
+    :param json_format: One JSON object per line instead of text.
+    :param stream: Defaults to stderr.
+    :return:
+    """
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if json_format:
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT, defaults={"correlation_id": "-"}))
+    return handler
+
+
+def setup_logging(
+    level="INFO",
+    json_format: bool = False,
+    asynchronous: bool = True,
+    queue_size: int = 10000,
+    queue_full_policy: str = "drop",
+    handler: logging.Handler = None,
+) -> logging.Handler:
+    """
+    Configures the root logger, replacing its handlers. With asynchronous, records are put on
+    a bounded queue and written by a background thread, otherwise they are written by the
+    thread that logs.
+    :param level:
+    :param json_format:
+    :param asynchronous:
+    :param queue_size: Maximum number of records waiting to be written.
+    :param queue_full_policy: "drop" or "block".
+    :param handler: Handler writing the records, defaults to create_handler(json_format).
+    :return: The handler added to the root logger.
+    """
+    global _listener, _queue_handler
+
+    shutdown_logging()
+    handler = handler or create_handler(json_format)
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.setLevel(level)
+
+    if asynchronous:
+        _queue_handler = AsyncQueueHandler(queue.Queue(queue_size), queue_full_policy)
+        _listener = QueueListener(_queue_handler.queue, handler, respect_handler_level=True)
+        _listener.start()
+        handler = _queue_handler
+    handler.addFilter(CorrelationIdFilter())
+    root.addHandler(handler)
+    return handler
+
+
+def shutdown_logging():
+    """
+    Writes the queued records and stops the listener thread. Later records are written
+    synchronously.
+    """
+    global _listener, _queue_handler
+
+    if _listener is None:
+        return
+    listener, queue_handler = _listener, _queue_handler
+    _listener = _queue_handler = None
+    listener.stop()
+
+    root = logging.getLogger()
+    root.removeHandler(queue_handler)
+    for handler in listener.handlers:
+        handler.addFilter(CorrelationIdFilter())
+        root.addHandler(handler)
+    if queue_handler.dropped:
+        logger.warning(f"{queue_handler.dropped} log records were dropped, the queue was full")
+
+
+atexit.register(shutdown_logging)
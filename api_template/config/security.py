@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic_settings import BaseSettings
 
 
@@ -5,6 +7,25 @@ class SecuritySettings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Refresh tokens are signed with SECRET_KEY when no REFRESH_SECRET_KEY is set
+    REFRESH_SECRET_KEY: Optional[str] = None
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # Verified tokens kept in memory, for at most TOKEN_CACHE_TTL seconds (0 disables the cache)
+    TOKEN_CACHE_MAXSIZE: int = 10000
+    TOKEN_CACHE_TTL: float = 60.0
+    # bcrypt cost, hashes with another cost are updated at the next login
+    BCRYPT_ROUNDS: int = 12
+    # Password hashing pool, operations beyond MAX_PENDING wait up to QUEUE_TIMEOUT seconds
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    PASSWORD_HASH_QUEUE_TIMEOUT: float = 5.0
+    # Revoked token ids live in the database, or in Redis when REVOCATION_REDIS_URL is set, and
+    # are checked through an in-memory Bloom filter refreshed every REFRESH_INTERVAL seconds
+    REVOCATION_REDIS_URL: Optional[str] = None
+    REVOCATION_REFRESH_INTERVAL: float = 5.0
+    REVOCATION_REBUILD_INTERVAL: float = 3600.0
+    REVOCATION_BLOOM_CAPACITY: int = 1_000_000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
 
     class Config:
         extra = "ignore"
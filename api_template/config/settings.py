@@ -1,6 +1,6 @@
 import logging
 import traceback
-from typing import Dict, Union
+from typing import Dict, List, Optional, Union
 from urllib.parse import quote_plus
 
 from dotenv import load_dotenv
@@ -21,7 +21,33 @@ class Settings(BaseSettings):
     SUPABASE_BUCKET_NAME: str = Field(..., validation_alias="SUPABASE_BUCKET_NAME")
     RATE_LIMIT_MAX_REQUESTS: int = Field(1000, validation_alias="RATE_LIMIT_MAX_REQUESTS")
     RATE_LIMIT_PERIOD: int = Field(60, validation_alias="RATE_LIMIT_PERIOD")
+    # Number of clients tracked at once, the limiter's memory is fixed at 16 bytes per key
+    RATE_LIMIT_MAX_KEYS: int = Field(1 << 20, validation_alias="RATE_LIMIT_MAX_KEYS")
+    # Share the limits between workers on Redis, e.g. redis://redis:6379/0
+    RATE_LIMIT_REDIS_URL: Optional[str] = Field(None, validation_alias="RATE_LIMIT_REDIS_URL")
+    RATE_LIMIT_REDIS_TIMEOUT: float = Field(0.1, validation_alias="RATE_LIMIT_REDIS_TIMEOUT")
+
+    # Logging: records are written by a background thread from a bounded queue, and dropped
+    # ("drop") or waited for ("block") when it is full
+    LOG_LEVEL: str = Field("INFO", validation_alias="LOG_LEVEL")
+    LOG_JSON: bool = Field(False, validation_alias="LOG_JSON")
+    LOG_ASYNC: bool = Field(True, validation_alias="LOG_ASYNC")
+    LOG_QUEUE_SIZE: int = Field(10000, validation_alias="LOG_QUEUE_SIZE")
+    LOG_QUEUE_FULL_POLICY: str = Field("drop", validation_alias="LOG_QUEUE_FULL_POLICY")
+
+    # Request/response body logging: bytes kept per body and share of the requests logged,
+    # per route template (e.g. {"/": 0.01}) and per status (e.g. {"5xx": 1.0, "200": 0.1})
+    LOG_BODY_MAX_BYTES: int = Field(4096, validation_alias="LOG_BODY_MAX_BYTES")
+    LOG_BODY_SAMPLE_RATE: float = Field(1.0, validation_alias="LOG_BODY_SAMPLE_RATE")
+    LOG_BODY_ROUTE_SAMPLE_RATES: Dict[str, float] = Field(
+        {}, validation_alias="LOG_BODY_ROUTE_SAMPLE_RATES"
+    )
+    LOG_BODY_STATUS_SAMPLE_RATES: Dict[str, float] = Field(
+        {}, validation_alias="LOG_BODY_STATUS_SAMPLE_RATES"
+    )
     HASH_IPS: bool = Field(False, validation_alias="HASH_IPS")
+    # Request duration histograms per route template, exposed at /metrics
+    METRICS_ENABLED: bool = Field(True, validation_alias="METRICS_ENABLED")
 
     # Database settings
     # DATABASE_URL: str = Field(..., validation_alias="DATABASE_URL")
@@ -30,6 +56,35 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str = Field(..., validation_alias="POSTGRES_HOST")
     POSTGRES_DB: str = Field(..., validation_alias="POSTGRES_DB")
     POSTGRES_PORT: str = Field(..., validation_alias="POSTGRES_PORT")
+    # Connection pool of the async engine, per worker process: DB_POOL_SIZE connections are
+    # kept open, and up to DB_MAX_OVERFLOW more are opened under load
+    DB_POOL_SIZE: int = Field(10, validation_alias="DB_POOL_SIZE")
+    DB_MAX_OVERFLOW: int = Field(10, validation_alias="DB_MAX_OVERFLOW")
+    # Seconds to wait for a free connection before failing
+    DB_POOL_TIMEOUT: float = Field(30.0, validation_alias="DB_POOL_TIMEOUT")
+    # Seconds after which a connection is replaced, -1 keeps connections forever
+    DB_POOL_RECYCLE: int = Field(1800, validation_alias="DB_POOL_RECYCLE")
+    # Checks connections with a round-trip when they are checked out, to survive restarts
+    DB_POOL_PRE_PING: bool = Field(True, validation_alias="DB_POOL_PRE_PING")
+    # Server-side limit on the duration of each statement, 0 disables it
+    DB_STATEMENT_TIMEOUT_MS: int = Field(30000, validation_alias="DB_STATEMENT_TIMEOUT_MS")
+    # Read replicas, as a JSON list of postgresql:// URLs: reads go to the replicas less than
+    # DB_REPLICA_MAX_LAG seconds behind the primary, checked every DB_REPLICA_CHECK_INTERVAL
+    DB_REPLICA_URLS: List[str] = Field([], validation_alias="DB_REPLICA_URLS")
+    DB_REPLICA_MAX_LAG: float = Field(5.0, validation_alias="DB_REPLICA_MAX_LAG")
+    DB_REPLICA_CHECK_INTERVAL: float = Field(5.0, validation_alias="DB_REPLICA_CHECK_INTERVAL")
+    # Statements of each request are counted, timed and logged; a statement run more than
+    # DB_N_PLUS_ONE_THRESHOLD times in one request is logged as a probable N+1 query
+    DB_QUERY_STATS_ENABLED: bool = Field(True, validation_alias="DB_QUERY_STATS_ENABLED")
+    DB_N_PLUS_ONE_THRESHOLD: int = Field(10, validation_alias="DB_N_PLUS_ONE_THRESHOLD")
+
+    # Bulk user import: rows validated, hashed and written per batch, and row errors reported
+    USER_IMPORT_BATCH_SIZE: int = Field(1000, validation_alias="USER_IMPORT_BATCH_SIZE")
+    USER_IMPORT_MAX_ERRORS: int = Field(1000, validation_alias="USER_IMPORT_MAX_ERRORS")
+    # Characters of an upload line beyond which the line is reported as a row error, unread
+    USER_IMPORT_MAX_LINE_LENGTH: int = Field(
+        64 * 1024, validation_alias="USER_IMPORT_MAX_LINE_LENGTH"
+    )
 
     #  Security
     SECRET_KEY: str = Field(..., validation_alias="SECRET_KEY")
@@ -39,10 +94,38 @@ class Settings(BaseSettings):
     # Queue settings
     QUEUE_USERNAME: str = Field(..., validation_alias="QUEUE_USERNAME")
     QUEUE_PASSWORD: str = Field(..., validation_alias="QUEUE_PASSWORD")
+    # Threads running the sync message handlers, shared by the consumers of a process
+    QUEUE_HANDLER_THREADS: int = Field(4, validation_alias="QUEUE_HANDLER_THREADS")
 
     # Queue settings
     TAVILY_API_KEY: str = Field(..., validation_alias="TAVILY_API_KEY")
 
+    # External APIs HTTP connection pool
+    EXTERNAL_HTTP_MAX_CONNECTIONS: int = Field(
+        100, validation_alias="EXTERNAL_HTTP_MAX_CONNECTIONS"
+    )
+    EXTERNAL_HTTP_MAX_KEEPALIVE_CONNECTIONS: int = Field(
+        20, validation_alias="EXTERNAL_HTTP_MAX_KEEPALIVE_CONNECTIONS"
+    )
+    EXTERNAL_HTTP_KEEPALIVE_EXPIRY: float = Field(
+        30.0, validation_alias="EXTERNAL_HTTP_KEEPALIVE_EXPIRY"
+    )
+    EXTERNAL_HTTP_TIMEOUT: float = Field(30.0, validation_alias="EXTERNAL_HTTP_TIMEOUT")
+    EXTERNAL_HTTP_CONNECT_TIMEOUT: float = Field(
+        5.0, validation_alias="EXTERNAL_HTTP_CONNECT_TIMEOUT"
+    )
+    EXTERNAL_HTTP2: bool = Field(True, validation_alias="EXTERNAL_HTTP2")
+
+    # External APIs response cache
+    EXTERNAL_CACHE_MAXSIZE: int = Field(100, validation_alias="EXTERNAL_CACHE_MAXSIZE")
+    EXTERNAL_CACHE_TTL: float = Field(300, validation_alias="EXTERNAL_CACHE_TTL")
+
+    # External APIs startup: parse specs on first use, warming them up in the background
+    EXTERNAL_LAZY_SPECS: bool = Field(True, validation_alias="EXTERNAL_LAZY_SPECS")
+    EXTERNAL_SPEC_WARMUP_WORKERS: int = Field(4, validation_alias="EXTERNAL_SPEC_WARMUP_WORKERS")
+    # Directory of the parsed spec cache, an empty string disables it
+    EXTERNAL_SPEC_CACHE_DIR: Optional[str] = Field(None, validation_alias="EXTERNAL_SPEC_CACHE_DIR")
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -56,6 +139,14 @@ class Settings(BaseSettings):
             f"{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
         )
 
+    @property
+    def ASYNC_DATABASE_URL(self):
+        return _async_url(self.DATABASE_URL)
+
+    @property
+    def ASYNC_REPLICA_URLS(self):
+        return [_async_url(url) for url in self.DB_REPLICA_URLS]
+
     @property
     def CELERY_BEAT_SCHEDULE(self):
         try:
@@ -83,4 +174,8 @@ class Settings(BaseSettings):
         }
 
 
+def _async_url(url: str) -> str:
+    return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+
 settings = Settings()
@@ -0,0 +1,152 @@
+import io
+import json
+import logging
+import queue
+import threading
+
+import pytest
+
+from api_template.config.logging import (
+    AsyncQueueHandler,
+    JSONFormatter,
+    StructuredMessage,
+    setup_logging,
+    shutdown_logging,
+)
+from api_template.middleware.request_middleware import _correlation_id_ctx_var
+from api_template.utils.logging import log_message
+
+
+class CountingArg:
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "arg"
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield root
+    shutdown_logging()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def make_record(msg, *args):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, msg, args, None)
+
+
+def test_json_formatter_merges_structured_messages():
+    record = make_record(StructuredMessage({"action": "sent", "queue_name": "users"}))
+    record.correlation_id = "abc"
+
+    data = json.loads(JSONFormatter().format(record))
+
+    assert data["action"] == "sent"
+    assert data["queue_name"] == "users"
+    assert data["correlation_id"] == "abc"
+    assert data["level"] == "INFO"
+    assert "message" not in data
+
+
+def test_json_formatter_serializes_unknown_types_as_strings():
+    data = json.loads(JSONFormatter().format(make_record(StructuredMessage({"value": {1, 2}}))))
+
+    assert data["value"] == "{1, 2}"
+
+
+def test_structured_message_is_serialized_lazily():
+    assert json.loads(str(StructuredMessage({"a": 1}))) == {"a": 1}
+
+
+def test_queue_handler_does_not_format_records():
+    handler = AsyncQueueHandler(queue.Queue(10))
+    arg = CountingArg()
+
+    handler.handle(make_record("value: %s", arg))
+
+    record = handler.queue.get_nowait()
+    assert arg.calls == 0
+    assert record.args == (arg,)
+
+
+def test_drop_policy_counts_dropped_records():
+    handler = AsyncQueueHandler(queue.Queue(2), "drop")
+
+    for i in range(5):
+        handler.handle(make_record("record %s", i))
+
+    assert handler.queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_block_policy_waits_for_room():
+    handler = AsyncQueueHandler(queue.Queue(1), "block")
+    handler.handle(make_record("first"))
+    writer = threading.Thread(target=handler.handle, args=(make_record("second"),))
+
+    writer.start()
+    writer.join(0.05)
+    assert writer.is_alive()
+
+    handler.queue.get()
+    writer.join(1)
+    assert not writer.is_alive()
+    assert handler.queue.get_nowait().msg == "second"
+    assert handler.dropped == 0
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        AsyncQueueHandler(queue.Queue(1), "wait")
+
+
+def test_setup_logging_writes_json_with_correlation_id(root_logger):
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JSONFormatter())
+    setup_logging(handler=handler)
+
+    token = _correlation_id_ctx_var.set("request-1")
+    try:
+        log_message("message_processed", "users", message="hello")
+    finally:
+        _correlation_id_ctx_var.reset(token)
+    logging.getLogger("test").info("no request")
+    shutdown_logging()
+
+    first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert first["action"] == "message_processed"
+    assert first["message"] == "hello"
+    assert first["correlation_id"] == "request-1"
+    assert second["message"] == "no request"
+    assert "correlation_id" not in second
+
+
+def test_shutdown_logging_falls_back_to_synchronous_writes(root_logger):
+    stream = io.StringIO()
+    setup_logging(handler=logging.StreamHandler(stream))
+    shutdown_logging()
+
+    logging.getLogger("test").info("after shutdown")
+
+    assert "after shutdown" in stream.getvalue()
+    assert not any(isinstance(h, AsyncQueueHandler) for h in root_logger.handlers)
+
+
+def test_text_format_has_a_correlation_id_placeholder(root_logger):
+    stream = io.StringIO()
+    setup_logging(asynchronous=False, handler=None)
+    handler = root_logger.handlers[0]
+    handler.setStream(stream)
+
+    logging.getLogger("test").info("value: %s", 1)
+
+    assert "[-] value: 1" in stream.getvalue()
@@ -0,0 +1,197 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Iterator, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+QUERY_STATS_CTX_KEY = "query_stats"
+_START_TIMES_KEY = "query_start_times"
+
+# Statements longer than this are truncated in logs and errors
+MAX_STATEMENT_LENGTH = 500
+
+# Lists of placeholders, e.g. "(?, ?, ?)" of expanded IN clauses or multi-row VALUES, and
+# literals, so that statements differing only by those have the same shape
+_PLACEHOLDER = r"(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)"
+_PLACEHOLDER_LIST_RE = re.compile(rf"\(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)")
+_ROWS_RE = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|(?<![\w$])\d+(?:\.\d+)?\b")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    """
+    Returns statement with its whitespace collapsed and its literals and lists of placeholders
+    replaced by "?", to count the statements a request runs by shape.
+    :param statement:
+    :return:
+    """
+    shape = _SPACE_RE.sub(" ", statement).strip()
+    shape = _LITERAL_RE.sub("?", shape)
+    shape = _PLACEHOLDER_LIST_RE.sub("(?)", shape)
+    return _ROWS_RE.sub("(?)", shape)
+
+
+def _truncate(statement: str) -> str:
+    if len(statement) <= MAX_STATEMENT_LENGTH:
+        return statement
+    return statement[:MAX_STATEMENT_LENGTH] + "..."
+
+
+class QueryStats:
+    """
+    Statements run while tracking, see track_queries: their count, their total duration in
+    seconds, the slowest one, and how many times each shape ran. A shape running more than
+    n_plus_one_threshold times is logged once as a probable N+1 query.
+
+    Stats of nested tracking also count in the enclosing stats, e.g. the stats of a request in
+    those of a test.
+    """
+
+    __slots__ = (
+        "count",
+        "duration",
+        "slowest_statement",
+        "slowest_duration",
+        "shapes",
+        "n_plus_one_threshold",
+        "parent",
+    )
+
+    def __init__(self, n_plus_one_threshold: int = 0, parent: "QueryStats" = None):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest_statement: Optional[str] = None
+        self.slowest_duration = 0.0
+        self.shapes = Counter()
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.parent = parent
+
+    def record(self, statement: str, duration: float):
+        shape = statement_shape(statement)
+        stats = self
+        while stats is not None:
+            stats._add(statement, shape, duration)
+            stats = stats.parent
+
+    def _add(self, statement: str, shape: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        if self.slowest_statement is None or duration > self.slowest_duration:
+            self.slowest_statement = statement
+            self.slowest_duration = duration
+        self.shapes[shape] += 1
+        if self.n_plus_one_threshold > 0 and self.shapes[shape] == self.n_plus_one_threshold + 1:
+            logger.warning(
+                "Probable N+1 query, same statement run more than %d times: %s",
+                self.n_plus_one_threshold,
+                _truncate(shape),
+            )
+
+    def most_repeated(self) -> Optional[tuple]:
+        """
+        Returns the shape that ran the most times and its count, None when nothing ran.
+        :return:
+        """
+        most_common = self.shapes.most_common(1)
+        return most_common[0] if most_common else None
+
+
+_query_stats_ctx_var: ContextVar[Optional[QueryStats]] = ContextVar(
+    QUERY_STATS_CTX_KEY, default=None
+)
+
+
+def get_query_stats() -> Optional[QueryStats]:
+    return _query_stats_ctx_var.get()
+
+
+@contextmanager
+def track_queries(n_plus_one_threshold: int = 0) -> Iterator[QueryStats]:
+    """
+    Records the statements run by instrumented engines in the current context, e.g. a request,
+    until exit.
+    :param n_plus_one_threshold: Times a shape may run before it is logged, 0 to never log.
+    :return: The stats, updated as statements run.
+    """
+    stats = QueryStats(n_plus_one_threshold, parent=_query_stats_ctx_var.get())
+    token = _query_stats_ctx_var.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats_ctx_var.reset(token)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_statements: int = None, max_repeats: int = None) -> Iterator[QueryStats]:
+    """
+    Test helper asserting that the code in the block, e.g. a request to an endpoint through an
+    ASGI test client, runs at most max_statements statements, and each shape at most
+    max_repeats times.
+    :param max_statements:
+    :param max_repeats:
+    :return: The stats of the block.
+    """
+    with track_queries() as stats:
+        yield stats
+    errors = []
+    if max_statements is not None and stats.count > max_statements:
+        errors.append(f"{stats.count} statements ran, the budget is {max_statements}")
+    most_repeated = stats.most_repeated()
+    if max_repeats is not None and most_repeated and most_repeated[1] > max_repeats:
+        shape, count = most_repeated
+        errors.append(f"{_truncate(shape)!r} ran {count} times, the budget is {max_repeats}")
+    if errors:
+        statements = "\n".join(f"{count} x {shape}" for shape, count in stats.shapes.items())
+        raise QueryBudgetExceeded("; ".join(errors) + "\n" + statements)
+
+
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    if _query_stats_ctx_var.get() is not None:
+        connection.info.setdefault(_START_TIMES_KEY, []).append(time.perf_counter())
+
+
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    stats = _query_stats_ctx_var.get()
+    start_times = connection.info.get(_START_TIMES_KEY)
+    if stats is not None and start_times:
+        stats.record(statement, time.perf_counter() - start_times.pop())
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    start_times = connection.info.get(_START_TIMES_KEY) if connection is not None else None
+    if start_times:
+        start = start_times.pop()
+        stats = _query_stats_ctx_var.get()
+        if stats is not None and exception_context.statement is not None:
+            stats.record(exception_context.statement, time.perf_counter() - start)
+
+
+def instrument_engine(engine: Union[Engine, AsyncEngine]):
+    """
+    Records the statements run by engine in the QueryStats of the current context, if any.
+    :param engine: Engine, or async engine whose sync engine is instrumented.
+    """
+    if isinstance(engine, AsyncEngine):
+        engine = engine.sync_engine
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,86 @@
+import time
+from typing import Dict
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from api_template.middleware.metrics import (
+    LatencyHistogram,
+    LogLinearBuckets,
+    bucket_labels,
+    escape_label,
+    histogram_lines,
+)
+
+CHECKOUT_WAIT_METRIC = "db_pool_checkout_wait_seconds"
+
+
+class PoolMetrics:
+    """
+    Time spent waiting for a connection from each pool, and the current usage of the pools,
+    rendered in the Prometheus text format. Pools are named by their logging name.
+    """
+
+    def __init__(self, buckets: LogLinearBuckets = None):
+        self.buckets = buckets or LogLinearBuckets(min_value=1e-5, max_value=60.0)
+        self.checkout_waits: Dict[str, LatencyHistogram] = {}
+        # Latest pool of each name, engines replace their pool when disposed
+        self.pools: Dict[str, QueuePool] = {}
+        self._bucket_labels = bucket_labels(self.buckets)
+
+    def register(self, name: str, pool: QueuePool):
+        self.pools[name] = pool
+
+    def observe_checkout(self, name: str, wait: float):
+        histogram = self.checkout_waits.get(name)
+        if histogram is None:
+            histogram = self.checkout_waits[name] = LatencyHistogram(self.buckets)
+        histogram.record(wait)
+
+    def render(self) -> str:
+        """
+        Returns the checkout wait histograms and the pool gauges in the Prometheus text format.
+        :return:
+        """
+        lines = [
+            f"# HELP {CHECKOUT_WAIT_METRIC} Time waited for a database connection from the pool.",
+            f"# TYPE {CHECKOUT_WAIT_METRIC} histogram",
+        ]
+        for name, histogram in sorted(self.checkout_waits.items()):
+            labels = f'pool="{escape_label(name)}"'
+            lines += histogram_lines(CHECKOUT_WAIT_METRIC, labels, histogram, self._bucket_labels)
+        for metric, help_text, value in (
+            ("db_pool_size", "Connections kept open by the pool.", QueuePool.size),
+            ("db_pool_checked_out", "Connections in use.", QueuePool.checkedout),
+            # Negative while fewer than pool size connections are open
+            ("db_pool_overflow", "Connections opened beyond the pool size.", _overflow),
+        ):
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} gauge"]
+            for name, pool in sorted(self.pools.items()):
+                lines.append(f'{metric}{{pool="{escape_label(name)}"}} {value(pool)}')
+        return "\n".join(lines) + "\n"
+
+
+def _overflow(pool: QueuePool) -> int:
+    return max(pool.overflow(), 0)
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool of async engines that records in pool_metrics how long each checkout waited,
+    under the pool's logging name (the pool_logging_name argument of the engine).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics_name = self._orig_logging_name or "default"
+        pool_metrics.register(self.metrics_name, self)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_metrics.observe_checkout(self.metrics_name, time.perf_counter() - start)
@@ -25,4 +25,6 @@ class User(Base):
         Index("idx_user_email", email),
         Index("idx_user_username", username),
         Index("idx_user_name", first_name, last_name),
+        # Keyset pagination by creation time
+        Index("idx_user_created_at_id", created_at, id),
     )
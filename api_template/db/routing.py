@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import math
+from collections import Counter
+from typing import List, Optional
+
+from sqlalchemy import Select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+# Seconds of replayed transactions behind the primary, 0 when the replica has replayed all it
+# received: an idle primary sends nothing, which does not make the replica late
+POSTGRES_LAG_QUERY = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """)
+
+
+class Replica:
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        # Seconds behind the primary at the last check, None until checked, inf when unreachable
+        self.lag: Optional[float] = None
+
+
+class ReplicaRouter:
+    """
+    Chooses the engine of reads: the replicas take turns, among those whose lag at the last
+    check was at most max_lag seconds. When none qualifies, reads go to the primary. Lag is
+    checked every check_interval seconds once started.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: List[AsyncEngine] = (),
+        max_lag: float = 5.0,
+        check_interval: float = 5.0,
+    ):
+        self.primary = primary
+        self.replicas = [Replica(f"replica{i}", engine) for i, engine in enumerate(replicas)]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.stats = Counter()
+        self._next = 0
+        self._task = None
+
+    def reader(self) -> Engine:
+        """
+        Returns the engine for a read, as a sync engine for Session.get_bind.
+        :return:
+        """
+        replicas = self.replicas
+        for _ in range(len(replicas)):
+            replica = replicas[self._next % len(replicas)]
+            self._next += 1
+            if replica.lag is not None and replica.lag <= self.max_lag:
+                self.stats[replica.name] += 1
+                return replica.engine.sync_engine
+        self.stats["primary"] += 1
+        if replicas:
+            self.stats["fallbacks"] += 1
+        return self.primary.sync_engine
+
+    async def measure_lag(self, replica: Replica) -> float:
+        """
+        Returns how many seconds replica is behind the primary.
+        :param replica:
+        :return:
+        """
+        async with replica.engine.connect() as connection:
+            if connection.dialect.name != "postgresql":
+                await connection.execute(text("SELECT 1"))
+                return 0.0
+            return float(await connection.scalar(POSTGRES_LAG_QUERY))
+
+    async def check_lag(self):
+        for replica in self.replicas:
+            try:
+                lag = await self.measure_lag(replica)
+            except Exception as e:
+                lag = math.inf
+                logger.warning(f"Could not check the lag of database {replica.name}: {e}")
+            if lag > self.max_lag and (replica.lag is None or replica.lag <= self.max_lag):
+                logger.warning(f"Database {replica.name} is {lag:.1f} s behind, not reading it")
+            replica.lag = lag
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check_lag()
+
+    async def start(self):
+        """
+        Checks the lag of the replicas, then keeps checking it in the background.
+        """
+        if not self.replicas:
+            return
+        await self.check_lag()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for replica in self.replicas:
+            await replica.engine.dispose()
+
+
+class RoutingSession(Session):
+    """
+    Session sending reads to the replica chosen by router, and writes to the primary. Once the
+    session has written, or when info["primary"] is set, all its statements go to the primary,
+    so that it reads its own writes. SELECT ... FOR UPDATE also goes to the primary. The
+    replica is chosen once per session, so its reads are consistent with each other.
+    """
+
+    def __init__(self, router: ReplicaRouter = None, **kwargs):
+        super().__init__(**kwargs)
+        self.router = router
+        self._reader = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        router = self.router
+        if router is None or not router.replicas:
+            return super().get_bind(mapper, clause, **kwargs)
+        if (
+            self._flushing
+            or isinstance(clause, UpdateBase)
+            or (isinstance(clause, Select) and clause._for_update_arg is not None)
+        ):
+            self.info["primary"] = True
+        if clause is None or self.info.get("primary"):
+            return router.primary.sync_engine
+        if self._reader is None:
+            self._reader = router.reader()
+        return self._reader
@@ -1,7 +1,79 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from api_template.config.settings import settings
+from api_template.db.instrumentation import instrument_engine
+from api_template.db.metrics import TimedQueuePool
+from api_template.db.routing import ReplicaRouter, RoutingSession
 
+# Blocking engine, for migrations and scripts
 engine = create_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine)
+
+
+def create_db_engine(url: str, name: str = "primary", **kwargs) -> AsyncEngine:
+    """
+    Creates an async engine with the pool settings of Settings. Checkout waits of the pool are
+    recorded in pool_metrics under name, and statements in the QueryStats of the current
+    request, see instrument_engine. On PostgreSQL (asyncpg), the statement timeout is set
+    on every connection, and the client also gives up on a statement shortly after the server
+    should have cancelled it.
+    :param url: Database URL with an async driver, e.g. postgresql+asyncpg://...
+    :param name: Name of the pool in metrics and logs.
+    :param kwargs: Overrides of the create_async_engine arguments.
+    :return:
+    """
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_logging_name": name,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    timeout = settings.DB_STATEMENT_TIMEOUT_MS
+    if make_url(url).get_backend_name() == "postgresql" and timeout > 0:
+        options["connect_args"] = {
+            "server_settings": {"statement_timeout": str(timeout)},
+            "command_timeout": timeout / 1000 + 5,
+        }
+    options.update(kwargs)
+    async_engine = create_async_engine(url, **options)
+    instrument_engine(async_engine)
+    return async_engine
+
+
+def create_session_factory(router: ReplicaRouter) -> async_sessionmaker:
+    """
+    Returns a factory of sessions reading from the replicas of router and writing to its
+    primary, see RoutingSession.
+    :param router:
+    :return:
+    """
+    # Objects stay usable after commit: reloading expired attributes would need an await
+    return async_sessionmaker(
+        router.primary,
+        sync_session_class=RoutingSession,
+        router=router,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+async_engine = create_db_engine(settings.ASYNC_DATABASE_URL)
+replica_router = ReplicaRouter(
+    async_engine,
+    [
+        create_db_engine(url, name=f"replica{i}")
+        for i, url in enumerate(settings.ASYNC_REPLICA_URLS)
+    ],
+    max_lag=settings.DB_REPLICA_MAX_LAG,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+)
+AsyncSessionLocal = create_session_factory(replica_router)
+# Sessions that must see the latest writes, e.g. of other processes
+PrimarySessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
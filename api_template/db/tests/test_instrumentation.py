@@ -0,0 +1,160 @@
+import logging
+
+import httpx
+import pytest
+import pytest_asyncio
+from fastapi import FastAPI
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from api_template.config.logging import CorrelationIdFilter
+from api_template.db.instrumentation import (
+    QueryBudgetExceeded,
+    get_query_stats,
+    instrument_engine,
+    query_budget,
+    statement_shape,
+    track_queries,
+)
+from api_template.db.models.user import User
+from api_template.middleware.query_stats_middleware import QueryStatsMiddleware
+from api_template.middleware.request_middleware import (
+    CORRELATION_ID_HEADER,
+    RequestContextLogMiddleware,
+)
+
+USERS = 5
+
+
+@pytest_asyncio.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    instrument_engine(engine)
+    async with engine.begin() as connection:
+        await connection.run_sync(User.__table__.create)
+        await connection.execute(
+            User.__table__.insert(),
+            [
+                {"email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": "x"}
+                for i in range(USERS)
+            ],
+        )
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+def app(session_factory):
+    app = FastAPI()
+
+    @app.get("/users")
+    async def list_users():
+        async with session_factory() as db:
+            return [user.username for user in await db.scalars(select(User).order_by(User.id))]
+
+    @app.get("/users/one-by-one")
+    async def list_users_one_by_one():
+        async with session_factory() as db:
+            ids = list(await db.scalars(select(User.id).order_by(User.id)))
+            return [(await db.get(User, user_id)).username for user_id in ids]
+
+    app.add_middleware(QueryStatsMiddleware, n_plus_one_threshold=3)
+    app.add_middleware(RequestContextLogMiddleware, sample_rate=0.0)
+    return app
+
+
+def make_client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def test_statement_shape_ignores_literals_and_lists_of_placeholders():
+    assert statement_shape("SELECT * FROM users\n WHERE id IN (?, ?, ?) LIMIT 10") == (
+        "SELECT * FROM users WHERE id IN (?) LIMIT ?"
+    )
+    assert statement_shape("SELECT * FROM users WHERE id IN ($1, $2)") == (
+        "SELECT * FROM users WHERE id IN (?)"
+    )
+    assert statement_shape("INSERT INTO users (a, b) VALUES (?, ?), (?, ?)") == (
+        "INSERT INTO users (a, b) VALUES (?)"
+    )
+    assert statement_shape("SELECT * FROM users WHERE name = 'it''s' AND id = 12") == (
+        "SELECT * FROM users WHERE name = ? AND id = ?"
+    )
+    assert statement_shape("SELECT anon_1.id FROM t1 AS anon_1") == (
+        "SELECT anon_1.id FROM t1 AS anon_1"
+    )
+
+
+@pytest.mark.asyncio
+async def test_statements_are_recorded_only_while_tracking(session_factory):
+    async with session_factory() as db:
+        await db.execute(text("SELECT 1"))
+        assert get_query_stats() is None
+
+        with track_queries() as stats:
+            await db.execute(text("SELECT 1"))
+            await db.execute(text("SELECT 2"))
+        await db.execute(text("SELECT 3"))
+
+    assert stats.count == 2
+    assert stats.shapes == {"SELECT ?": 2}
+    assert stats.duration >= stats.slowest_duration > 0
+    assert stats.slowest_statement in ("SELECT 1", "SELECT 2")
+    assert get_query_stats() is None
+
+
+@pytest.mark.asyncio
+async def test_failed_statements_are_recorded(session_factory):
+    async with session_factory() as db:
+        with track_queries() as stats:
+            with pytest.raises(OperationalError):
+                await db.execute(text("SELECT * FROM missing"))
+            await db.rollback()
+            await db.execute(text("SELECT 1"))
+
+    assert stats.count == 2
+    assert stats.shapes["SELECT * FROM missing"] == 1
+
+
+@pytest.mark.asyncio
+async def test_requests_log_their_statements_with_the_correlation_id(app, caplog):
+    caplog.set_level(logging.INFO, logger="api_template.middleware.query_stats_middleware")
+    caplog.handler.addFilter(CorrelationIdFilter())
+    async with make_client(app) as client:
+        response = await client.get("/users", headers={CORRELATION_ID_HEADER: "c1"})
+
+    assert response.json() == [f"user{i}" for i in range(USERS)]
+    (record,) = caplog.records
+    assert record.correlation_id == "c1"
+    assert record.getMessage().startswith("Database: 1 statements in ")
+    assert "FROM users ORDER BY users.id" in record.getMessage()
+
+
+@pytest.mark.asyncio
+async def test_repeated_statements_are_logged_once_as_n_plus_one(app, caplog):
+    caplog.set_level(logging.WARNING, logger="api_template.db.instrumentation")
+    async with make_client(app) as client:
+        await client.get("/users/one-by-one")
+        await client.get("/users")
+
+    (record,) = caplog.records
+    assert "N+1" in record.getMessage()
+    assert "WHERE users.id = ?" in record.getMessage()
+
+
+@pytest.mark.asyncio
+async def test_query_budget_of_an_endpoint(app):
+    async with make_client(app) as client:
+        with query_budget(max_statements=1, max_repeats=1) as stats:
+            await client.get("/users")
+        assert stats.count == 1
+
+        with pytest.raises(QueryBudgetExceeded, match=f"ran {USERS} times, the budget is 2"):
+            with query_budget(max_repeats=2):
+                await client.get("/users/one-by-one")
+
+        with pytest.raises(QueryBudgetExceeded, match=f"{USERS + 1} statements ran"):
+            with query_budget(max_statements=USERS):
+                await client.get("/users/one-by-one")
@@ -0,0 +1,154 @@
+import asyncio
+import math
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+
+from api_template.api.v1.repositories.user_repository import UserRepository
+from api_template.db.metrics import CHECKOUT_WAIT_METRIC, pool_metrics
+from api_template.db.models.user import User
+from api_template.db.routing import ReplicaRouter
+from api_template.db.session import create_db_engine, create_session_factory
+
+
+class FakeLagRouter(ReplicaRouter):
+    def __init__(self, *args, lags=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lags = lags or {}
+
+    async def measure_lag(self, replica):
+        lag = self.lags.get(replica.name, 0.0)
+        if isinstance(lag, Exception):
+            raise lag
+        return lag
+
+
+async def create_database(path, name, username):
+    engine = create_db_engine(f"sqlite+aiosqlite:///{path}", name=name)
+    async with engine.begin() as connection:
+        await connection.run_sync(User.__table__.create)
+        # Each database has a user named after it, to tell which one answered
+        await connection.execute(
+            User.__table__.insert(),
+            {"email": f"{username}@example.com", "username": username, "hashed_password": "x"},
+        )
+    return engine
+
+
+@pytest_asyncio.fixture
+async def engines(tmp_path):
+    engines = [
+        await create_database(tmp_path / f"{name}.db", f"test-{name}", name)
+        for name in ("primary", "replica0", "replica1")
+    ]
+    yield engines
+    for engine in engines:
+        await engine.dispose()
+
+
+async def usernames(db):
+    return list(await db.scalars(select(User.username).order_by(User.id)))
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replicas_and_writes_to_the_primary(engines):
+    primary, replica, _ = engines
+    router = FakeLagRouter(primary, [replica])
+    await router.check_lag()
+
+    async with create_session_factory(router)() as db:
+        assert await usernames(db) == ["replica0"]
+        db.add(User(email="new@example.com", username="new", hashed_password="x"))
+        await db.commit()
+        # Reads its own writes
+        assert await usernames(db) == ["primary", "new"]
+
+    async with create_session_factory(router)() as db:
+        assert await usernames(db) == ["replica0"]
+
+
+@pytest.mark.asyncio
+async def test_repository_reads_from_replicas(engines):
+    primary, replica, _ = engines
+    router = FakeLagRouter(primary, [replica])
+    await router.check_lag()
+
+    async with create_session_factory(router)() as db:
+        assert await UserRepository(db).get_by_username("replica0") is not None
+        db.info["primary"] = True
+        assert await UserRepository(db).get_by_username("replica0") is None
+
+
+@pytest.mark.asyncio
+async def test_replicas_take_turns(engines):
+    primary, *replicas = engines
+    router = FakeLagRouter(primary, replicas)
+    await router.check_lag()
+    session_factory = create_session_factory(router)
+
+    answered = []
+    for _ in range(4):
+        async with session_factory() as db:
+            answered += await usernames(db)
+
+    assert answered == ["replica0", "replica1", "replica0", "replica1"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "lags", [{"replica0": 10.0}, {"replica0": ConnectionError("unreachable")}, None]
+)
+async def test_reads_fall_back_to_the_primary(engines, lags):
+    primary, replica, _ = engines
+    router = FakeLagRouter(primary, [replica], max_lag=5.0, lags=lags)
+    if lags is not None:
+        await router.check_lag()
+    # Else never checked, so the lag is unknown
+
+    async with create_session_factory(router)() as db:
+        assert await usernames(db) == ["primary"]
+    assert router.stats["fallbacks"] == 1
+    if lags and isinstance(lags["replica0"], Exception):
+        assert router.replicas[0].lag == math.inf
+
+
+@pytest.mark.asyncio
+async def test_replica_is_used_again_once_caught_up(engines):
+    primary, replica, _ = engines
+    router = FakeLagRouter(primary, [replica], lags={"replica0": 10.0})
+    await router.check_lag()
+    router.lags["replica0"] = 0.5
+    await router.check_lag()
+
+    async with create_session_factory(router)() as db:
+        assert await usernames(db) == ["replica0"]
+
+
+@pytest.mark.asyncio
+async def test_checkout_wait_is_recorded(tmp_path):
+    engine = create_db_engine(
+        f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}",
+        name="test-wait",
+        pool_size=1,
+        max_overflow=0,
+    )
+
+    async def hold():
+        async with engine.connect():
+            await asyncio.sleep(0.1)
+
+    holder = asyncio.create_task(hold())
+    await asyncio.sleep(0.01)
+    async with engine.connect():
+        pass
+    await holder
+    await engine.dispose()
+
+    histogram = pool_metrics.checkout_waits["test-wait"]
+    assert histogram.count == 2
+    assert 0.05 < histogram.sum < 1.0
+    rendered = pool_metrics.render()
+    assert f'{CHECKOUT_WAIT_METRIC}_count{{pool="test-wait"}} 2' in rendered
+    assert 'db_pool_size{pool="test-wait"} 1' in rendered
+    assert 'db_pool_checked_out{pool="test-wait"} 0' in rendered
@@ -1,13 +1,16 @@
 import json
 import logging
+from types import MappingProxyType
 
+import httpx
 import requests
-import yaml
-from cachetools import TTLCache
 from requests.exceptions import HTTPError
 
+from api_template.external.core.http_pool import HTTPClientPool
 from api_template.external.core.interfaces import ExternalAPIClient
-from api_template.external.util import deep_freeze_args
+from api_template.external.core.response_cache import ResponseCache
+from api_template.external.core.spec_cache import parse_spec
+from api_template.external.util import deep_freeze
 
 logger = logging.getLogger(__name__)
 
@@ -38,38 +41,209 @@ def generate_description_from_data(data: dict) -> str:
         return data.get("description", "summary")
 
 
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+# Methods operations can be executed with, by the sync and the async path alike
+SUPPORTED_METHODS = ("get", "post", "put", "delete", "patch")
+
+# Methods whose responses are cached by default; other operations opt in with `x-idempotent`.
+CACHEABLE_METHODS = ("get", "head")
+
+
+class Operation:
+    """
+    Pre-compiled view of an OpenAPI operation, built once when the spec is loaded.
+    """
+
+    __slots__ = (
+        "operation_id",
+        "method",
+        "path",
+        "parameters",
+        "request_body",
+        "description",
+        "idempotent",
+        "cache_ttl",
+        "data",
+    )
+
+    def __init__(self, operation_id: str, method: str, path: str, data: dict):
+        self.operation_id = operation_id
+        self.method = method
+        self.path = path
+        self.parameters = tuple(
+            {
+                "name": param.get("name"),
+                "in": param.get("in"),  # path, query, header, etc.
+                "required": param.get("required", False),
+                "schema": param.get("schema", {}),
+            }
+            for param in data.get("parameters", [])
+        )
+        self.request_body = (
+            data.get("requestBody", {})
+            .get("content", {})
+            .get("application/json", {})
+            .get("schema", {})
+        )
+        self.description = data.get("description")
+        self.idempotent = method in CACHEABLE_METHODS or bool(data.get("x-idempotent", False))
+        # TTL declared in the spec, in seconds; 0 disables caching for this operation.
+        self.cache_ttl = data.get("x-cache-ttl")
+        self.data = data
+
+    def __repr__(self):
+        return f"Operation({self.operation_id!r}, {self.method.upper()} {self.path})"
+
+
+def compile_operations(spec: dict) -> MappingProxyType:
+    """
+    Compile the paths of an OpenAPI spec into a read-only table that maps both the operationId
+    and "METHOD /path" of every operation to its Operation.
+    :param spec:
+    :return:
+    """
+    table = {}
+    for path, operations in spec.get("paths", {}).items():
+        for method, operation_data in operations.items():
+            if method not in HTTP_METHODS:
+                continue
+            fallback_id = f"{method.upper()} {path}"
+            operation = Operation(
+                operation_data.get("operationId", fallback_id), method, path, operation_data
+            )
+            table[operation.operation_id] = operation
+            table.setdefault(fallback_id, operation)
+    return MappingProxyType(table)
+
+
 class GenericAPIAdapter(ExternalAPIClient):
-    def __init__(self, base_url: str, spec: dict, headers: dict = None):
+    def __init__(
+        self,
+        base_url: str,
+        spec: dict,
+        headers: dict = None,
+        http_pool: HTTPClientPool = None,
+        cache_maxsize: int = 100,
+        cache_ttl: float = 300,
+        cache_ttls: dict = None,
+    ):
+        """
+        :param base_url:
+        :param spec:
+        :param headers:
+        :param http_pool: Shared connection pools, a private one is created when not given.
+        :param cache_maxsize: Maximum number of cached responses.
+        :param cache_ttl: Default TTL, in seconds, of the responses of idempotent operations.
+        :param cache_ttls: TTL per operationId, overriding `x-cache-ttl` and the default.
+        """
         self.base_url = base_url
         self.spec = spec
         self.headers = headers or {}
-        self.cache = TTLCache(maxsize=100, ttl=300)
+        self.cache = ResponseCache(maxsize=cache_maxsize)
+        self.http_pool = http_pool or HTTPClientPool()
+        self.operations = compile_operations(spec)
+        self._operation_ids = tuple(
+            operation_id
+            for operation_id, operation in self.operations.items()
+            if operation.operation_id == operation_id
+        )
+        cache_ttls = cache_ttls or {}
+        self._cache_ttls = {
+            operation_id: self._resolve_cache_ttl(
+                self.operations[operation_id], cache_ttl, cache_ttls
+            )
+            for operation_id in self._operation_ids
+        }
 
-    @deep_freeze_args
-    def execute_operation(self, operation_id: str, params: dict = None, data: dict = None):
+    @staticmethod
+    def _resolve_cache_ttl(operation: Operation, default_ttl: float, overrides: dict) -> float:
         """
-        Execute a specific operation based on the OpenAPI spec.
+        TTL of the responses of an operation: the configured override, else the `x-cache-ttl`
+        spec extension, else the default for idempotent operations. 0 means not cached.
+        :param operation:
+        :param default_ttl:
+        :param overrides:
+        :return:
+        """
+        if operation.operation_id in overrides:
+            return overrides[operation.operation_id] or 0
+        if operation.cache_ttl is not None:
+            return operation.cache_ttl
+        return default_ttl if operation.idempotent else 0
+
+    def get_cache_ttl(self, operation_id: str) -> float:
+        """
+        Returns the response cache TTL of an operation, 0 when its responses are not cached.
         :param operation_id:
+        :return:
+        """
+        return self._cache_ttls[self.get_operation(operation_id).operation_id]
+
+    def cache_info(self) -> dict:
+        """
+        Returns the hit/miss/eviction metrics of the response cache.
+        :return:
+        """
+        return self.cache.metrics()
+
+    @staticmethod
+    def _cache_key(operation: Operation, params, data):
+        """
+        Cache key of a call, or None when its arguments cannot be frozen.
+        :param operation:
         :param params:
         :param data:
         :return:
         """
         try:
+            return operation.operation_id, deep_freeze(params), deep_freeze(data)
+        except TypeError:
+            return None
+
+    def get_operation(self, operation_id: str) -> Operation:
+        """
+        Returns the compiled operation for an operationId or "METHOD /path".
+        :param operation_id:
+        :return:
+        """
+        operation = self.operations.get(operation_id)
+        if operation is None and " " in operation_id:
             method, path = operation_id.split(" ", 1)
-        except ValueError:
-            method, path = self.get_method_path_by_operation_id(operation_id)
+            operation = self.operations.get(f"{method.upper()} {path}")
+        if operation is None:
+            logger.error(f"Operation {operation_id} not found in the API spec.")
+            raise ValueError(f"Operation {operation_id} not found in the API spec.")
+        return operation
 
-        operation = self.spec["paths"].get(path)
-        if not operation:
-            logger.error(f"Path {path} not found in the API spec.")
-            raise ValueError(f"Path {path} not found in the API spec.")
+    def _resolve_operation(self, operation_id: str) -> tuple:
+        """
+        Resolve an operation_id (or "METHOD /path") to its lowercase method and path.
+        :param operation_id:
+        :return:
+        """
+        operation = self.get_operation(operation_id)
+        return operation.method, operation.path
 
-        method = method.lower()
-        operation_data = operation.get(method)
-        if not operation_data:
-            logger.error(f"Method {method.upper()} not found for path {path}.")
-            raise ValueError(f"Method {method.upper()} not found for path {path}.")
+    def execute_operation(self, operation_id: str, params: dict = None, data: dict = None):
+        """
+        Execute a specific operation based on the OpenAPI spec.
+        Responses of idempotent operations are cached, and concurrent identical calls share
+        a single upstream request.
+        :param operation_id:
+        :param params:
+        :param data:
+        :return:
+        """
+        operation = self.get_operation(operation_id)
+        ttl = self._cache_ttls[operation.operation_id]
+        key = self._cache_key(operation, params, data) if ttl > 0 else None
+        if key is None:
+            return self._execute(operation, params, data)
+        return self.cache.get_or_call(key, ttl, lambda: self._execute(operation, params, data))
 
+    def _execute(self, operation: Operation, params: dict = None, data: dict = None):
+        method, path = operation.method, operation.path
         url = f"{self.base_url}{path}"
 
         try:
@@ -83,6 +257,44 @@ class GenericAPIAdapter(ExternalAPIClient):
             logger.error(f"Other error occurred: {err}")
             raise
 
+    async def aexecute_operation(self, operation_id: str, params: dict = None, data: dict = None):
+        """
+        Execute a specific operation based on the OpenAPI spec without blocking the event loop,
+        over the keep-alive connection pool shared by every adapter of the same base URL.
+        Responses are cached and de-duplicated like in execute_operation.
+        :param operation_id:
+        :param params:
+        :param data:
+        :return:
+        """
+        operation = self.get_operation(operation_id)
+        ttl = self._cache_ttls[operation.operation_id]
+        key = self._cache_key(operation, params, data) if ttl > 0 else None
+        if key is None:
+            return await self._aexecute(operation, params, data)
+        return await self.cache.aget_or_call(
+            key, ttl, lambda: self._aexecute(operation, params, data)
+        )
+
+    async def _aexecute(self, operation: Operation, params: dict = None, data: dict = None):
+        method, path = operation.method, operation.path
+        if method not in SUPPORTED_METHODS:
+            raise ValueError(f"Unsupported method {method} for operation {path}")
+
+        client = self.http_pool.get_client(self.base_url)
+        try:
+            response = await client.request(
+                method.upper(), path, headers=self.headers, params=params, json=data
+            )
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPStatusError as http_err:
+            logger.error(f"HTTP error occurred: {http_err}")
+            raise
+        except Exception as err:
+            logger.error(f"Other error occurred: {err}")
+            raise
+
     def _make_request(self, method, url, params=None, data=None):
         """
         Make a request to the specified URL using the given method.
@@ -92,17 +304,10 @@ class GenericAPIAdapter(ExternalAPIClient):
         :param data:
         :return:
         """
-        request_method = {
-            "get": requests.get,
-            "post": requests.post,
-            "put": requests.put,
-            "delete": requests.delete,
-        }.get(method)
-
-        if not request_method:
+        if method not in SUPPORTED_METHODS:
             raise ValueError(f"Unsupported method {method} for operation {url}")
 
-        return request_method(url, headers=self.headers, params=params, json=data)
+        return requests.request(method.upper(), url, headers=self.headers, params=params, json=data)
 
     @staticmethod
     def load_spec(spec_path: str) -> dict:
@@ -111,82 +316,43 @@ class GenericAPIAdapter(ExternalAPIClient):
         :param spec_path:
         :return:
         """
-        with open(spec_path, "r") as spec_file:
-            return yaml.safe_load(spec_file)
+        with open(spec_path, "rb") as spec_file:
+            return parse_spec(spec_file.read())
 
     def get_method_path_by_operation_id(self, operation_id: str) -> tuple:
-        for path, operations in self.spec.get("paths", {}).items():
-            for method, operation_data in operations.items():
-                # Fallback handling
-                potential_operation_id = operation_data.get(
-                    "operationId", f"{method.upper()} {path}"
-                )
-                if potential_operation_id == operation_id:
-                    return method, path
+        operation = self.operations.get(operation_id)
+        if operation:
+            return operation.method, operation.path
 
     def get_operation_input(self, operation_id: str) -> dict:
         """
         Returns the expected input parameters and request body schema for the specified operation_id.
         Uses method + path as fallback if operationId is not present.
         """
-        for path, operations in self.spec.get("paths", {}).items():
-            for method, operation_data in operations.items():
-                # Fallback handling
-                potential_operation_id = operation_data.get(
-                    "operationId", f"{method.upper()} {path}"
-                )
-                if potential_operation_id == operation_id:
-                    # Get the parameters (path, query, header, etc.)
-                    parameters = operation_data.get("parameters", [])
-
-                    # Get the request body (if it's a POST, PUT, etc.)
-                    request_body = operation_data.get("requestBody", {})
-
-                    # Extract relevant details for each type of input
-                    inputs = {
-                        "parameters": [
-                            {
-                                "name": param.get("name"),
-                                "in": param.get("in"),  # path, query, header, etc.
-                                "required": param.get("required", False),
-                                "schema": param.get("schema", {}),
-                            }
-                            for param in parameters
-                        ],
-                        "requestBody": request_body.get("content", {})
-                        .get("application/json", {})
-                        .get("schema", {}),
-                    }
-                    return inputs
-
-        raise ValueError(f"Operation {operation_id} not found in the API spec.")
+        operation = self.get_operation(operation_id)
+        return {
+            "parameters": [dict(param) for param in operation.parameters],
+            "requestBody": operation.request_body,
+        }
 
     def list_operation_ids(self) -> list:
         """
         Returns a list of available operations. If 'operationId' is missing, fallback to using 'method' and 'path'.
         """
-        operation_ids = []
-        for path, operations in self.spec.get("paths", {}).items():
-            for method, operation_data in operations.items():
-                operation_id = operation_data.get("operationId")
-                if not operation_id:
-                    # Fallback: use method and path as the operation identifier
-                    operation_id = f"{method.upper()} {path}"
-                operation_ids.append(operation_id)
-        return operation_ids
+        return list(self._operation_ids)
+
+    def get_operation_data(self, operation_id: str) -> dict:
+        """
+        Returns the raw OpenAPI operation object for the specified operation_id.
+        """
+        return self.get_operation(operation_id).data
 
     def get_operation_description(self, operation_id: str) -> str:
         """
         Returns the description for a specific operation based on the operation_id or fallback identifier.
+        The description is only generated from the operation data when the spec does not provide one.
         """
-        for path, operations in self.spec.get("paths", {}).items():
-            for method, operation_data in operations.items():
-                # Fallback handling
-                potential_operation_id = operation_data.get(
-                    "operationId", f"{method.upper()} {path}"
-                )
-                if potential_operation_id == operation_id:
-                    return operation_data.get(
-                        "description", generate_description_from_data(operation_data)
-                    )
-        raise ValueError(f"Operation {operation_id} not found in the API spec.")
+        operation = self.get_operation(operation_id)
+        if operation.description is not None:
+            return operation.description
+        return generate_description_from_data(operation.data)
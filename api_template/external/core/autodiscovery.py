@@ -1,28 +1,138 @@
+import hashlib
 import importlib
 import inspect
+import json
+import logging
 import os
 import sys
+import threading
 
 from api_template.external.core.base import BaseHandler
 
+logger = logging.getLogger(__name__)
 
-def autodiscover_handlers(handler_directory: str):
+
+class HandlerManifest:
     """
-    Autodiscover all handler classes that inherit from BaseHandler in the given directory.
-    :param handler_directory: The path to the handlers' directory.
-    :return: List of discovered handler classes.
+    Cached result of the handler discovery, persisted as JSON: the handler classes found in each
+    module (with the mtime and hash of the module, and the service and spec of each class), and
+    for each service the hash of its spec and its operation ids, so unchanged modules don't need
+    to be imported nor unchanged specs parsed at startup.
     """
-    handler_classes = []
 
-    # Add the parent directory of the handler_directory to sys.path
-    parent_dir = os.path.dirname(os.path.dirname(handler_directory))
-    if parent_dir not in sys.path:
-        sys.path.insert(0, parent_dir)
+    def __init__(self, path: str = None):
+        self.path = path
+        self.modules = {}
+        self.services = {}
+        self._saved = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+                self.modules = data.get("modules", {})
+                self.services = data.get("services", {})
+                self._saved = data
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable handler manifest {path}: {e}")
+
+    def to_dict(self) -> dict:
+        return {"modules": self.modules, "services": self.services}
+
+    def save(self):
+        """
+        Writes the manifest atomically, if it changed.
+        :return:
+        """
+        data = self.to_dict()
+        if not self.path or data == self._saved:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+        self._saved = data
+
+    def record_handler(self, handler_class, handler):
+        """
+        Records the service of an instantiated handler, which its module is then lazily loaded
+        with while it doesn't change.
+        :param handler_class: Discovered handler class, or LazyHandlerClass.
+        :param handler: Its instance.
+        :return:
+        """
+        entry = self.modules.get(handler_class.__module__)
+        if entry is not None and handler_class.__name__ in entry["classes"]:
+            entry["classes"][handler_class.__name__] = {
+                "service_name": handler.service_name,
+                "spec_path": handler.spec_path,
+            }
+
+
+class LazyHandler:
+    """
+    Stands for a handler whose module did not change since the last discovery: the module is
+    imported, and the handler instantiated, on first use. Meanwhile the API of the handler is a
+    deferred registration of the API manager, so getting the API also loads the handler.
+    """
+
+    def __init__(self, module_name: str, class_name: str, service: dict, api_manager):
+        self.service_name = service["service_name"]
+        self.spec_path = service["spec_path"]
+        self._module_name = module_name
+        self._class_name = class_name
+        self._api_manager = api_manager
+        self._handler = None
+        self._lock = threading.Lock()
+        api_manager.defer_registration(self.service_name, self.spec_path, self.load)
+
+    def load(self):
+        """
+        Imports the module and instantiates the handler, once.
+        :return: The handler.
+        """
+        with self._lock:
+            if self._handler is None:
+                logger.info(f"Loading handler {self._module_name}.{self._class_name}")
+                module = importlib.import_module(self._module_name)
+                handler_class = getattr(module, self._class_name, None)
+                if handler_class is None:
+                    raise ImportError(f"{self._class_name} not found in {self._module_name}")
+                self._handler = handler_class(self._api_manager)
+        return self._handler
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
+
+
+class LazyHandlerClass:
+    """
+    Returned by autodiscover_handlers in place of the class of an unchanged module: called with
+    the API manager, like the class, it creates a LazyHandler.
+    """
+
+    def __init__(self, module_name: str, class_name: str, service: dict):
+        self.__module__ = module_name
+        self.__name__ = class_name
+        self.service = service
+
+    def __call__(self, api_manager) -> LazyHandler:
+        return LazyHandler(self.__module__, self.__name__, self.service, api_manager)
+
+
+def _find_handler_modules(handler_directory: str, parent_dir: str) -> dict:
+    """
+    Walks the handlers' directory.
+    :return: Dict of module name to its file path and the mtime of the file.
+    """
+    modules = {}
     for root, dirs, files in os.walk(handler_directory):
-        for file in files:
+        dirs.sort()
+        for file in sorted(files):
             if file.endswith(".py") and not file.startswith("__"):
                 # Derive the module name from the file path
-                module_path = os.path.relpath(os.path.join(root, file), start=parent_dir)
+                file_path = os.path.join(root, file)
+                module_path = os.path.relpath(file_path, start=parent_dir)
                 # Construct the full module name
                 full_module_name = (
                     module_path.replace("/", ".")
@@ -30,15 +140,86 @@ def autodiscover_handlers(handler_directory: str):
                     .replace(".py", "")
                     .replace("...", "api_template.external.")
                 )
-                try:
-                    # Dynamically import the module
-                    module = importlib.import_module(full_module_name)
+                modules[full_module_name] = (file_path, os.stat(file_path).st_mtime_ns)
+    return modules
+
+
+def _file_hash(file_path: str) -> str:
+    with open(file_path, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+def _unchanged_entry(cached: dict, file_path: str, mtime_ns: int):
+    """
+    The manifest entry of a module, with its mtime updated, if the module did not change.
+    :return: None if it changed, or if a class of the module was never instantiated.
+    """
+    if not cached or not isinstance(cached.get("classes"), dict):
+        return None
+    services = cached["classes"].values()
+    if not all(service and os.path.exists(service["spec_path"]) for service in services):
+        return None
+    if cached.get("mtime_ns") != mtime_ns:
+        # Touched, checked out again...: only the content matters
+        if cached.get("hash") != _file_hash(file_path):
+            return None
+    return {**cached, "mtime_ns": mtime_ns}
+
+
+def _inspect_handler_classes(module) -> list:
+    return [
+        obj
+        for name, obj in inspect.getmembers(module, inspect.isclass)
+        if issubclass(obj, BaseHandler) and obj != BaseHandler
+    ]
+
+
+def autodiscover_handlers(handler_directory: str, manifest: HandlerManifest = None):
+    """
+    Autodiscover all handler classes that inherit from BaseHandler in the given directory.
+    With a manifest, modules that did not change since the last discovery are not imported:
+    their classes are LazyHandlerClass, which import them on first use. The manifest is updated,
+    and HandlerManifest.record_handler must be called once the new classes are instantiated.
+    :param handler_directory: The path to the handlers' directory.
+    :param manifest: Optional cached discovery manifest.
+    :return: List of discovered handler classes.
+    """
+    handler_classes = []
+
+    # Add the parent directory of the handler_directory to sys.path
+    parent_dir = os.path.dirname(os.path.dirname(handler_directory))
+    if parent_dir not in sys.path:
+        sys.path.insert(0, parent_dir)
+
+    discovered_modules = {}
+    modules = _find_handler_modules(handler_directory, parent_dir)
+    for full_module_name, (file_path, mtime_ns) in modules.items():
+        cached = manifest.modules.get(full_module_name) if manifest else None
+        entry = _unchanged_entry(cached, file_path, mtime_ns)
+        if entry is not None:
+            handler_classes.extend(
+                LazyHandlerClass(full_module_name, class_name, service)
+                for class_name, service in entry["classes"].items()
+            )
+            discovered_modules[full_module_name] = entry
+            continue
+
+        try:
+            # Dynamically import the module
+            module = importlib.import_module(full_module_name)
+        except ImportError as e:
+            print(f"Error importing {full_module_name}: {e}")
+            continue
 
-                    # Inspect the module for classes that inherit from BaseHandler
-                    for name, obj in inspect.getmembers(module, inspect.isclass):
-                        if issubclass(obj, BaseHandler) and obj != BaseHandler:
-                            handler_classes.append(obj)
-                except ImportError as e:
-                    print(f"Error importing {full_module_name}: {e}")
+        # Inspect the module for classes that inherit from BaseHandler
+        classes = _inspect_handler_classes(module)
+        handler_classes.extend(classes)
+        discovered_modules[full_module_name] = {
+            "mtime_ns": mtime_ns,
+            "hash": _file_hash(file_path),
+            "classes": {cls.__name__: None for cls in classes},
+        }
 
+    if manifest is not None:
+        manifest.modules = discovered_modules
     return handler_classes
@@ -24,6 +24,14 @@ class BaseHandler:
             self.service_name, operation_id, params=params, data=data
         )
 
+    async def aexecute_operation(self, operation_id: str, params: dict = None, data: dict = None):
+        """
+        Async version of execute_operation, over the pooled HTTP clients of the API manager.
+        """
+        return await self.api_manager.aexecute_operation(
+            self.service_name, operation_id, params=params, data=data
+        )
+
     def get_operation_input(self, service_name: str, operation_id: str):
         """
         Get the input requirements for a specific operation.
@@ -0,0 +1,88 @@
+import logging
+import threading
+from typing import Dict, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    """
+    HTTP/2 needs the optional `h2` package.
+    :return:
+    """
+    try:
+        import h2  # noqa: F401
+
+        return True
+    except ImportError:
+        return False
+
+
+class HTTPClientPool:
+    """
+    Shared keep-alive connection pools for external APIs: one `httpx.AsyncClient` per base URL,
+    created on first use and reused by every request to that base URL.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        timeout: float = 30.0,
+        connect_timeout: float = 5.0,
+        http2: bool = True,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.http2 = http2 and http2_available()
+        self.transport = transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._lock = threading.Lock()
+
+    def get_client(self, base_url: str) -> httpx.AsyncClient:
+        """
+        Returns the pooled client for a base URL, creating it if needed.
+        :param base_url:
+        :return:
+        """
+        client = self._clients.get(base_url)
+        if client is not None and not client.is_closed:
+            return client
+
+        with self._lock:
+            client = self._clients.get(base_url)
+            if client is None or client.is_closed:
+                logger.info(f"Creating HTTP connection pool for {base_url} (http2={self.http2})")
+                client = httpx.AsyncClient(
+                    base_url=base_url,
+                    limits=self.limits,
+                    timeout=self.timeout,
+                    http2=self.http2,
+                    transport=self.transport,
+                )
+                self._clients[base_url] = client
+        return client
+
+    def list_base_urls(self):
+        return list(self._clients.keys())
+
+    async def aclose(self):
+        """
+        Closes every pooled client.
+        :return:
+        """
+        with self._lock:
+            clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.error(f"Error closing HTTP client {client.base_url}: {e}")
@@ -1,4 +1,22 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+from api_template.config.settings import settings
 from api_template.external.core.adapters import GenericAPIAdapter
+from api_template.external.core.http_pool import HTTPClientPool
+from api_template.external.core.spec_cache import SpecCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SPEC_CACHE_DIR = os.path.join(os.path.dirname(__file__), "data", "spec_cache")
+
+
+def _log_warm_up_error(future):
+    if future.exception() is not None:
+        logger.error(f"Error loading API spec: {future.exception()}")
 
 
 class APIManager:
@@ -8,26 +26,134 @@ class APIManager:
         if cls._instance is None:
             cls._instance = super(APIManager, cls).__new__(cls)
             cls._instance._apis = {}
+            cls._instance._registrations = {}
+            cls._instance._deferred = {}
+            cls._instance._lock = threading.Lock()
+            cls._instance.lazy = settings.EXTERNAL_LAZY_SPECS
+            spec_cache_dir = settings.EXTERNAL_SPEC_CACHE_DIR
+            cls._instance.spec_cache = SpecCache(
+                DEFAULT_SPEC_CACHE_DIR if spec_cache_dir is None else spec_cache_dir
+            )
+            cls._instance._http_pool = HTTPClientPool(
+                max_connections=settings.EXTERNAL_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.EXTERNAL_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.EXTERNAL_HTTP_KEEPALIVE_EXPIRY,
+                timeout=settings.EXTERNAL_HTTP_TIMEOUT,
+                connect_timeout=settings.EXTERNAL_HTTP_CONNECT_TIMEOUT,
+                http2=settings.EXTERNAL_HTTP2,
+            )
         return cls._instance
 
-    def register_api(self, service_name: str, base_url: str, spec_path: str, headers: dict = None):
-        if service_name not in self._apis:
-            spec = GenericAPIAdapter.load_spec(spec_path)
-            self._apis[service_name] = GenericAPIAdapter(
-                base_url=base_url, spec=spec, headers=headers
-            )
-            print(f"self._apis[{service_name}]: {self._apis[service_name]}")
+    def register_api(
+        self,
+        service_name: str,
+        base_url: str,
+        spec_path: str,
+        headers: dict = None,
+        cache_ttls: dict = None,
+    ):
+        """
+        Registers an API. In lazy mode its spec is only parsed on first use (or by warm_up).
+        """
+        self._deferred.pop(service_name, None)
+        if service_name not in self._registrations:
+            self._registrations[service_name] = {
+                "base_url": base_url,
+                "spec_path": spec_path,
+                "headers": headers,
+                "cache_ttls": cache_ttls,
+            }
+            if not self.lazy:
+                self._load_api(service_name)
 
-    def get_api(self, service_name: str) -> GenericAPIAdapter:
-        if service_name not in self._apis:
+    def defer_registration(self, service_name: str, spec_path: str, register: Callable):
+        """
+        Declares an API whose handler was not imported yet. register is called the first time
+        the API is needed, and must register it; its spec hash is known without it.
+        """
+        if service_name not in self._registrations:
+            self._deferred[service_name] = {"spec_path": spec_path, "register": register}
+
+    def _registration(self, service_name: str) -> dict:
+        registration = self._registrations.get(service_name)
+        if registration is not None:
+            return registration
+        deferred = self._deferred.get(service_name)
+        if deferred is not None:
+            # Idempotent, as other threads may need the API meanwhile
+            deferred["register"]()
+        if service_name not in self._registrations:
             raise ValueError(f"API {service_name} is not registered.")
-        return self._apis[service_name]
+        return self._registrations[service_name]
+
+    def _load_api(self, service_name: str) -> GenericAPIAdapter:
+        """
+        Parses the spec of a registered API (through the spec cache) and creates its adapter.
+        """
+        registration = self._registration(service_name)
+        spec = self.spec_cache.load(registration["spec_path"])
+        adapter = GenericAPIAdapter(
+            base_url=registration["base_url"],
+            spec=spec,
+            headers=registration["headers"],
+            http_pool=self._http_pool,
+            cache_maxsize=settings.EXTERNAL_CACHE_MAXSIZE,
+            cache_ttl=settings.EXTERNAL_CACHE_TTL,
+            cache_ttls=registration["cache_ttls"],
+        )
+        with self._lock:
+            # Another thread may have loaded it meanwhile, keep the first adapter.
+            adapter = self._apis.setdefault(service_name, adapter)
+        logger.info(f"Loaded API {service_name}: {adapter}")
+        return adapter
+
+    def get_api(self, service_name: str) -> GenericAPIAdapter:
+        api = self._apis.get(service_name)
+        if api is not None:
+            return api
+        return self._load_api(service_name)
+
+    def get_spec_hash(self, service_name: str) -> str:
+        """
+        Returns the content hash of the spec of a registered API, without parsing it.
+        """
+        if service_name in self._deferred:
+            return self.spec_cache.fingerprint(self._deferred[service_name]["spec_path"])
+        return self.spec_cache.fingerprint(self._registration(service_name)["spec_path"])
 
     def list_apis(self):
-        return list(self._apis.keys())
+        return list(self._registrations.keys()) + list(self._deferred.keys())
+
+    def warm_up(self, max_workers: int = 4) -> list:
+        """
+        Loads the registered APIs that were not used yet in a background thread pool.
+        :return: List of futures, one per API being loaded.
+        """
+        pending = [name for name in self._registrations if name not in self._apis]
+        if not pending or max_workers <= 0:
+            return []
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="spec-warm-up")
+        futures = [executor.submit(self._load_api, name) for name in pending]
+        for future in futures:
+            future.add_done_callback(_log_warm_up_error)
+        executor.shutdown(wait=False)
+        return futures
 
     def execute_operation(
         self, service_name: str, operation_id: str, params: dict = None, data: dict = None
     ):
         api = self.get_api(service_name)
         return api.execute_operation(operation_id, params=params, data=data)
+
+    async def aexecute_operation(
+        self, service_name: str, operation_id: str, params: dict = None, data: dict = None
+    ):
+        api = self.get_api(service_name)
+        return await api.aexecute_operation(operation_id, params=params, data=data)
+
+    async def aclose(self):
+        """
+        Closes the HTTP connection pools of every registered API.
+        """
+        await self._http_pool.aclose()
@@ -0,0 +1,170 @@
+import asyncio
+import copy
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Hashable
+
+from cachetools import TLRUCache
+
+
+class _CountingTLRUCache(TLRUCache):
+    """
+    TLRUCache that counts the entries evicted to make room for new ones.
+    """
+
+    def __init__(self, maxsize, ttu, stats: Counter):
+        super().__init__(maxsize, ttu)
+        self._stats = stats
+
+    def popitem(self):
+        item = super().popitem()
+        self._stats["evictions"] += 1
+        return item
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        self._stats["expirations"] += len(expired)
+        return expired
+
+
+_IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+def _copy(value: Any) -> Any:
+    # Values are decoded JSON: every caller gets its own copy to mutate
+    return value if isinstance(value, _IMMUTABLE_TYPES) else copy.deepcopy(value)
+
+
+class _LeaderCancelled(Exception):
+    """
+    Set on the in-flight future when the caller making the upstream request is cancelled, so
+    that the callers waiting for it retry instead of being cancelled too.
+    """
+
+
+class ResponseCache:
+    """
+    Response cache for external API operations, with a TTL per entry and single-flight
+    de-duplication: concurrent calls with the same key share a single upstream request.
+
+    Each caller gets a copy of the cached value, so that mutating a result never changes
+    what later callers get.
+    """
+
+    def __init__(self, maxsize: int = 100):
+        self.stats = Counter()
+        self._cache = _CountingTLRUCache(
+            maxsize, lambda key, value, now: now + value[0], self.stats
+        )
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._ainflight = {}
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _lookup(self, key: Hashable):
+        with self._lock:
+            entry = self._cache.get(key)
+            self.stats["hits" if entry is not None else "misses"] += 1
+        return entry
+
+    def _store(self, key: Hashable, ttl: float, value: Any):
+        with self._lock:
+            self._cache[key] = (ttl, value)
+
+    def get_or_call(self, key: Hashable, ttl: float, func: Callable[[], Any]):
+        """
+        Returns the cached value for key, or calls func once for all concurrent callers and
+        caches its result for ttl seconds. Exceptions are propagated and never cached.
+        :param key:
+        :param ttl:
+        :param func:
+        :return:
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            return _copy(entry[1])
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+        if not leader:
+            return _copy(future.result())
+
+        try:
+            value = func()
+            stored = _copy(value)
+            self._store(key, ttl, stored)
+            future.set_result(stored)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    async def aget_or_call(self, key: Hashable, ttl: float, func: Callable[[], Awaitable[Any]]):
+        """
+        Async version of get_or_call: concurrent callers await the same upstream request. When
+        the caller making it is cancelled, one of the waiting callers makes it again.
+        :param key:
+        :param ttl:
+        :param func:
+        :return:
+        """
+        while True:
+            entry = self._lookup(key)
+            if entry is not None:
+                return _copy(entry[1])
+            future = self._ainflight.get(key)
+            if future is None:
+                break
+            self.stats["coalesced"] += 1
+            try:
+                return _copy(await asyncio.shield(future))
+            except _LeaderCancelled:
+                continue
+
+        future = self._ainflight[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await func()
+            stored = _copy(value)
+            self._store(key, ttl, stored)
+            future.set_result(stored)
+            return value
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting for it.
+            future.exception()
+            raise
+        finally:
+            self._ainflight.pop(key, None)
+
+    def metrics(self) -> dict:
+        """
+        Returns the hit/miss/eviction counters and the current size of the cache.
+        :return:
+        """
+        return {
+            "hits": self.stats["hits"],
+            "misses": self.stats["misses"],
+            "coalesced": self.stats["coalesced"],
+            "evictions": self.stats["evictions"],
+            "expirations": self.stats["expirations"],
+            "size": len(self._cache),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
@@ -1,33 +1,42 @@
 import os
 
-from api_template.external.core.autodiscovery import autodiscover_handlers
+from api_template.config.settings import settings
+from api_template.external.core.autodiscovery import HandlerManifest, autodiscover_handlers
 from api_template.external.core.manager import APIManager
+from api_template.utils.index_manifest import content_hash
 from api_template.utils.semantic_search import SemanticSearch
 
 
 class APISetup:
     _instance = None
+    handler_directory = os.path.dirname(__file__) + "/../handlers"
+    data_path = os.path.join(os.path.dirname(__file__), "data")
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(APISetup, cls).__new__(cls)
             cls._instance.api_manager = APIManager()
+            cls._instance.handler_manifest = HandlerManifest(
+                os.path.join(cls.data_path, "handlers.manifest.json")
+            )
             cls._instance.handlers = cls._instance._initialize_handlers()
             cls._instance.semantic_search = SemanticSearch(
                 collection_name="api_descriptions",
-                cache_path=os.path.join(os.path.dirname(__file__), "data"),
+                cache_path=cls.data_path,
             )
             cls._instance._index_api_descriptions()
+            if cls._instance.api_manager.lazy:
+                cls._instance.api_manager.warm_up(settings.EXTERNAL_SPEC_WARMUP_WORKERS)
         return cls._instance
 
     def _initialize_handlers(self):
-        handler_directory = os.path.dirname(__file__) + "/../handlers"
-        discovered_handlers = autodiscover_handlers(handler_directory)
+        discovered_handlers = autodiscover_handlers(self.handler_directory, self.handler_manifest)
 
         handlers_instances = {}
         for handler_class in discovered_handlers:
             handler_instance = handler_class(self.api_manager)
             handlers_instances[handler_class.__name__] = handler_instance
+            self.handler_manifest.record_handler(handler_class, handler_instance)
 
         return handlers_instances
 
@@ -45,16 +54,44 @@ class APISetup:
     def _index_api_descriptions(self):
         """
         Indexes the descriptions of the APIs in the semantic search engine.
+        Descriptions of operations whose spec did not change since the last indexing are taken
+        from the index manifest instead of being derived again (which may call an LLM), and
+        specs whose file did not change are not even parsed.
         """
+        manifest = self.semantic_search.manifest
         specs = {}
+        source_hashes = {}
+        services = {}
         for handler_name, handler in self.handlers.items():
-            api_adapter = self.api_manager.get_api(handler.service_name)
+            service_name = handler.service_name
+            spec_hash = self.api_manager.get_spec_hash(service_name)
+            known = self.handler_manifest.services.get(service_name)
+            if (
+                known
+                and known["spec_hash"] == spec_hash
+                and all(operation_id in manifest.entries for operation_id in known["operation_ids"])
+            ):
+                operation_ids = known["operation_ids"]
+                for operation_id in operation_ids:
+                    specs[operation_id] = manifest.entries[operation_id]["description"]
+                    source_hashes[operation_id] = manifest.entries[operation_id]["source_hash"]
+                services[service_name] = known
+                continue
+
+            api_adapter = self.api_manager.get_api(service_name)
             operation_ids = api_adapter.list_operation_ids()
             for operation_id in operation_ids:
-                description = api_adapter.get_operation_description(operation_id)
+                source_hash = content_hash(api_adapter.get_operation_data(operation_id))
+                description = manifest.description_for(operation_id, source_hash)
+                if description is None:
+                    description = api_adapter.get_operation_description(operation_id)
                 specs[operation_id] = description
+                source_hashes[operation_id] = source_hash
+            services[service_name] = {"spec_hash": spec_hash, "operation_ids": operation_ids}
 
-        self.semantic_search.index_specs(specs)
+        self.semantic_search.index_specs(specs, source_hashes)
+        self.handler_manifest.services = services
+        self.handler_manifest.save()
 
     def search(self, query):
         """
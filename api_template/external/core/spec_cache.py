@@ -0,0 +1,127 @@
+import hashlib
+import logging
+import os
+import pickle
+from collections import Counter
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+# libyaml's loader is an order of magnitude faster than the pure Python one.
+SPEC_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def parse_spec(raw: bytes) -> dict:
+    """
+    Parses a YAML (or JSON) OpenAPI spec.
+    :param raw:
+    :return:
+    """
+    return yaml.load(raw, Loader=SPEC_LOADER)
+
+
+class SpecCache:
+    """
+    Cache of parsed OpenAPI specs in pickle form, one file per spec. Each file starts with a
+    header (mtime, size and content hash of the source), so a spec is only parsed again when
+    its content changes. Without a cache_dir, specs are parsed on every load.
+    """
+
+    def __init__(self, cache_dir: str = None):
+        self.cache_dir = cache_dir
+        self.stats = Counter()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _digest(raw: bytes) -> str:
+        return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+    def _cache_file(self, spec_path: str) -> str:
+        name = hashlib.blake2b(os.path.abspath(spec_path).encode("utf-8"), digest_size=16)
+        return os.path.join(self.cache_dir, f"{name.hexdigest()}.pickle")
+
+    def _read_header(self, spec_path: str, f):
+        try:
+            return pickle.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable spec cache for {spec_path}: {e}")
+            return None
+
+    def _write(self, spec_path: str, header: dict, spec: dict):
+        cache_file = self._cache_file(spec_path)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(spec, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+
+    def fingerprint(self, spec_path: str) -> str:
+        """
+        Returns the content hash of a spec, from the cache header when the file did not change.
+        :param spec_path:
+        :return:
+        """
+        stat = os.stat(spec_path)
+        if self.cache_dir:
+            try:
+                with open(self._cache_file(spec_path), "rb") as f:
+                    header = self._read_header(spec_path, f)
+                if self._is_fresh(header, stat):
+                    return header["hash"]
+            except FileNotFoundError:
+                pass
+        with open(spec_path, "rb") as f:
+            return self._digest(f.read())
+
+    @staticmethod
+    def _is_fresh(header, stat) -> bool:
+        return (
+            isinstance(header, dict)
+            and header.get("mtime_ns") == stat.st_mtime_ns
+            and header.get("size") == stat.st_size
+        )
+
+    def load(self, spec_path: str) -> dict:
+        """
+        Returns the parsed spec, from the cache when its source did not change.
+        :param spec_path:
+        :return:
+        """
+        if not self.cache_dir:
+            self.stats["misses"] += 1
+            with open(spec_path, "rb") as f:
+                return parse_spec(f.read())
+
+        stat = os.stat(spec_path)
+        header = None
+        try:
+            with open(self._cache_file(spec_path), "rb") as f:
+                header = self._read_header(spec_path, f)
+                if self._is_fresh(header, stat):
+                    self.stats["hits"] += 1
+                    return pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable spec cache for {spec_path}: {e}")
+            header = None
+
+        with open(spec_path, "rb") as f:
+            raw = f.read()
+        digest = self._digest(raw)
+        spec = None
+        if isinstance(header, dict) and header.get("hash") == digest:
+            # Touched but unchanged: keep the parsed spec and refresh the header.
+            with open(self._cache_file(spec_path), "rb") as f:
+                pickle.load(f)
+                spec = pickle.load(f)
+            self.stats["hits"] += 1
+        else:
+            spec = parse_spec(raw)
+            self.stats["misses"] += 1
+
+        header = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "hash": digest}
+        self._write(spec_path, header, spec)
+        return spec
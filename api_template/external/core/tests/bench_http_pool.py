@@ -0,0 +1,116 @@
+"""
+Load test of GenericAPIAdapter against a local stub server: the sync path (module-level
+`requests`, called from a coroutine as the websearch controller did) vs `aexecute_operation`
+over the pooled keep-alive clients.
+
+Run with: python -m api_template.external.core.tests.bench_http_pool
+"""
+
+import asyncio
+import json
+import multiprocessing
+import statistics
+import time
+
+from api_template.external.core.adapters import GenericAPIAdapter
+from api_template.external.core.http_pool import HTTPClientPool
+
+NUM_REQUESTS = 500
+CONCURRENCY = 10
+SERVER_LATENCY = 0.005
+
+SPEC = {"paths": {"/search": {"post": {"operationId": "search"}}}}
+
+
+RESPONSE_BODY = json.dumps({"results": []}).encode()
+RESPONSE = (
+    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+    + f"Content-Length: {len(RESPONSE_BODY)}\r\n\r\n".encode()
+    + RESPONSE_BODY
+)
+
+
+async def handle_connection(reader, writer):
+    """
+    Minimal HTTP/1.1 keep-alive handler: answers every request after SERVER_LATENCY.
+    """
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            await asyncio.sleep(SERVER_LATENCY)
+            writer.write(RESPONSE)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+def report(label, latencies, elapsed):
+    latencies = sorted(latencies)
+    print(
+        f"{label:<32} p50={statistics.median(latencies) * 1000:7.2f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:7.2f}ms "
+        f"throughput={len(latencies) / elapsed:8.1f} req/s"
+    )
+
+
+async def run_sync_path(adapter):
+    latencies = []
+
+    async def call():
+        start = time.perf_counter()
+        adapter.execute_operation("search", data={"query": "q"})
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(NUM_REQUESTS)))
+    report("sync requests (current path)", latencies, time.perf_counter() - start)
+
+
+async def run_async_path(adapter):
+    latencies = []
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def call():
+        async with semaphore:
+            start = time.perf_counter()
+            await adapter.aexecute_operation("search", data={"query": "q"})
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(call() for _ in range(NUM_REQUESTS)))
+    report(f"aexecute_operation (c={CONCURRENCY})", latencies, time.perf_counter() - start)
+    await adapter.http_pool.aclose()
+
+
+def serve(port):
+    async def run():
+        server = await asyncio.start_server(handle_connection, "127.0.0.1", port, backlog=1024)
+        await server.serve_forever()
+
+    asyncio.run(run())
+
+
+def main():
+    # The stub server runs in its own process so it does not compete for the GIL.
+    port = 18765
+    server = multiprocessing.Process(target=serve, args=(port,), daemon=True)
+    server.start()
+    time.sleep(0.5)
+    base_url = f"http://127.0.0.1:{port}"
+    print(f"{NUM_REQUESTS} requests, server latency {SERVER_LATENCY * 1000:.0f}ms")
+
+    http_pool = HTTPClientPool(max_keepalive_connections=CONCURRENCY)
+    asyncio.run(run_sync_path(GenericAPIAdapter(base_url, SPEC)))
+    asyncio.run(run_async_path(GenericAPIAdapter(base_url, SPEC, http_pool=http_pool)))
+    server.terminate()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Micro-benchmark of GenericAPIAdapter operation lookups on a 5k-operation spec: the compiled
+operation table vs the nested scan of spec["paths"] used before.
+
+Run with: python -m api_template.external.core.tests.bench_operation_lookup
+"""
+
+import random
+import timeit
+
+from api_template.external.core.adapters import GenericAPIAdapter
+
+NUM_PATHS = 2500  # Two operations per path
+LOOKUPS = 1000
+
+
+def build_spec():
+    paths = {}
+    for i in range(NUM_PATHS):
+        paths[f"/resources_{i}/{{id}}"] = {
+            "get": {
+                "operationId": f"get_resource_{i}",
+                "description": f"Returns resource {i}.",
+                "parameters": [{"name": "id", "in": "path", "required": True}],
+            },
+            "delete": {"description": f"Deletes resource {i}."},
+        }
+    return {"paths": paths}
+
+
+def scan_operation(spec, operation_id):
+    for path, operations in spec.get("paths", {}).items():
+        for method, operation_data in operations.items():
+            if operation_data.get("operationId", f"{method.upper()} {path}") == operation_id:
+                return operation_data
+
+
+def main():
+    spec = build_spec()
+    start = timeit.default_timer()
+    adapter = GenericAPIAdapter("http://api.test", spec)
+    compile_time = timeit.default_timer() - start
+
+    operation_ids = adapter.list_operation_ids()
+    targets = random.Random(0).choices(operation_ids, k=LOOKUPS)
+
+    scan = timeit.timeit(lambda: [scan_operation(spec, t) for t in targets], number=1)
+    table = timeit.timeit(lambda: [adapter.get_operation_data(t) for t in targets], number=1)
+    inputs = timeit.timeit(lambda: [adapter.get_operation_input(t) for t in targets], number=1)
+
+    print(f"{len(operation_ids)} operations, compiled in {compile_time * 1000:.1f}ms")
+    print(f"nested scan lookup:    {scan / LOOKUPS * 1e6:10.2f}us per call")
+    print(f"operation table:       {table / LOOKUPS * 1e6:10.2f}us per call")
+    print(f"get_operation_input:   {inputs / LOOKUPS * 1e6:10.2f}us per call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Cold-start benchmark of APISetup with 50 generated handlers, each with a 40-operation spec.
+Each start runs in a fresh process. "eager" reproduces the previous startup: every spec parsed
+with the pure Python YAML loader when its handler registers, and re-read to be indexed.
+
+Run with: python -m api_template.external.core.tests.bench_startup
+"""
+
+import multiprocessing
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import yaml
+
+NUM_HANDLERS = 50
+NUM_OPERATIONS = 40
+RUNS = 3
+PACKAGE = "bench_handlers"
+
+HANDLER_TEMPLATE = """import os
+
+from api_template.external.core.base import BaseHandler
+
+
+class BenchHandler{i}(BaseHandler):
+    def __init__(self, api_manager):
+        super().__init__(api_manager)
+        self.service_name = "bench_service_{i}"
+        self.base_url = "http://bench{i}.test"
+        self.spec_path = os.path.join(os.path.dirname(__file__), "openapi.yaml")
+        self.register_api()
+"""
+
+
+def build_spec(i):
+    paths = {}
+    for j in range(NUM_OPERATIONS):
+        paths[f"/service_{i}/resources_{j}/{{id}}"] = {
+            "get": {
+                "operationId": f"get_resource_{i}_{j}",
+                "description": f"Returns resource {j} of service {i}.",
+                "parameters": [
+                    {"name": "id", "in": "path", "required": True, "schema": {"type": "string"}},
+                    {"name": "expand", "in": "query", "schema": {"type": "boolean"}},
+                ],
+                "responses": {
+                    "200": {
+                        "description": "Resource",
+                        "content": {
+                            "application/json": {
+                                "schema": {
+                                    "type": "object",
+                                    "properties": {
+                                        f"field_{k}": {"type": "string"} for k in range(10)
+                                    },
+                                }
+                            }
+                        },
+                    }
+                },
+            }
+        }
+    return {"openapi": "3.0.0", "info": {"title": f"Service {i}"}, "paths": paths}
+
+
+def create_handlers(handler_directory):
+    os.makedirs(handler_directory)
+    open(os.path.join(handler_directory, "__init__.py"), "w").close()
+    for i in range(NUM_HANDLERS):
+        directory = os.path.join(handler_directory, f"handler_{i}")
+        os.makedirs(directory)
+        open(os.path.join(directory, "__init__.py"), "w").close()
+        with open(os.path.join(directory, "handler.py"), "w") as f:
+            f.write(HANDLER_TEMPLATE.format(i=i))
+        with open(os.path.join(directory, "openapi.yaml"), "w") as f:
+            yaml.safe_dump(build_spec(i), f)
+
+
+def start(mode, handler_directory, data_path, results):
+    os.environ["EXTERNAL_LAZY_SPECS"] = "false" if mode == "eager" else "true"
+    os.environ["EXTERNAL_SPEC_CACHE_DIR"] = "" if mode == "eager" else f"{data_path}/spec_cache"
+    os.environ["EXTERNAL_SPEC_WARMUP_WORKERS"] = "0"
+
+    import functools
+
+    from api_template.external.core import setup, spec_cache
+    from api_template.utils.semantic_search import SemanticSearch
+
+    if mode == "eager":
+        spec_cache.SPEC_LOADER = yaml.SafeLoader
+        manifest = os.path.join(data_path, "handlers.manifest.json")
+        if os.path.exists(manifest):
+            os.remove(manifest)
+
+    setup.SemanticSearch = functools.partial(
+        SemanticSearch,
+        vector_size=4,
+        embedding_fn=lambda texts: [[1.0, 0.0, 0.0, float(len(t))] for t in texts],
+        backend="numpy",
+    )
+    setup.APISetup.handler_directory = handler_directory
+    setup.APISetup.data_path = data_path
+
+    begin = time.perf_counter()
+    api_setup = setup.APISetup()
+    ready = time.perf_counter() - begin
+    begin = time.perf_counter()
+    api_setup.api_manager.get_api("bench_service_0")
+    first_use = time.perf_counter() - begin
+    results.put((ready, first_use, len(api_setup.semantic_search.manifest.entries)))
+
+
+def measure(mode, handler_directory, data_path):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=start, args=(mode, handler_directory, data_path, results)
+    )
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    external_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    handler_directory = os.path.join(external_dir, "core", "..", PACKAGE)
+    create_handlers(handler_directory)
+    try:
+        for mode in ("eager", "lazy"):
+            with tempfile.TemporaryDirectory() as data_path:
+                first, first_use, entries = measure(mode, handler_directory, data_path)
+                runs = [measure(mode, handler_directory, data_path) for _ in range(RUNS)]
+                print(
+                    f"{mode:>5}: first start {first * 1000:7.1f} ms | "
+                    f"restart {statistics.median(r[0] for r in runs) * 1000:7.1f} ms | "
+                    f"first use of an API {statistics.median(r[1] for r in runs) * 1000:6.2f} ms"
+                    f" | {entries} operations indexed"
+                )
+    finally:
+        shutil.rmtree(os.path.join(external_dir, PACKAGE))
+
+
+if __name__ == "__main__":
+    main()
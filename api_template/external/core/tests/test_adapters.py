@@ -0,0 +1,205 @@
+import json
+
+import httpx
+import pytest
+
+from api_template.external.core.adapters import GenericAPIAdapter
+from api_template.external.core.http_pool import HTTPClientPool
+
+SPEC = {
+    "paths": {
+        "/search": {"post": {"operationId": "search"}},
+        "/items/{id}": {"get": {"operationId": "get_item"}},
+    }
+}
+
+
+@pytest.fixture
+def requests_seen():
+    return []
+
+
+@pytest.fixture
+def http_pool(requests_seen):
+    def handler(request: httpx.Request):
+        requests_seen.append(request)
+        return httpx.Response(
+            200, json={"path": request.url.path, "body": request.content.decode()}
+        )
+
+    return HTTPClientPool(http2=False, transport=httpx.MockTransport(handler))
+
+
+@pytest.mark.asyncio
+async def test_aexecute_operation_uses_the_pooled_client(http_pool, requests_seen):
+    adapter = GenericAPIAdapter("http://api.test", SPEC, {"X-Key": "k"}, http_pool=http_pool)
+    other = GenericAPIAdapter("http://api.test", SPEC, http_pool=http_pool)
+
+    result = await adapter.aexecute_operation("search", data={"query": "q"})
+    await other.aexecute_operation("GET /items/{id}", params={"a": 1})
+
+    assert result == {"path": "/search", "body": json.dumps({"query": "q"})}
+    assert requests_seen[0].headers["X-Key"] == "k"
+    assert requests_seen[1].url.params["a"] == "1"
+    assert http_pool.list_base_urls() == ["http://api.test"]
+    await http_pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_aexecute_operation_raises_on_http_errors():
+    pool = HTTPClientPool(transport=httpx.MockTransport(lambda request: httpx.Response(503)))
+    adapter = GenericAPIAdapter("http://api.test", SPEC, http_pool=pool)
+
+    with pytest.raises(httpx.HTTPStatusError):
+        await adapter.aexecute_operation("search", data={})
+
+
+@pytest.mark.asyncio
+async def test_aexecute_operation_rejects_unknown_operations(http_pool):
+    adapter = GenericAPIAdapter("http://api.test", SPEC, http_pool=http_pool)
+
+    with pytest.raises(ValueError):
+        await adapter.aexecute_operation("DELETE /search")
+
+
+@pytest.mark.asyncio
+async def test_aclose_closes_clients(http_pool):
+    client = http_pool.get_client("http://api.test")
+
+    await http_pool.aclose()
+
+    assert client.is_closed
+    assert http_pool.get_client("http://api.test") is not client
+
+
+METHODS_SPEC = {
+    "paths": {
+        "/items/{id}": {
+            "patch": {"operationId": "update_item"},
+            "options": {"operationId": "item_options"},
+        }
+    }
+}
+
+
+@pytest.mark.asyncio
+async def test_sync_and_async_paths_support_the_same_methods(http_pool, requests_seen, mocker):
+    adapter = GenericAPIAdapter("http://api.test", METHODS_SPEC, http_pool=http_pool)
+    response = mocker.Mock()
+    response.json.return_value = {"id": 1}
+    request = mocker.patch(
+        "api_template.external.core.adapters.requests.request", return_value=response
+    )
+
+    assert adapter.execute_operation("update_item", data={"name": "a"}) == {"id": 1}
+    await adapter.aexecute_operation("update_item", data={"name": "a"})
+
+    assert request.call_args.args[0] == "PATCH"
+    assert requests_seen[0].method == "PATCH"
+    with pytest.raises(ValueError):
+        adapter.execute_operation("item_options")
+    with pytest.raises(ValueError):
+        await adapter.aexecute_operation("item_options")
+    await http_pool.aclose()
+
+
+def test_operations_are_indexed_by_id_and_method_path():
+    spec = {
+        "paths": {
+            "/users/{id}": {
+                "parameters": [{"name": "id", "in": "path"}],
+                "get": {
+                    "operationId": "get_user",
+                    "description": "Returns a user.",
+                    "parameters": [{"name": "id", "in": "path", "required": True}],
+                },
+                "delete": {"summary": "Deletes a user."},
+            }
+        }
+    }
+    adapter = GenericAPIAdapter("http://api.test", spec)
+
+    assert adapter.list_operation_ids() == ["get_user", "DELETE /users/{id}"]
+    assert adapter.get_operation("GET /users/{id}") is adapter.get_operation("get_user")
+    assert adapter.get_method_path_by_operation_id("get_user") == ("get", "/users/{id}")
+    assert adapter.get_operation_description("get_user") == "Returns a user."
+    assert adapter.get_operation_input("get_user") == {
+        "parameters": [{"name": "id", "in": "path", "required": True, "schema": {}}],
+        "requestBody": {},
+    }
+    with pytest.raises(TypeError):
+        adapter.operations["new"] = None
+
+
+def test_get_operation_input_returns_request_body_schema():
+    schema = {"type": "object", "properties": {"query": {"type": "string"}}}
+    spec = {
+        "paths": {
+            "/search": {
+                "post": {
+                    "operationId": "search",
+                    "requestBody": {"content": {"application/json": {"schema": schema}}},
+                }
+            }
+        }
+    }
+    adapter = GenericAPIAdapter("http://api.test", spec)
+
+    assert adapter.get_operation_input("search") == {"parameters": [], "requestBody": schema}
+    with pytest.raises(ValueError):
+        adapter.get_operation_input("missing")
+
+
+CACHE_SPEC = {
+    "paths": {
+        "/items/{id}": {"get": {"operationId": "get_item"}},
+        "/fresh": {"get": {"operationId": "get_fresh", "x-cache-ttl": 0}},
+        "/search": {"post": {"operationId": "search", "x-idempotent": True, "x-cache-ttl": 30}},
+        "/orders": {"post": {"operationId": "create_order"}},
+    }
+}
+
+
+def test_cache_ttls_come_from_the_spec_and_overrides():
+    adapter = GenericAPIAdapter(
+        "http://api.test", CACHE_SPEC, cache_ttl=60, cache_ttls={"get_item": 5}
+    )
+
+    assert adapter.get_cache_ttl("get_item") == 5
+    assert adapter.get_cache_ttl("GET /fresh") == 0
+    assert adapter.get_cache_ttl("search") == 30
+    assert adapter.get_cache_ttl("create_order") == 0
+
+
+@pytest.mark.asyncio
+async def test_aexecute_operation_caches_idempotent_operations(http_pool, requests_seen):
+    adapter = GenericAPIAdapter("http://api.test", CACHE_SPEC, http_pool=http_pool)
+
+    for _ in range(2):
+        await adapter.aexecute_operation("get_item", params={"q": ["a", "b"]})
+        await adapter.aexecute_operation("search", data={"query": "q"})
+        await adapter.aexecute_operation("get_fresh")
+        await adapter.aexecute_operation("create_order", data={"id": 1})
+    await adapter.aexecute_operation("search", data={"query": "other"})
+
+    paths = [request.url.path for request in requests_seen]
+    assert paths.count("/items/{id}") == 1
+    assert paths.count("/search") == 2
+    assert paths.count("/fresh") == 2
+    assert paths.count("/orders") == 2
+    assert adapter.cache_info()["hits"] == 2
+    await http_pool.aclose()
+
+
+def test_execute_operation_caches_idempotent_operations(mocker):
+    response = mocker.Mock()
+    response.json.return_value = {"id": 1}
+    request = mocker.patch.object(GenericAPIAdapter, "_make_request", return_value=response)
+    adapter = GenericAPIAdapter("http://api.test", CACHE_SPEC)
+
+    assert adapter.execute_operation("get_item", params={"id": 1}) == {"id": 1}
+    assert adapter.execute_operation("get_item", params={"id": 1}) == {"id": 1}
+    adapter.execute_operation("create_order", data={"id": 1})
+    adapter.execute_operation("create_order", data={"id": 1})
+
+    assert request.call_count == 3
@@ -0,0 +1,129 @@
+import os
+import sys
+
+import pytest
+
+from api_template.external.core.autodiscovery import (
+    HandlerManifest,
+    LazyHandler,
+    autodiscover_handlers,
+)
+from api_template.external.core.manager import APIManager
+from api_template.external.core.spec_cache import SpecCache
+
+PACKAGE = "autodiscovery_test_handlers"
+MODULE = f"{PACKAGE}.handlers.echo"
+
+SPEC = """
+paths:
+  /echo:
+    post:
+      operationId: echo
+"""
+
+HANDLER = """import os
+
+from api_template.external.core.base import BaseHandler
+
+
+class EchoHandler(BaseHandler):
+    def __init__(self, api_manager):
+        super().__init__(api_manager)
+        self.service_name = "echo_service"
+        self.base_url = "http://echo.test"
+        self.spec_path = os.path.join(os.path.dirname(__file__), "openapi.yaml")
+        self.register_api()
+
+    def echo(self, text):
+        return text
+"""
+
+
+@pytest.fixture(autouse=True)
+def restore_api_manager():
+    previous = APIManager._instance
+    yield
+    APIManager._instance = previous
+
+
+@pytest.fixture
+def handler_directory(tmp_path):
+    directory = tmp_path / PACKAGE / "handlers"
+    directory.mkdir(parents=True)
+    (tmp_path / PACKAGE / "__init__.py").write_text("")
+    (directory / "__init__.py").write_text("")
+    (directory / "echo.py").write_text(HANDLER)
+    (directory / "openapi.yaml").write_text(SPEC)
+    yield str(directory)
+    for name in [name for name in sys.modules if name.startswith(PACKAGE)]:
+        del sys.modules[name]
+    sys.path.remove(str(tmp_path))
+
+
+def start(handler_directory: str) -> tuple:
+    """
+    Discovers and instantiates the handlers as APISetup does, as in a new process.
+    :return: The API manager and the handlers.
+    """
+    for name in [name for name in sys.modules if name.startswith(PACKAGE)]:
+        del sys.modules[name]
+    data_path = os.path.dirname(os.path.dirname(handler_directory))
+    APIManager._instance = None
+    api_manager = APIManager()
+    api_manager.lazy = True
+    api_manager.spec_cache = SpecCache(os.path.join(data_path, "cache"))
+    manifest = HandlerManifest(os.path.join(data_path, "handlers.manifest.json"))
+    handlers = {}
+    for handler_class in autodiscover_handlers(handler_directory, manifest):
+        handlers[handler_class.__name__] = handler_class(api_manager)
+        manifest.record_handler(handler_class, handlers[handler_class.__name__])
+    manifest.save()
+    return api_manager, handlers
+
+
+def test_unchanged_modules_are_imported_on_first_use(handler_directory):
+    start(handler_directory)
+    assert MODULE in sys.modules
+
+    api_manager, handlers = start(handler_directory)
+
+    assert MODULE not in sys.modules
+    handler = handlers["EchoHandler"]
+    assert isinstance(handler, LazyHandler)
+    assert handler.service_name == "echo_service"
+    assert api_manager.list_apis() == ["echo_service"]
+    assert api_manager.get_spec_hash("echo_service")
+    assert MODULE not in sys.modules
+
+    assert handler.echo("hello") == "hello"
+    assert MODULE in sys.modules
+    assert api_manager.get_api("echo_service").list_operation_ids() == ["echo"]
+
+
+def test_getting_the_api_loads_the_handler(handler_directory):
+    start(handler_directory)
+    api_manager, _ = start(handler_directory)
+
+    assert api_manager.get_api("echo_service").list_operation_ids() == ["echo"]
+    assert MODULE in sys.modules
+
+
+def test_changed_modules_are_imported_at_startup(handler_directory):
+    module_path = os.path.join(handler_directory, "echo.py")
+    start(handler_directory)
+
+    # A new mtime alone does not count as a change
+    stat = os.stat(module_path)
+    os.utime(module_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    _, handlers = start(handler_directory)
+    assert isinstance(handlers["EchoHandler"], LazyHandler)
+
+    with open(module_path, "a") as f:
+        f.write("\n# Changed\n")
+    _, handlers = start(handler_directory)
+    assert MODULE in sys.modules
+    assert not isinstance(handlers["EchoHandler"], LazyHandler)
+
+    # And lazily loaded again on the next start
+    _, handlers = start(handler_directory)
+    assert MODULE not in sys.modules
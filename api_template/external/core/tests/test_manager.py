@@ -0,0 +1,52 @@
+import pytest
+
+from api_template.external.core.manager import APIManager
+from api_template.external.core.spec_cache import SpecCache
+
+SPEC = """
+paths:
+  /search:
+    post:
+      operationId: search
+"""
+
+
+@pytest.fixture
+def api_manager(tmp_path):
+    previous, APIManager._instance = APIManager._instance, None
+    manager = APIManager()
+    manager.lazy = True
+    manager.spec_cache = SpecCache(str(tmp_path / "cache"))
+    yield manager
+    APIManager._instance = previous
+
+
+@pytest.fixture
+def spec_path(tmp_path):
+    path = tmp_path / "openapi.yaml"
+    path.write_text(SPEC)
+    return str(path)
+
+
+def test_specs_are_parsed_on_first_use(api_manager, spec_path):
+    api_manager.register_api("service", "http://api.test", spec_path)
+
+    assert api_manager.list_apis() == ["service"]
+    assert api_manager.spec_cache.stats == {}
+    assert api_manager.get_api("service").list_operation_ids() == ["search"]
+    assert api_manager.get_api("service") is api_manager.get_api("service")
+    assert api_manager.spec_cache.stats == {"misses": 1}
+
+
+def test_warm_up_loads_every_registered_api(api_manager, spec_path):
+    api_manager.register_api("first", "http://first.test", spec_path)
+    api_manager.register_api("second", "http://second.test", spec_path)
+    api_manager.register_api("missing", "http://missing.test", spec_path + ".missing")
+
+    futures = api_manager.warm_up(max_workers=2)
+    for future in futures:
+        future.exception()
+
+    assert sorted(api_manager._apis) == ["first", "second"]
+    with pytest.raises(FileNotFoundError):
+        api_manager.get_api("missing")
@@ -0,0 +1,170 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from api_template.external.core.response_cache import ResponseCache
+
+
+def test_get_or_call_caches_until_the_ttl_expires():
+    cache = ResponseCache(maxsize=10)
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        return {"n": len(calls)}
+
+    assert cache.get_or_call("k", 0.05, fetch) == {"n": 1}
+    assert cache.get_or_call("k", 0.05, fetch) == {"n": 1}
+    time.sleep(0.06)
+    assert cache.get_or_call("k", 0.05, fetch) == {"n": 2}
+
+    metrics = cache.metrics()
+    assert (metrics["hits"], metrics["misses"]) == (1, 2)
+    assert metrics["expirations"] == 1
+
+
+def test_evictions_are_counted():
+    cache = ResponseCache(maxsize=2)
+    for key in ("a", "b", "c"):
+        cache.get_or_call(key, 60, lambda: key)
+
+    assert cache.metrics()["evictions"] == 1
+    assert len(cache) == 2
+
+
+def test_errors_are_not_cached():
+    cache = ResponseCache()
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_call("k", 60, fail)
+    assert cache.get_or_call("k", 60, lambda: "ok") == "ok"
+
+
+def test_concurrent_calls_share_one_upstream_request():
+    cache = ResponseCache()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(1)
+        return "value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_call("k", 60, fetch)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert cache.metrics()["coalesced"] == 4
+
+
+@pytest.mark.asyncio
+async def test_concurrent_async_calls_share_one_upstream_request():
+    cache = ResponseCache()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    results = await asyncio.gather(*(cache.aget_or_call("k", 60, fetch) for _ in range(5)))
+
+    assert results == ["value"] * 5
+    assert len(calls) == 1
+    assert await cache.aget_or_call("k", 60, fetch) == "value"
+    assert cache.metrics()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_async_errors_reach_every_waiter():
+    cache = ResponseCache()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    results = await asyncio.gather(
+        *(cache.aget_or_call("k", 60, fail) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_leader_lets_a_waiter_take_over():
+    cache = ResponseCache()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"n": len(calls)}
+
+    leader = asyncio.create_task(cache.aget_or_call("k", 60, fetch))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.aget_or_call("k", 60, fetch))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+    assert await follower == {"n": 2}
+    assert await cache.aget_or_call("k", 60, fetch) == {"n": 2}
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiters_do_not_cancel_the_leader():
+    cache = ResponseCache()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        return "value"
+
+    leader = asyncio.create_task(cache.aget_or_call("k", 60, fetch))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(cache.aget_or_call("k", 60, fetch))
+    await asyncio.sleep(0.005)
+    follower.cancel()
+
+    assert await leader == "value"
+    with pytest.raises(asyncio.CancelledError):
+        await follower
+
+
+@pytest.mark.asyncio
+async def test_callers_get_their_own_copy_of_the_value():
+    cache = ResponseCache()
+
+    async def fetch():
+        await asyncio.sleep(0.01)
+        return {"items": [1, 2]}
+
+    first, second = await asyncio.gather(
+        cache.aget_or_call("k", 60, fetch), cache.aget_or_call("k", 60, fetch)
+    )
+    first["items"].append(3)
+    second["items"].append(4)
+    hit = await cache.aget_or_call("k", 60, fetch)
+    hit["extra"] = True
+
+    assert await cache.aget_or_call("k", 60, fetch) == {"items": [1, 2]}
+    result = cache.get_or_call("s", 60, lambda: {"items": [1]})
+    result["items"].clear()
+    assert cache.get_or_call("s", 60, lambda: {}) == {"items": [1]}
@@ -0,0 +1,64 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from api_template.external.core.adapters import GenericAPIAdapter
+from api_template.external.core.autodiscovery import HandlerManifest
+from api_template.external.core.setup import APISetup
+from api_template.utils.semantic_search import SemanticSearch
+
+SPEC = {
+    "paths": {
+        "/search": {"post": {"operationId": "search", "description": "Searches the web."}},
+        "/extract": {"post": {"operationId": "extract", "summary": "Extracts a page."}},
+    }
+}
+
+
+@pytest.fixture
+def api_setup(tmp_path):
+    def _make():
+        setup = object.__new__(APISetup)
+        setup.api_manager = MagicMock()
+        setup.api_manager.get_api.return_value = GenericAPIAdapter("http://test", SPEC)
+        setup.api_manager.get_spec_hash.return_value = "spec-hash"
+        setup.handler_manifest = HandlerManifest(str(tmp_path / "handlers.manifest.json"))
+        setup.handlers = {"TestHandler": MagicMock(service_name="test_service")}
+        setup.semantic_search = SemanticSearch(
+            cache_path=str(tmp_path),
+            collection_name="api_descriptions",
+            vector_size=4,
+            embedding_fn=lambda texts: [[1.0, 0.0, 0.0, float(len(t))] for t in texts],
+            backend="numpy",
+        )
+        return setup
+
+    return _make
+
+
+@patch("api_template.external.core.adapters.generate_description_from_data")
+def test_descriptions_are_generated_only_for_new_operations(generate, api_setup):
+    generate.return_value = "Generated description."
+
+    api_setup()._index_api_descriptions()
+    api_setup()._index_api_descriptions()
+
+    generate.assert_called_once_with(SPEC["paths"]["/extract"]["post"])
+
+
+@patch("api_template.external.core.adapters.generate_description_from_data")
+def test_unchanged_specs_are_not_parsed(generate, api_setup):
+    generate.return_value = "Generated description."
+    api_setup()._index_api_descriptions()
+
+    setup = api_setup()
+    setup._index_api_descriptions()
+
+    setup.api_manager.get_api.assert_not_called()
+    assert set(setup.semantic_search.manifest.entries) == {"search", "extract"}
+
+    setup = api_setup()
+    setup.api_manager.get_spec_hash.return_value = "changed"
+    setup._index_api_descriptions()
+
+    setup.api_manager.get_api.assert_called_once_with("test_service")
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from api_template.external.core.spec_cache import SpecCache
+
+SPEC = """
+paths:
+  /search:
+    post:
+      operationId: search
+"""
+
+
+@pytest.fixture
+def spec_path(tmp_path):
+    path = tmp_path / "openapi.yaml"
+    path.write_text(SPEC)
+    return str(path)
+
+
+def test_specs_are_parsed_once(spec_path, tmp_path):
+    spec = SpecCache(str(tmp_path / "cache")).load(spec_path)
+    cache = SpecCache(str(tmp_path / "cache"))
+
+    assert cache.load(spec_path) == spec
+    assert spec["paths"]["/search"]["post"]["operationId"] == "search"
+    assert cache.stats == {"hits": 1}
+
+
+def test_touched_specs_are_not_parsed_again(spec_path, tmp_path):
+    cache = SpecCache(str(tmp_path / "cache"))
+    cache.load(spec_path)
+    stat = os.stat(spec_path)
+    os.utime(spec_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    cache.load(spec_path)
+
+    assert cache.stats == {"misses": 1, "hits": 1}
+
+
+def test_changed_specs_are_parsed_again(spec_path, tmp_path):
+    cache = SpecCache(str(tmp_path / "cache"))
+    before = cache.fingerprint(spec_path)
+    cache.load(spec_path)
+    with open(spec_path, "a") as f:
+        f.write("      description: Searches.\n")
+
+    spec = cache.load(spec_path)
+
+    assert spec["paths"]["/search"]["post"]["description"] == "Searches."
+    assert cache.fingerprint(spec_path) != before
+    assert cache.stats == {"misses": 2}
+
+
+def test_corrupted_cache_files_are_ignored(spec_path, tmp_path):
+    cache = SpecCache(str(tmp_path / "cache"))
+    cache.load(spec_path)
+    with open(cache._cache_file(spec_path), "wb") as f:
+        f.write(b"garbage")
+
+    assert cache.load(spec_path)["paths"]
+    assert cache.stats == {"misses": 2}
@@ -0,0 +1,169 @@
+import math
+from typing import Dict, List, Tuple
+
+# Route label of requests that matched no route, so that unknown paths do not create series
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_DURATION_METRIC = "http_request_duration_seconds"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Method label of any other method, so that arbitrary methods do not create series
+OTHER_METHOD = "other"
+STANDARD_METHODS = frozenset(
+    ("GET", "HEAD", "POST", "PUT", "DELETE", "CONNECT", "OPTIONS", "TRACE", "PATCH")
+)
+
+
+class LogLinearBuckets:
+    """
+    HDR-style bucket layout: every power of two between min_value and max_value is split into
+    sub_buckets linear buckets, so the relative error of a bucket is at most 1 / sub_buckets
+    whatever the magnitude. The bucket of a value is computed with frexp, in constant time.
+
+    Bucket 0 holds values up to min_value, and the bucket after the last bound holds values
+    above max_value (+Inf). Buckets include their upper bound, as the le label of Prometheus.
+    """
+
+    def __init__(self, min_value: float = 1e-4, max_value: float = 60.0, sub_buckets: int = 2):
+        if min_value <= 0 or max_value <= min_value or sub_buckets <= 0:
+            raise ValueError("Expected 0 < min_value < max_value and sub_buckets > 0")
+        self.min_value = min_value
+        self.sub_buckets = sub_buckets
+        octaves = math.ceil(math.log2(max_value / min_value))
+        self.bounds: List[float] = [min_value] + [
+            min_value * 2**octave * (1 + (sub + 1) / sub_buckets)
+            for octave in range(octaves)
+            for sub in range(sub_buckets)
+        ]
+        self._scale = 1.0 / min_value
+        # Index of the +Inf bucket
+        self.overflow = len(self.bounds)
+
+    def __len__(self):
+        return self.overflow + 1
+
+    def index(self, value: float) -> int:
+        scaled = value * self._scale
+        if scaled <= 1.0:
+            index = 0
+        else:
+            # scaled = mantissa * 2 ** exponent, with mantissa in [0.5, 1)
+            mantissa, exponent = math.frexp(scaled)
+            index = (
+                1 + (exponent - 1) * self.sub_buckets + int((mantissa * 2 - 1) * self.sub_buckets)
+            )
+            index = min(index, self.overflow)
+        # Values on a bound (or off by a rounding error of the scaling) belong to the bucket
+        # below it
+        bounds = self.bounds
+        if index > 0 and value <= bounds[index - 1]:
+            return index - 1
+        if index < self.overflow and value > bounds[index]:
+            return index + 1
+        return index
+
+
+class LatencyHistogram:
+    """
+    Fixed-bucket histogram of durations in seconds. Recording a value costs the same whatever
+    the number of values recorded.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: LogLinearBuckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def record(self, value: float):
+        self.counts[self.buckets.index(value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestMetrics:
+    """
+    Request durations kept in process memory, one histogram per method, route template and
+    status, rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets: LogLinearBuckets = None):
+        self.buckets = buckets or LogLinearBuckets()
+        self.histograms: Dict[Tuple[str, str, int], LatencyHistogram] = {}
+        self._bucket_labels = bucket_labels(self.buckets)
+
+    def observe(self, method: str, route: str, status_code: int, duration: float):
+        """
+        Records the duration of a request.
+        :param method: Any method outside of STANDARD_METHODS is recorded as OTHER_METHOD.
+        :param route: Route template, e.g. "/api/v1/users/{user_id}".
+        :param status_code:
+        :param duration: In seconds.
+        :return:
+        """
+        if method not in STANDARD_METHODS:
+            method = OTHER_METHOD
+        key = (method, route, status_code)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = LatencyHistogram(self.buckets)
+        histogram.record(duration)
+
+    def render(self) -> str:
+        """
+        Returns the histograms in the Prometheus text format.
+        :return:
+        """
+        lines = [
+            f"# HELP {REQUEST_DURATION_METRIC} Duration of HTTP requests by route template.",
+            f"# TYPE {REQUEST_DURATION_METRIC} histogram",
+        ]
+        for (method, route, status_code), histogram in sorted(self.histograms.items()):
+            labels = (
+                f'method="{escape_label(method)}",route="{escape_label(route)}",'
+                f'status="{status_code}"'
+            )
+            lines += histogram_lines(
+                REQUEST_DURATION_METRIC, labels, histogram, self._bucket_labels
+            )
+        return "\n".join(lines) + "\n"
+
+
+def bucket_labels(buckets: LogLinearBuckets) -> List[str]:
+    """
+    Returns the le label of each bucket.
+    :param buckets:
+    :return:
+    """
+    return [_format_float(bound) for bound in buckets.bounds] + ["+Inf"]
+
+
+def histogram_lines(
+    name: str, labels: str, histogram: LatencyHistogram, le_labels: List[str]
+) -> List[str]:
+    """
+    Returns the Prometheus text lines of a histogram: cumulative buckets, sum and count.
+    :param name: Metric name.
+    :param labels: Formatted labels, e.g. 'pool="primary"'.
+    :param histogram:
+    :param le_labels: See bucket_labels.
+    :return:
+    """
+    lines = []
+    cumulative = 0
+    for le, count in zip(le_labels, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{le}"}} {cumulative}')
+    lines.append(f"{name}_sum{{{labels}}} {_format_float(histogram.sum)}")
+    lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+    return lines
+
+
+def _format_float(value: float) -> str:
+    return repr(round(value, 9))
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
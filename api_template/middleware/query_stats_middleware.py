@@ -0,0 +1,41 @@
+import logging
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from api_template.db.instrumentation import track_queries
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStatsMiddleware:
+    """
+    Pure ASGI middleware that records the database statements of each HTTP request, see
+    track_queries, and logs their count, their total duration and the slowest one once the
+    request is done. A statement shape run more than n_plus_one_threshold times in a request
+    is logged as a warning.
+
+    It must run inside RequestContextLogMiddleware, so that its lines carry the correlation id
+    of the request.
+    """
+
+    def __init__(self, app: ASGIApp, n_plus_one_threshold: int = 10):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries(self.n_plus_one_threshold) as stats:
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                if stats.count and logger.isEnabledFor(logging.INFO):
+                    logger.info(
+                        "Database: %d statements in %.1f ms, slowest %.1f ms: %s",
+                        stats.count,
+                        stats.duration * 1e3,
+                        stats.slowest_duration * 1e3,
+                        stats.slowest_statement,
+                    )
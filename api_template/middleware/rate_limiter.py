@@ -0,0 +1,205 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from array import array
+from typing import NamedTuple, Optional
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    # Requests still allowed right now
+    remaining: int
+    # Seconds until the next request is allowed, 0 when allowed
+    retry_after: float
+
+
+class RateLimiter(ABC):
+    @abstractmethod
+    async def hit(self, key: str) -> RateLimitResult:
+        """
+        Counts a request of key and tells whether it is allowed.
+        """
+        pass
+
+
+class MemoryRateLimiter(RateLimiter):
+    """
+    In-process GCRA rate limiter: allows bursts of max_requests and, on average, max_requests
+    per period. The only state of a key is its theoretical arrival time (TAT), so a request
+    costs O(1) whatever max_requests is.
+
+    TATs live in a fixed-size, set-associative table: a key hashes to one set of `ways` slots,
+    each holding a 64-bit tag and a TAT. Memory is bounded by max_keys whatever the number of
+    clients. Idle keys (TAT in the past) are overwritten first; when a set is full of active
+    keys, the one with the least debt is evicted (and forgiven), which is counted in
+    `evictions`. There is no lock: each hit runs without yielding to the event loop.
+    """
+
+    def __init__(
+        self,
+        max_requests: int,
+        period: float,
+        max_keys: int = 1 << 20,
+        ways: int = 4,
+        clock=time.monotonic,
+    ):
+        if max_requests <= 0 or period <= 0:
+            raise ValueError("max_requests and period must be positive")
+        self.max_requests = max_requests
+        self.period = float(period)
+        self.emission_interval = self.period / max_requests
+        self.ways = ways
+        self.num_sets = max(1, max_keys // ways)
+        self.evictions = 0
+        self._clock = clock
+        size = self.num_sets * ways
+        self._tats = array("d", bytes(8 * size))
+        self._tags = array("Q", bytes(8 * size))
+
+    @property
+    def nbytes(self) -> int:
+        return self._tats.itemsize * len(self._tats) + self._tags.itemsize * len(self._tags)
+
+    def acquire(self, key: str, now: float = None) -> RateLimitResult:
+        """
+        Synchronous version of hit.
+        :param key:
+        :param now: Current time of the limiter's clock, for tests.
+        :return:
+        """
+        if now is None:
+            now = self._clock()
+        digest = hash(key) & 0xFFFFFFFFFFFFFFFF
+        # 0 marks an empty slot
+        tag = digest | 1
+        start = (digest % self.num_sets) * self.ways
+        tats, tags = self._tats, self._tags
+
+        slot, victim, victim_tat = -1, start, float("inf")
+        for i in range(start, start + self.ways):
+            if tags[i] == tag:
+                slot = i
+                break
+            if tats[i] < victim_tat:
+                victim, victim_tat = i, tats[i]
+
+        if slot < 0:
+            slot, tat = victim, now
+            if tags[victim] and victim_tat > now:
+                self.evictions += 1
+            tags[slot], tats[slot] = tag, now
+        else:
+            tat = max(tats[slot], now)
+
+        new_tat = tat + self.emission_interval
+        allow_at = new_tat - self.period
+        if allow_at > now:
+            return RateLimitResult(False, 0, allow_at - now)
+
+        tats[slot] = new_tat
+        return RateLimitResult(True, int((now - allow_at) / self.emission_interval), 0.0)
+
+    async def hit(self, key: str) -> RateLimitResult:
+        return self.acquire(key)
+
+
+# GCRA on the Redis server, in microseconds of the server's clock so every worker agrees on
+# "now". The key expires once its allowance is full again, so idle clients take no memory.
+GCRA_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000000 + tonumber(time[2])
+local interval = tonumber(ARGV[1])
+local period = tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if allow_at > now then
+    return {0, 0, allow_at - now}
+end
+redis.call('SET', KEYS[1], string.format('%d', new_tat), 'PX', math.ceil((new_tat - now) / 1000))
+return {1, math.floor((now - allow_at) / interval), 0}
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """
+    GCRA rate limiter shared by every API worker, on Redis. Each hit is a single EVALSHA of
+    an atomic script, so it costs one round-trip and concurrent workers cannot race.
+
+    When Redis fails, requests are checked by the in-process fallback limiter instead (so the
+    limit is per worker until Redis is back), and Redis is retried after retry_interval.
+    """
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        max_requests: int,
+        period: float,
+        prefix: str = "ratelimit:",
+        fallback: Optional[RateLimiter] = None,
+        retry_interval: float = 5.0,
+    ):
+        if max_requests <= 0 or period <= 0:
+            raise ValueError("max_requests and period must be positive")
+        self.client = client
+        self.max_requests = max_requests
+        self.period = float(period)
+        self.prefix = prefix
+        self.fallback = fallback or MemoryRateLimiter(max_requests, period)
+        self.retry_interval = retry_interval
+        self._period_us = int(self.period * 1_000_000)
+        self._interval_us = max(1, self._period_us // max_requests)
+        self._script = client.register_script(GCRA_SCRIPT)
+        self._retry_at = 0.0
+
+    async def hit(self, key: str) -> RateLimitResult:
+        if self._retry_at:
+            if time.monotonic() < self._retry_at:
+                return await self.fallback.hit(key)
+            logger.info("Retrying Redis for rate limiting.")
+            self._retry_at = 0.0
+
+        try:
+            allowed, remaining, retry_after_us = await self._script(
+                keys=[f"{self.prefix}{key}"], args=[self._interval_us, self._period_us]
+            )
+        except (RedisError, OSError) as e:
+            logger.warning(f"Redis rate limiting failed, using the in-process limiter: {e}")
+            self._retry_at = time.monotonic() + self.retry_interval
+            return await self.fallback.hit(key)
+
+        return RateLimitResult(bool(allowed), int(remaining), int(retry_after_us) / 1_000_000)
+
+
+def create_rate_limiter(
+    max_requests: int,
+    period: float,
+    max_keys: int = 1 << 20,
+    redis_url: str = None,
+    redis_timeout: float = 0.1,
+) -> RateLimiter:
+    """
+    Returns the Redis rate limiter when a Redis URL is configured, else the in-process one.
+    :param max_requests:
+    :param period:
+    :param max_keys: Size of the in-process limiter (also the fallback of the Redis one).
+    :param redis_url:
+    :param redis_timeout: Socket timeout of Redis calls, in seconds.
+    :return:
+    """
+    memory_limiter = MemoryRateLimiter(max_requests, period, max_keys=max_keys)
+    if not redis_url:
+        return memory_limiter
+
+    client = aioredis.Redis.from_url(
+        redis_url, socket_timeout=redis_timeout, socket_connect_timeout=redis_timeout
+    )
+    return RedisRateLimiter(client, max_requests, period, fallback=memory_limiter)
@@ -1,27 +1,51 @@
 import hashlib
 import ipaddress
-import time
+import json
+import math
 
-from fastapi import HTTPException, Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+from api_template.middleware.rate_limiter import MemoryRateLimiter, RateLimiter
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, max_requests: int, period: int, hash_ips: bool = False):
-        super().__init__(app)
+# Same bodies as JSONResponse({"detail": ...}), serialized once.
+INVALID_IP_BODY = json.dumps({"detail": "Invalid IP address"}, separators=(",", ":")).encode()
+TOO_MANY_REQUESTS_BODY = json.dumps({"detail": "Too many requests"}, separators=(",", ":")).encode()
+
+
+class InvalidClientIP(ValueError):
+    pass
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI rate limiting middleware: rejected requests get a 429 sent straight through the
+    ASGI send channel, without building a Response or reaching the app.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_requests: int,
+        period: int,
+        hash_ips: bool = False,
+        max_keys: int = 1 << 20,
+        limiter: RateLimiter = None,
+    ):
+        self.app = app
         self.max_requests = max_requests
         self.period = period
         self.hash_ips = hash_ips
-        self.requests = {}
+        self.limiter = limiter or MemoryRateLimiter(max_requests, period, max_keys=max_keys)
 
-    def get_client_ip(self, request: Request) -> str:
+    def get_client_ip(self, scope: Scope) -> str:
         # Retrieve the client's IP address
-        client_ip = request.client.host
+        client = scope.get("client")
+        client_ip = client[0] if client else ""
         try:
             # Validate IP (handles both IPv4 and IPv6)
             ipaddress.ip_address(client_ip)
         except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid IP address")
+            raise InvalidClientIP(client_ip)
 
         # Optionally hash the IP address for privacy
         if self.hash_ips:
@@ -29,21 +53,43 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
 
         return client_ip
 
-    async def dispatch(self, request: Request, call_next):
-        client_ip = self.get_client_ip(request)
-        current_time = time.time()
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-        if client_ip not in self.requests:
-            self.requests[client_ip] = []
+        try:
+            client_ip = self.get_client_ip(scope)
+        except InvalidClientIP:
+            await _send_json(send, 400, INVALID_IP_BODY)
+            return
 
-        # Filter out requests that are outside the current time period
-        self.requests[client_ip] = [
-            req for req in self.requests[client_ip] if req > current_time - self.period
-        ]
+        result = await self.limiter.hit(client_ip)
+        if not result.allowed:
+            await _send_json(
+                send,
+                429,
+                TOO_MANY_REQUESTS_BODY,
+                [(b"retry-after", str(math.ceil(result.retry_after)).encode("latin-1"))],
+            )
+            return
 
-        if len(self.requests[client_ip]) >= self.max_requests:
-            raise HTTPException(status_code=429, detail="Too many requests")
+        await self.app(scope, receive, send)
 
-        self.requests[client_ip].append(current_time)
 
-        return await call_next(request)
+async def _send_json(send: Send, status_code: int, body: bytes, headers: list = None):
+    """
+    Sends a JSON response directly through the ASGI send channel.
+    """
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"content-type", b"application/json"),
+                *(headers or []),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
@@ -1,18 +1,17 @@
 import logging
+import random
+import time
 from contextvars import ContextVar
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timezone
+from typing import Dict, Optional
 from uuid import uuid4
 
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
-from starlette.responses import Response
-
-logger = logging.getLogger(__name__)
+from starlette.datastructures import URL, Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from api_template.middleware.metrics import UNMATCHED_ROUTE, RequestMetrics
 
-async def _aiter(data):
-    yield data
+logger = logging.getLogger(__name__)
 
 
 CORRELATION_ID_HEADER = "Correlation-Id"
@@ -27,6 +26,7 @@ _correlation_id_ctx_var: ContextVar[Optional[str]] = ContextVar(
 )
 _start_time_ctx_var: ContextVar[Optional[datetime]] = ContextVar(START_TIME_CTX_KEY, default=None)
 _end_time_ctx_var: ContextVar[Optional[datetime]] = ContextVar(END_TIME_CTX_KEY, default=None)
+# Duration of the whole request, in microseconds
 _response_duration_ctx_var: ContextVar[Optional[int]] = ContextVar(
     RESPONSE_DURATION_CTX_KEY, default=None
 )
@@ -48,35 +48,179 @@ def get_response_duration() -> Optional[int]:
     return _response_duration_ctx_var.get() if _response_duration_ctx_var else None
 
 
-class RequestContextLogMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint):
-        _correlation_id_ctx_var.set(request.headers.get(CORRELATION_ID_HEADER, str(uuid4())))
+class _LazyStr:
+    """
+    Defers building a log argument until the record is actually formatted.
+    """
+
+    __slots__ = ("func",)
+
+    def __init__(self, func):
+        self.func = func
+
+    def __str__(self):
+        return str(self.func())
+
+
+class _BodyTee:
+    """
+    Keeps the first max_bytes of a body that flows through the middleware, decoded only when
+    the log record is formatted.
+    """
+
+    __slots__ = ("max_bytes", "chunks", "captured", "size", "streamed")
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.chunks = []
+        self.captured = 0
+        self.size = 0
+        self.streamed = False
+
+    def feed(self, data: bytes):
+        self.size += len(data)
+        if self.streamed or self.captured >= self.max_bytes:
+            return
+        if self.captured + len(data) > self.max_bytes:
+            data = data[: self.max_bytes - self.captured]
+        self.chunks.append(data)
+        self.captured += len(data)
+
+    def __str__(self):
+        if self.streamed:
+            return f"<stream of {self.size} bytes>"
+        text = b"".join(self.chunks).decode("utf-8", "replace")
+        if self.size > self.captured:
+            text += f"... ({self.size} bytes)"
+        return text
+
+
+class RequestContextLogMiddleware:
+    """
+    Pure ASGI middleware that sets the correlation id of the request, logs the request and the
+    response with their bodies, and adds the Correlation-Id header to the response.
+
+    Bodies are teed while they flow to the app and to the client, never buffered: only their
+    first max_body_bytes are kept, and event streams are not captured at all. Both lines are
+    logged once the response is complete, for a sample of the requests: status_sample_rates
+    (keyed by status, e.g. "404", or class, e.g. "5xx") take precedence over route_sample_rates
+    (keyed by route template, e.g. "/api/v1/users/{user_id}"), then sample_rate applies.
+
+    Durations are measured with the monotonic clock and, when metrics is given, recorded per
+    route template.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_body_bytes: int = 4096,
+        sample_rate: float = 1.0,
+        route_sample_rates: Dict[str, float] = None,
+        status_sample_rates: Dict[str, float] = None,
+        metrics: RequestMetrics = None,
+    ):
+        self.app = app
+        self.metrics = metrics
+        self.max_body_bytes = max_body_bytes
+        self.sample_rate = sample_rate
+        self.route_sample_rates = route_sample_rates or {}
+        self.status_sample_rates = status_sample_rates or {}
+
+    def get_sample_rate(self, scope: Scope, status_code: Optional[int]) -> float:
+        if status_code is not None and self.status_sample_rates:
+            rate = self.status_sample_rates.get(str(status_code))
+            if rate is None:
+                rate = self.status_sample_rates.get(f"{status_code // 100}xx")
+            if rate is not None:
+                return rate
+        if self.route_sample_rates:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or scope["path"]
+            return self.route_sample_rates.get(path, self.sample_rate)
+        return self.sample_rate
+
+    def should_log(self, scope: Scope, status_code: Optional[int]) -> bool:
+        rate = self.get_sample_rate(scope, status_code)
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        _correlation_id_ctx_var.set(request_headers.get(CORRELATION_ID_HEADER, str(uuid4())))
         correlation_id = get_correlation_id()
-        start_time = datetime.utcnow()
-
-        # Log request
-        request_body = await request.body()
-        request_headers = dict(request.headers)
-        filtered_headers = {k: v for k, v in request_headers.items() if "token" in k.lower()}
-        logger.info(
-            f"Request: {request.method} {request.url} Headers: {filtered_headers} Body: {request_body.decode('utf-8')}"
-        )
+        _start_time_ctx_var.set(datetime.now(timezone.utc))
+        start = time.perf_counter()
 
-        response: Response = await call_next(request)
-
-        response_body = [section async for section in response.__dict__["body_iterator"]]
-        response_body = b"".join(response_body)
-        logger.info(
-            f"Response: {response.status_code} Headers: {dict(response.headers)} Body: {response_body.decode('utf-8')}"
+        log_bodies = logger.isEnabledFor(logging.INFO) and (
+            self.sample_rate > 0 or self.route_sample_rates or self.status_sample_rates
         )
-
-        response.__setattr__("body_iterator", _aiter(response_body))
-
-        end_time = datetime.utcnow()
-        if correlation_id is not None:
-            response.headers[CORRELATION_ID_HEADER] = correlation_id
-        response_duration = end_time - start_time
-        _start_time_ctx_var.set(start_time)
-        _end_time_ctx_var.set(end_time)
-        _response_duration_ctx_var.set(response_duration.microseconds)
-        return response
+        request_body = _BodyTee(self.max_body_bytes)
+        response_body = _BodyTee(self.max_body_bytes)
+        status_code = None
+        response_headers = None
+        logged = False
+
+        def log():
+            nonlocal logged
+            logged = True
+            if not self.should_log(scope, status_code):
+                return
+            logger.info(
+                "Request: %s %s Headers: %s Body: %s",
+                scope["method"],
+                _LazyStr(lambda: URL(scope=scope)),
+                _LazyStr(
+                    lambda: {k: v for k, v in request_headers.items() if "token" in k.lower()}
+                ),
+                request_body,
+            )
+            if status_code is not None:
+                logger.info(
+                    "Response: %s Headers: %s Body: %s",
+                    status_code,
+                    _LazyStr(lambda: dict(Headers(raw=response_headers))),
+                    response_body,
+                )
+
+        async def receive_wrapper() -> Message:
+            message = await receive()
+            if message["type"] == "http.request":
+                request_body.feed(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message: Message):
+            nonlocal status_code, response_headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                if log_bodies:
+                    response_headers = list(headers.raw)
+                    content_type = headers.get("content-type", "")
+                    response_body.streamed = content_type.startswith("text/event-stream")
+                if correlation_id is not None:
+                    headers[CORRELATION_ID_HEADER] = correlation_id
+            elif message["type"] == "http.response.body" and log_bodies:
+                response_body.feed(message.get("body", b""))
+                if not message.get("more_body", False):
+                    # Logging must not delay the end of the response
+                    try:
+                        await send(message)
+                    finally:
+                        log()
+                    return
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper if log_bodies else receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            _end_time_ctx_var.set(datetime.now(timezone.utc))
+            _response_duration_ctx_var.set(int(duration * 1_000_000))
+            if self.metrics is not None:
+                route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+                self.metrics.observe(scope["method"], route, status_code or 500, duration)
+            if log_bodies and not logged:
+                log()
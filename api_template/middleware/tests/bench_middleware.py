@@ -0,0 +1,159 @@
+"""
+Benchmark of the middleware stack on the root endpoint, driven by an in-process ASGI client
+(no sockets): requests/sec and latency percentiles for the previous BaseHTTPMiddleware stack
+and for the pure ASGI one.
+
+Run with: python -m api_template.middleware.tests.bench_middleware
+"""
+
+import asyncio
+import datetime
+import statistics
+import time
+
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import JSONResponse
+
+from api_template.middleware.rate_limiter import MemoryRateLimiter
+from api_template.middleware.ratelimit_middleware import RateLimitMiddleware
+from api_template.middleware.request_middleware import RequestContextLogMiddleware
+from api_template.middleware.security_headers_middleware import (
+    SECURITY_HEADERS,
+    SecurityHeadersMiddleware,
+)
+
+REQUESTS = 5000
+WARM_UP = 500
+
+
+class LegacyRequestContextLogMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start_time = datetime.datetime.utcnow()
+        request_body = await request.body()
+        filtered_headers = {k: v for k, v in request.headers.items() if "token" in k.lower()}
+        f"Request: {request.method} {request.url} Headers: {filtered_headers} Body: {request_body.decode('utf-8')}"
+        response = await call_next(request)
+        response_body = b"".join([section async for section in response.body_iterator])
+        f"Response: {response.status_code} Headers: {dict(response.headers)} Body: {response_body.decode('utf-8')}"
+
+        async def body():
+            yield response_body
+
+        response.body_iterator = body()
+        response.headers["Correlation-Id"] = "id"
+        datetime.datetime.utcnow() - start_time
+        return response
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, max_requests, period):
+        super().__init__(app)
+        self.limiter = MemoryRateLimiter(max_requests, period)
+
+    async def dispatch(self, request: Request, call_next):
+        if not (await self.limiter.hit(request.client.host)).allowed:
+            return JSONResponse(status_code=429, content={"detail": "Too many requests"})
+        return await call_next(request)
+
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        for name, value in SECURITY_HEADERS.items():
+            response.headers[name] = value
+        return response
+
+
+def build_app(legacy) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/")
+    async def root():
+        return {"message": "API Template!", "datetime": datetime.datetime.now()}
+
+    if legacy is None:
+        return app
+    if legacy:
+        app.add_middleware(LegacyRequestContextLogMiddleware)
+        app.add_middleware(LegacyRateLimitMiddleware, max_requests=10**9, period=60)
+        app.add_middleware(LegacySecurityHeadersMiddleware)
+    else:
+        app.add_middleware(RequestContextLogMiddleware)
+        app.add_middleware(RateLimitMiddleware, max_requests=10**9, period=60)
+        app.add_middleware(SecurityHeadersMiddleware)
+    return app
+
+
+async def call(app, path="/"):
+    """
+    Minimal in-process ASGI client: sends one GET and returns the status code.
+    """
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 5000),
+        "server": ("bench", 80),
+    }
+    status = None
+    request_sent = False
+    response_done = asyncio.Event()
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        # Like a server, only report a disconnect once the response is complete.
+        await response_done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and not message.get("more_body", False):
+            response_done.set()
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app):
+    for _ in range(WARM_UP):
+        await call(app)
+
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(REQUESTS):
+        begin = time.perf_counter()
+        assert await call(app) == 200
+        latencies.append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return REQUESTS / elapsed, statistics.median(latencies), latencies[int(REQUESTS * 0.99)]
+
+
+async def main():
+    for name, legacy in (
+        ("no middleware", None),
+        ("BaseHTTPMiddleware", True),
+        ("pure ASGI", False),
+    ):
+        throughput, p50, p99 = await measure(build_app(legacy))
+        print(
+            f"{name:>18}: {throughput:7.0f} req/s | p50 {p50 * 1e6:7.1f} us | "
+            f"p99 {p99 * 1e6:7.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
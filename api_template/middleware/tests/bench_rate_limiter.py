@@ -0,0 +1,93 @@
+"""
+Benchmark of the rate limiter engine: per-request cost for a hot client close to the limit,
+and memory after requests from 1M distinct IPs. "log" is the previous per-IP list of
+timestamps, rebuilt on every request. Each memory measurement runs in a fresh process.
+
+Run with: python -m api_template.middleware.tests.bench_rate_limiter
+"""
+
+import multiprocessing
+import os
+import time
+import timeit
+
+import psutil
+
+from api_template.middleware.rate_limiter import MemoryRateLimiter
+
+MAX_REQUESTS = 1000
+PERIOD = 60
+DISTINCT_IPS = 1_000_000
+HITS = 20_000
+
+
+class SlidingLog:
+    """
+    The previous algorithm of RateLimitMiddleware.dispatch.
+    """
+
+    def __init__(self, max_requests, period):
+        self.max_requests = max_requests
+        self.period = period
+        self.requests = {}
+
+    def acquire(self, key, now=None):
+        current_time = time.time() if now is None else now
+        if key not in self.requests:
+            self.requests[key] = []
+        self.requests[key] = [req for req in self.requests[key] if req > current_time - self.period]
+        if len(self.requests[key]) >= self.max_requests:
+            return False
+        self.requests[key].append(current_time)
+        return True
+
+
+def make(engine):
+    if engine == "log":
+        return SlidingLog(MAX_REQUESTS, PERIOD)
+    return MemoryRateLimiter(MAX_REQUESTS, PERIOD)
+
+
+def ip(i):
+    return f"{10 + (i >> 24)}.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+
+
+def hot_client_cost(engine):
+    limiter = make(engine)
+    # Keep the client just under the limit: one request every period / max_requests seconds.
+    step = PERIOD / MAX_REQUESTS
+    clock = iter(range(HITS + MAX_REQUESTS))
+    for _ in range(MAX_REQUESTS):
+        limiter.acquire("1.2.3.4", now=next(clock) * step)
+    elapsed = timeit.timeit(lambda: limiter.acquire("1.2.3.4", now=next(clock) * step), number=HITS)
+    return elapsed / HITS
+
+
+def measure_memory(engine, results):
+    process = psutil.Process(os.getpid())
+    keys = [ip(i) for i in range(DISTINCT_IPS)]
+    rss_before = process.memory_info().rss
+    limiter = make(engine)
+    start = time.perf_counter()
+    for i, key in enumerate(keys):
+        limiter.acquire(key, now=i * 1e-4)
+    elapsed = time.perf_counter() - start
+    results.put((process.memory_info().rss - rss_before, elapsed / DISTINCT_IPS))
+
+
+def main():
+    for engine in ("log", "gcra"):
+        cost = hot_client_cost(engine)
+        results = multiprocessing.Queue()
+        process = multiprocessing.Process(target=measure_memory, args=(engine, results))
+        process.start()
+        rss, per_ip = results.get()
+        process.join()
+        print(
+            f"{engine:>4}: hot client {cost * 1e6:7.2f} us/request | "
+            f"{DISTINCT_IPS:,} IPs: {per_ip * 1e6:5.2f} us/request, RSS +{rss / 2**20:6.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Latency added per request by the Redis rate limiter, against a fakeredis TCP server running in
+another process (so every hit pays a real loopback round-trip and RESP parsing), compared to the
+in-process limiter. Requires fakeredis[lua].
+
+Run with: python -m api_template.middleware.tests.bench_redis_rate_limiter
+"""
+
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+import redis.asyncio as aioredis
+
+from api_template.middleware.rate_limiter import GCRA_SCRIPT, MemoryRateLimiter, RedisRateLimiter
+
+PORT = 18766
+HITS = 2000
+CONCURRENCY = 5  # The fake server listens with a backlog of 5
+
+
+def serve():
+    from fakeredis import TcpFakeServer
+
+    server = TcpFakeServer(("127.0.0.1", PORT), server_type="redis")
+    server.serve_forever()
+
+
+async def wait_for_server(client):
+    for _ in range(100):
+        try:
+            await client.ping()
+            return
+        except (aioredis.ConnectionError, OSError):
+            await asyncio.sleep(0.05)
+    raise RuntimeError("Fake Redis server did not start")
+
+
+async def sequential(limiter):
+    latencies = []
+    for i in range(HITS):
+        start = time.perf_counter()
+        await limiter.hit(f"10.0.{i % 256}.{i % 97}")
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+async def concurrent(limiter):
+    async def client(n):
+        for i in range(HITS // CONCURRENCY):
+            await limiter.hit(f"10.1.{n}.{i % 50}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(CONCURRENCY)))
+    return HITS / (time.perf_counter() - start)
+
+
+async def main():
+    client = aioredis.Redis(host="127.0.0.1", port=PORT)
+    await wait_for_server(client)
+    limiters = {
+        "memory": MemoryRateLimiter(1000, 60),
+        "redis": RedisRateLimiter(client, 1000, 60),
+    }
+    # The fake TCP server drops the connection after a NOSCRIPT error, so load the script first.
+    await client.script_load(GCRA_SCRIPT)
+    for name, limiter in limiters.items():
+        p50, p99 = await sequential(limiter)
+        throughput = await concurrent(limiter)
+        print(
+            f"{name:>6}: p50 {p50 * 1e6:8.1f} us | p99 {p99 * 1e6:8.1f} us | "
+            f"{throughput:9.0f} hits/s with {CONCURRENCY} concurrent clients"
+        )
+    pings = []
+    for _ in range(HITS):
+        start = time.perf_counter()
+        await client.ping()
+        pings.append(time.perf_counter() - start)
+    print(f"  ping: p50 {statistics.median(pings) * 1e6:8.1f} us (round-trip floor of the server)")
+    await client.aclose()
+
+
+if __name__ == "__main__":
+    server = multiprocessing.Process(target=serve, daemon=True)
+    server.start()
+    try:
+        asyncio.run(main())
+    finally:
+        server.terminate()
@@ -0,0 +1,173 @@
+import bisect
+import random
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api_template.middleware import request_middleware
+from api_template.middleware.metrics import (
+    UNMATCHED_ROUTE,
+    LatencyHistogram,
+    LogLinearBuckets,
+    RequestMetrics,
+)
+from api_template.middleware.request_middleware import (
+    RequestContextLogMiddleware,
+    get_response_duration,
+)
+
+
+def test_bucket_index_matches_bounds():
+    buckets = LogLinearBuckets(min_value=1e-4, max_value=60.0, sub_buckets=4)
+    rng = random.Random(0)
+    values = [10 ** rng.uniform(-6, 2) for _ in range(10000)]
+
+    for value in values + buckets.bounds:
+        index = buckets.index(value)
+        # The bucket of a value is the first one whose bound is not below it
+        assert index == bisect.bisect_left(buckets.bounds, value), value
+
+
+def test_buckets_cover_range_with_bounded_relative_error():
+    buckets = LogLinearBuckets(min_value=1e-3, max_value=10.0, sub_buckets=4)
+
+    assert buckets.bounds[0] == 1e-3
+    assert buckets.bounds[-1] >= 10.0
+    for lower, upper in zip(buckets.bounds, buckets.bounds[1:]):
+        assert (upper - lower) / lower <= 0.25 + 1e-9
+    assert buckets.index(0.0) == 0
+    assert buckets.index(1e6) == buckets.overflow == len(buckets) - 1
+
+
+def test_invalid_buckets():
+    with pytest.raises(ValueError):
+        LogLinearBuckets(min_value=1.0, max_value=0.5)
+
+
+def test_histogram_records_sum_and_count():
+    histogram = LatencyHistogram(LogLinearBuckets())
+    for value in (0.001, 0.002, 5.0):
+        histogram.record(value)
+
+    assert histogram.count == 3
+    assert histogram.sum == pytest.approx(5.003)
+    assert sum(histogram.counts) == 3
+
+
+def test_render_prometheus_text():
+    metrics = RequestMetrics(LogLinearBuckets(min_value=0.01, max_value=1.0, sub_buckets=1))
+    metrics.observe("GET", '/items/{item_id}"', 200, 0.015)
+    metrics.observe("GET", '/items/{item_id}"', 200, 0.5)
+    metrics.observe("GET", '/items/{item_id}"', 200, 2.0)
+
+    lines = metrics.render().splitlines()
+
+    labels = 'method="GET",route="/items/{item_id}\\"",status="200"'
+    assert lines[:2] == [
+        "# HELP http_request_duration_seconds Duration of HTTP requests by route template.",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    assert lines[2:] == [
+        f'http_request_duration_seconds_bucket{{{labels},le="0.01"}} 0',
+        f'http_request_duration_seconds_bucket{{{labels},le="0.02"}} 1',
+        f'http_request_duration_seconds_bucket{{{labels},le="0.04"}} 1',
+        f'http_request_duration_seconds_bucket{{{labels},le="0.08"}} 1',
+        f'http_request_duration_seconds_bucket{{{labels},le="0.16"}} 1',
+        f'http_request_duration_seconds_bucket{{{labels},le="0.32"}} 1',
+        f'http_request_duration_seconds_bucket{{{labels},le="0.64"}} 2',
+        f'http_request_duration_seconds_bucket{{{labels},le="1.28"}} 2',
+        f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 3',
+        f"http_request_duration_seconds_sum{{{labels}}} 2.515",
+        f"http_request_duration_seconds_count{{{labels}}} 3",
+    ]
+
+
+def test_bounds_are_upper_inclusive():
+    metrics = RequestMetrics(LogLinearBuckets(min_value=0.01, max_value=1.0, sub_buckets=1))
+    for value in (0.01, 0.02, 0.64):
+        metrics.observe("GET", "/", 200, value)
+
+    lines = metrics.render().splitlines()
+
+    labels = 'method="GET",route="/",status="200"'
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.01"}} 1' in lines
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.02"}} 2' in lines
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.32"}} 2' in lines
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.64"}} 3' in lines
+
+
+def test_non_standard_methods_share_a_label():
+    metrics = RequestMetrics()
+    for method in ("GET", "PROPFIND", "X-RANDOM-1", "X-RANDOM-2"):
+        metrics.observe(method, UNMATCHED_ROUTE, 405, 0.001)
+
+    assert set(metrics.histograms) == {
+        ("GET", UNMATCHED_ROUTE, 405),
+        ("other", UNMATCHED_ROUTE, 405),
+    }
+    assert metrics.histograms[("other", UNMATCHED_ROUTE, 405)].count == 3
+
+
+@pytest.fixture
+def metrics():
+    return RequestMetrics()
+
+
+@pytest.fixture
+def app(metrics):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {"item_id": item_id}
+
+    app.add_middleware(RequestContextLogMiddleware, metrics=metrics)
+    return app
+
+
+async def get(app, path):
+    transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 5000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get(path)
+
+
+@pytest.mark.asyncio
+async def test_middleware_records_route_templates(app, metrics):
+    for item_id in (1, 2, 3):
+        assert (await get(app, f"/items/{item_id}")).status_code == 200
+    assert (await get(app, "/unknown")).status_code == 404
+
+    assert metrics.histograms[("GET", "/items/{item_id}", 200)].count == 3
+    assert metrics.histograms[("GET", UNMATCHED_ROUTE, 404)].count == 1
+    assert len(metrics.histograms) == 2
+
+
+@pytest.mark.asyncio
+async def test_duration_keeps_whole_seconds(monkeypatch):
+    times = [100.0, 102.5]
+    monkeypatch.setattr(
+        request_middleware.time,
+        "perf_counter",
+        lambda: times.pop(0) if len(times) > 1 else times[0],
+    )
+    metrics = RequestMetrics()
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 204, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = RequestContextLogMiddleware(app, sample_rate=0.0, metrics=metrics)
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": []}
+    await middleware(scope, receive, send)
+
+    assert get_response_duration() == 2_500_000
+    histogram = metrics.histograms[("GET", UNMATCHED_ROUTE, 204)]
+    assert histogram.sum == 2.5
@@ -0,0 +1,162 @@
+import logging
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from api_template.middleware.ratelimit_middleware import RateLimitMiddleware
+from api_template.middleware.request_middleware import (
+    CORRELATION_ID_HEADER,
+    RequestContextLogMiddleware,
+    get_correlation_id,
+)
+from api_template.middleware.security_headers_middleware import SecurityHeadersMiddleware
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"body": (await request.body()).decode(), "correlation_id": get_correlation_id()}
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            yield b"first,"
+            yield b"second"
+
+        return StreamingResponse(chunks(), headers={"X-XSS-Protection": "0"})
+
+    app.add_middleware(RequestContextLogMiddleware)
+    app.add_middleware(RateLimitMiddleware, max_requests=100, period=60)
+    app.add_middleware(SecurityHeadersMiddleware)
+    return app
+
+
+def make_client(app, client=("127.0.0.1", 5000)):
+    transport = httpx.ASGITransport(app=app, client=client)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@pytest.mark.asyncio
+async def test_request_body_and_correlation_id_reach_the_app(app, caplog):
+    caplog.set_level(logging.INFO, logger="api_template.middleware.request_middleware")
+    async with make_client(app) as client:
+        response = await client.post(
+            "/echo", content=b"hello", headers={CORRELATION_ID_HEADER: "c1"}
+        )
+
+    assert response.json() == {"body": "hello", "correlation_id": "c1"}
+    assert response.headers[CORRELATION_ID_HEADER] == "c1"
+    assert "Body: hello" in caplog.text
+    assert "Response: 200" in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_security_headers_replace_the_app_headers(app):
+    async with make_client(app) as client:
+        response = await client.get("/stream")
+
+    assert response.text == "first,second"
+    assert response.headers["X-XSS-Protection"] == "1; mode=block"
+    assert response.headers.get_list("X-XSS-Protection") == ["1; mode=block"]
+    assert "max-age" in response.headers["Strict-Transport-Security"]
+    assert response.headers[CORRELATION_ID_HEADER]
+
+
+@pytest.mark.asyncio
+async def test_invalid_client_ips_are_rejected(app):
+    async with make_client(app, client=("testclient", 5000)) as client:
+        response = await client.get("/stream")
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid IP address"}
+    assert response.headers["X-XSS-Protection"] == "1; mode=block"
+
+
+def make_logged_app(**kwargs):
+    app = FastAPI()
+
+    @app.post("/items/{item_id}")
+    async def create(item_id: int, request: Request):
+        return {"size": len(await request.body())}
+
+    @app.get("/events")
+    async def events():
+        async def chunks():
+            for i in range(3):
+                yield f"data: {i}\n\n".encode()
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.get("/missing")
+    async def missing():
+        raise HTTPException(status_code=404)
+
+    app.add_middleware(RequestContextLogMiddleware, **kwargs)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_bodies_are_capped(caplog):
+    caplog.set_level(logging.INFO, logger="api_template.middleware.request_middleware")
+    async with make_client(make_logged_app(max_body_bytes=8)) as client:
+        response = await client.post("/items/1", content=b"x" * 1000)
+
+    assert response.json() == {"size": 1000}
+    assert "Body: xxxxxxxx... (1000 bytes)" in caplog.text
+    assert 'Body: {"size":... (13 bytes)' in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_event_streams_are_not_captured(caplog):
+    caplog.set_level(logging.INFO, logger="api_template.middleware.request_middleware")
+    async with make_client(make_logged_app()) as client:
+        response = await client.get("/events")
+
+    assert response.text == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+    assert "Body: <stream of 27 bytes>" in caplog.text
+    assert "data: 0" not in caplog.text
+
+
+@pytest.mark.asyncio
+async def test_sampling_by_status_then_route(caplog):
+    caplog.set_level(logging.INFO, logger="api_template.middleware.request_middleware")
+    app = make_logged_app(
+        sample_rate=0.0,
+        route_sample_rates={"/items/{item_id}": 1.0},
+        status_sample_rates={"4xx": 1.0, "422": 0.0},
+    )
+    async with make_client(app) as client:
+        await client.get("/events")
+        await client.get("/missing")
+        await client.post("/items/1", content=b"{}")
+        await client.post("/items/not-a-number", content=b"{}")
+
+    responses = [r.getMessage() for r in caplog.records if r.getMessage().startswith("Response")]
+    assert [message.split(" ")[1] for message in responses] == ["404", "200"]
+
+
+@pytest.mark.asyncio
+async def test_response_is_logged_after_its_last_chunk_is_sent(caplog):
+    caplog.set_level(logging.INFO, logger="api_template.middleware.request_middleware")
+    sent = []
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"done"})
+
+    async def send(message):
+        sent.append((message["type"], len(caplog.records)))
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [], "query_string": b""}
+    await RequestContextLogMiddleware(app)(scope, receive, send)
+
+    assert sent == [("http.response.start", 0), ("http.response.body", 0)]
+    assert [r.getMessage().split(" ")[0] for r in caplog.records] == ["Request:", "Response:"]
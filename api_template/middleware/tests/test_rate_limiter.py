@@ -0,0 +1,128 @@
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api_template.middleware.rate_limiter import MemoryRateLimiter, RedisRateLimiter
+from api_template.middleware.ratelimit_middleware import RateLimitMiddleware
+
+
+def test_allows_bursts_up_to_max_requests():
+    limiter = MemoryRateLimiter(max_requests=3, period=60)
+
+    results = [limiter.acquire("1.2.3.4", now=100.0) for _ in range(4)]
+
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert [result.remaining for result in results[:3]] == [2, 1, 0]
+    assert results[3].retry_after == pytest.approx(20.0)
+
+
+def test_allowance_refills_over_the_period():
+    limiter = MemoryRateLimiter(max_requests=3, period=60)
+    for _ in range(3):
+        limiter.acquire("1.2.3.4", now=100.0)
+
+    assert not limiter.acquire("1.2.3.4", now=119.0).allowed
+    assert limiter.acquire("1.2.3.4", now=120.0).allowed
+    assert limiter.acquire("1.2.3.4", now=300.0).remaining == 2
+
+
+def test_keys_are_limited_independently():
+    limiter = MemoryRateLimiter(max_requests=1, period=60)
+
+    assert limiter.acquire("1.1.1.1", now=0.0).allowed
+    assert limiter.acquire("2.2.2.2", now=0.0).allowed
+    assert not limiter.acquire("1.1.1.1", now=0.0).allowed
+
+
+def test_memory_is_bounded_and_idle_keys_are_reused():
+    limiter = MemoryRateLimiter(max_requests=1, period=1, max_keys=64)
+    size = limiter.nbytes
+
+    for i in range(10_000):
+        limiter.acquire(f"10.0.{i // 256}.{i % 256}", now=float(i))
+
+    assert limiter.nbytes == size == 64 * 16
+    assert limiter.evictions == 0
+
+
+def test_full_sets_evict_active_keys():
+    limiter = MemoryRateLimiter(max_requests=1, period=60, max_keys=4, ways=4)
+
+    for i in range(5):
+        limiter.acquire(f"10.0.0.{i}", now=0.0)
+
+    assert limiter.evictions == 1
+
+
+@pytest.mark.asyncio
+async def test_middleware_responds_429_with_retry_after():
+    app = FastAPI()
+    app.add_middleware(RateLimitMiddleware, max_requests=2, period=60)
+
+    @app.get("/")
+    async def root():
+        return {}
+
+    transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 5000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        statuses = [(await client.get("/")).status_code for _ in range(3)]
+        response = await client.get("/")
+
+    assert statuses == [200, 200, 429]
+    assert response.json() == {"detail": "Too many requests"}
+    assert int(response.headers["Retry-After"]) > 0
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeServer()
+
+
+@pytest.mark.asyncio
+async def test_redis_limits_are_shared_between_workers(fake_redis):
+    import fakeredis
+
+    workers = [
+        RedisRateLimiter(fakeredis.aioredis.FakeRedis(server=fake_redis), 3, 60) for _ in range(2)
+    ]
+
+    results = [await workers[i % 2].hit("1.2.3.4") for i in range(4)]
+
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert [result.remaining for result in results[:3]] == [2, 1, 0]
+    assert 0 < results[3].retry_after <= 20
+    assert (await workers[0].hit("5.6.7.8")).allowed
+
+
+@pytest.mark.asyncio
+async def test_redis_keys_expire_when_idle(fake_redis):
+    import fakeredis
+
+    client = fakeredis.aioredis.FakeRedis(server=fake_redis)
+    limiter = RedisRateLimiter(client, 10, 60)
+
+    await limiter.hit("1.2.3.4")
+
+    assert 0 < await client.pttl("ratelimit:1.2.3.4") <= 6000
+
+
+@pytest.mark.asyncio
+async def test_redis_failures_fall_back_to_the_memory_limiter(fake_redis):
+    import fakeredis
+
+    fake_redis.connected = False
+    fallback = MemoryRateLimiter(1, 60)
+    limiter = RedisRateLimiter(
+        fakeredis.aioredis.FakeRedis(server=fake_redis), 1, 60, fallback=fallback
+    )
+
+    assert (await limiter.hit("1.2.3.4")).allowed
+    assert not (await limiter.hit("1.2.3.4")).allowed
+    assert limiter._retry_at > 0
+
+    fake_redis.connected = True
+    limiter._retry_at = 1.0
+    assert (await limiter.hit("1.2.3.4")).allowed
+    assert limiter._retry_at == 0.0
@@ -24,6 +24,12 @@ class QueueConfig(BaseModel):
     ssl_context: Optional[Any] = None
     heartbeat: int = 60
     enable_dlq: bool = False
+    # Messages handled at a time per consumer, and sent by the broker ahead of their acks (by
+    # default twice max_concurrency)
+    max_concurrency: int = 1
+    prefetch_count: Optional[int] = None
+    # Seconds to let the messages in progress complete when the consumer stops
+    drain_timeout: float = 30.0
 
     def create_ssl_context(self, ssl_options: dict) -> Optional[ssl.SSLContext]:
         if not ssl_options.get("enabled"):
@@ -1,5 +1,9 @@
+import asyncio
+import inspect
 import logging
-from typing import Any, Callable, Dict, TYPE_CHECKING
+from concurrent.futures import Executor, ThreadPoolExecutor
+from enum import Enum
+from typing import Any, Callable, Dict, Optional, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from api_template.queue.core.manager.queue_message_handler import QueueMessageHandler
@@ -7,25 +11,151 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+class HandlerExecutor(str, Enum):
+    # Sync handlers doing I/O, or CPU work that releases the GIL
+    THREAD = "thread"
+    # Sync CPU-bound handlers; the handler and the message must be picklable
+    PROCESS = "process"
+
+
+class HandlerTimeout(Exception):
+    pass
+
+
+class HandlerOptions:
+    """
+    How the handler of a message type runs: coroutine handlers on the event loop, sync ones on
+    the executor. At most max_concurrency messages of the type are handled at a time, and
+    each may take up to timeout seconds.
+    """
+
+    def __init__(
+        self,
+        is_async: bool,
+        executor: HandlerExecutor = HandlerExecutor.THREAD,
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.is_async = is_async
+        self.executor = HandlerExecutor(executor)
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._loop = None
+        self._semaphore = None
+
+    def get_semaphore(self) -> Optional[asyncio.Semaphore]:
+        if self.max_concurrency is None:
+            return None
+        # A semaphore is bound to the event loop that first waits on it
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop, self._semaphore = loop, asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+
 class MessageProcessor:
-    def __init__(self):
+    """
+    Dispatches messages to the handler of their type. Sync handlers never run on the event
+    loop: they run on thread_pool (by default max_threads threads of its own) or on
+    process_pool, e.g. app.state.executor, as chosen when adding the handler.
+    """
+
+    def __init__(
+        self,
+        thread_pool: Executor = None,
+        process_pool: Executor = None,
+        max_threads: int = 4,
+    ):
         self.handlers: Dict[str, Callable] = {}
+        self.options: Dict[str, HandlerOptions] = {}
+        self.max_threads = max_threads
+        self.process_pool = process_pool
+        self._thread_pool = thread_pool
+
+    @property
+    def thread_pool(self) -> Executor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.max_threads, thread_name_prefix="queue-handler"
+            )
+        return self._thread_pool
 
-    def add_handler(self, message_type: str, handler: Callable):
+    def add_handler(
+        self,
+        message_type: str,
+        handler: Callable,
+        executor: HandlerExecutor = HandlerExecutor.THREAD,
+        timeout: Optional[float] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        """
+        Registers the handler of message_type.
+        :param message_type:
+        :param handler: Coroutine function, or function run on executor.
+        :param executor: Where a sync handler runs, ignored for coroutine handlers. Without a
+        process pool, PROCESS handlers run on the thread pool.
+        :param timeout: Seconds after which the message fails, None for no limit.
+        :param max_concurrency: Messages of the type handled at a time, None for no limit.
+        """
         self.handlers[message_type] = handler
+        self.options[message_type] = HandlerOptions(
+            inspect.iscoroutinefunction(handler)
+            or inspect.iscoroutinefunction(getattr(handler, "__call__", None)),
+            executor,
+            timeout,
+            max_concurrency,
+        )
+
+    async def run_handler(self, message_type: str, handler: Callable, message: Any):
+        options = self.options.get(message_type) or HandlerOptions(False)
+        semaphore = options.get_semaphore()
+        if semaphore is not None:
+            await semaphore.acquire()
+        if options.is_async:
+            try:
+                await asyncio.wait_for(handler(message), options.timeout)
+            except asyncio.TimeoutError:
+                raise HandlerTimeout(f"{message_type} handler timed out after {options.timeout} s")
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+            return
+
+        if options.executor == HandlerExecutor.PROCESS and self.process_pool is not None:
+            executor = self.process_pool
+        else:
+            executor = self.thread_pool
+        try:
+            future = executor.submit(handler, message)
+        except BaseException:
+            if semaphore is not None:
+                semaphore.release()
+            raise
+        if semaphore is not None:
+            # A timed out handler keeps running on its worker, and keeps its slot until done
+            loop = asyncio.get_running_loop()
+            future.add_done_callback(lambda _: loop.call_soon_threadsafe(semaphore.release))
+        try:
+            await asyncio.wait_for(asyncio.wrap_future(future), options.timeout)
+        except asyncio.TimeoutError:
+            raise HandlerTimeout(f"{message_type} handler timed out after {options.timeout} s")
 
     async def process(self, message_type: str, message: Any, queue_handler: "QueueMessageHandler"):
         logger.info(
-            f"Processing message: {message_type} - Body: {message} - Handler: {queue_handler}"
+            "Processing message: %s - Body: %s - Handler: %s", message_type, message, queue_handler
         )
         handler = self.handlers.get(message_type)
         if handler:
             try:
-                handler(message)
+                await self.run_handler(message_type, handler, message)
                 await queue_handler.ack()
             except Exception as e:
-                logger.error(f"Error processing message: {str(e)}")
+                logger.error("Error processing message: %s", e)
                 await queue_handler.retry(message)
         else:
-            logger.error(f"No handler registered for message type: {message_type}")
+            logger.error("No handler registered for message type: %s", message_type)
             await queue_handler.nack(message)
+
+    def close(self):
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,189 @@
+import asyncio
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import AsyncMock
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from api_template.queue.core.manager.message_processor import HandlerExecutor, MessageProcessor
+from api_template.queue.core.providers.rabbitmq.consumer import AsyncRabbitMQConsumer
+from api_template.queue.core.providers.rabbitmq.tests.stub_broker import StubBroker
+
+
+def burn_cpu(message):
+    # Holds the GIL for message["seconds"]
+    deadline = time.perf_counter() + message["seconds"]
+    while time.perf_counter() < deadline:
+        pass
+    return os.getpid()
+
+
+@pytest.fixture
+def process_pool():
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        # Starts a worker before any measurement
+        pool.submit(burn_cpu, {"seconds": 0}).result()
+        yield pool
+
+
+@pytest.fixture
+def processor(process_pool):
+    processor = MessageProcessor(process_pool=process_pool, max_threads=2)
+    yield processor
+    processor.close()
+
+
+@pytest.mark.asyncio
+async def test_handlers_run_on_the_loop_or_on_their_executor(processor):
+    threads = {}
+
+    async def on_loop(message):
+        threads["async"] = threading.current_thread().name
+
+    def on_thread(message):
+        threads["sync"] = threading.current_thread().name
+
+    processor.add_handler("async", on_loop)
+    processor.add_handler("sync", on_thread)
+    processor.add_handler("cpu", burn_cpu, executor=HandlerExecutor.PROCESS)
+    queue_handler = AsyncMock()
+
+    for message_type in ("async", "sync"):
+        await processor.process(message_type, {}, queue_handler)
+    assert threads["async"] == threading.current_thread().name
+    assert threads["sync"].startswith("queue-handler")
+    assert await processor.run_handler("cpu", burn_cpu, {"seconds": 0}) != os.getpid()
+    assert queue_handler.ack.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_timed_out_handlers_are_retried(processor):
+    async def slow(message):
+        await asyncio.sleep(1)
+
+    processor.add_handler("async", slow, timeout=0.01)
+    processor.add_handler("sync", burn_cpu, timeout=0.01)
+    queue_handler = AsyncMock()
+
+    await processor.process("async", {}, queue_handler)
+    await processor.process("sync", {"seconds": 0.1}, queue_handler)
+
+    queue_handler.ack.assert_not_awaited()
+    assert queue_handler.retry.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_holds_until_timed_out_handlers_complete(processor):
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def handler(message):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(message["seconds"])
+        with lock:
+            running -= 1
+
+    processor.add_handler("sync", handler, timeout=0.02, max_concurrency=1)
+    queue_handler = AsyncMock()
+
+    await asyncio.gather(
+        *(processor.process("sync", {"seconds": 0.05}, queue_handler) for _ in range(3))
+    )
+    assert max_running == 1
+
+
+async def ping_latencies(client, done: asyncio.Event, interval: float = 0.005):
+    # Measured from when each request is due, as a client outside the process would see it:
+    # a blocked event loop also delays the request itself
+    latencies = []
+    due = time.perf_counter()
+    while not done.is_set():
+        response = await client.get("/ping")
+        assert response.status_code == 200
+        latencies.append(time.perf_counter() - due)
+        due = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def ping_latencies_for(client, seconds: float):
+    done = asyncio.Event()
+    asyncio.get_running_loop().call_later(seconds, done.set)
+    return await ping_latencies(client, done)
+
+
+async def consume_while_pinging(processor, messages: int):
+    """
+    Consumes messages of CPU-heavy handlers from a stub broker, two at a time, and returns the
+    latencies of the HTTP requests served by the same event loop meanwhile.
+    """
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    broker = StubBroker()
+    for _ in range(messages):
+        broker.publish({"type": "cpu", "seconds": 0.2})
+    consumer = AsyncRabbitMQConsumer("test_message_processor", None, processor, max_concurrency=2)
+    consumer.connection_manager = broker
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        idle = await ping_latencies_for(client, 0.2)
+        pinging = asyncio.create_task(ping_latencies(client, done))
+        consuming = asyncio.create_task(consumer.start_consuming())
+        while len(broker.acked) < messages:
+            await asyncio.sleep(0.01)
+        done.set()
+        busy = await pinging
+        await consumer.stop_consuming()
+        await consuming
+    return idle, busy
+
+
+@pytest.mark.asyncio
+async def test_http_latency_stays_flat_while_sync_handlers_burn_cpu(processor):
+    processor.add_handler("cpu", burn_cpu, executor=HandlerExecutor.PROCESS)
+
+    idle, busy = await consume_while_pinging(processor, messages=6)
+
+    # Six 200 ms handlers, two at a time: requests kept being served meanwhile
+    assert len(busy) > 20
+    assert statistics.median(busy) < max(3 * statistics.median(idle), 0.005)
+    assert max(busy) < 0.05
+
+
+@pytest.mark.asyncio
+async def test_http_requests_are_not_stalled_by_sync_handlers_on_threads(processor):
+    processor.add_handler("cpu", burn_cpu, executor=HandlerExecutor.THREAD)
+
+    _, busy = await consume_while_pinging(processor, messages=6)
+
+    # The handlers hold the GIL, which the event loop gets back every few milliseconds
+    assert len(busy) > 20
+    assert max(busy) < 0.1
+
+
+@pytest.mark.asyncio
+async def test_http_latency_follows_cpu_heavy_handlers_on_the_loop(processor):
+    async def burn_cpu_on_loop(message):
+        burn_cpu(message)
+
+    processor.add_handler("cpu", burn_cpu_on_loop)
+
+    _, busy = await consume_while_pinging(processor, messages=3)
+
+    assert max(busy) >= 0.15
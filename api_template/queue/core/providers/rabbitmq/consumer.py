@@ -12,25 +12,66 @@ logger = logging.getLogger(__name__)
 
 
 class AsyncRabbitMQConsumer(QueueConsumer):
-    def __init__(self, queue_name, queue_config, message_processor: MessageProcessor):
+    """
+    Consumes a queue, handling up to max_concurrency messages at a time, each in a task of its
+    own. The broker sends at most prefetch_count messages ahead of their acks (basic.qos), by
+    default twice max_concurrency, so that the next messages are already there when handlers
+    complete.
+
+    Each message is acked (or rejected, when its handler fails) as soon as its handler
+    completes, by its own delivery tag: acks go out in completion order, never with
+    multiple=True, which would also ack the earlier messages still being handled.
+
+    stop_consuming cancels the subscription, lets the handlers in progress complete for up to
+    drain_timeout seconds, then closes the channel: the broker requeues the messages left
+    unacked.
+    """
+
+    def __init__(
+        self,
+        queue_name,
+        queue_config,
+        message_processor: MessageProcessor,
+        max_concurrency: int = None,
+        prefetch_count: int = None,
+        drain_timeout: float = None,
+    ):
         self.queue_name = queue_name
         self.connection_manager = RabbitMQConnectionManager(queue_name, queue_config)
         self.message_processor = message_processor
+        self.max_concurrency = max_concurrency or getattr(queue_config, "max_concurrency", 1)
+        self.prefetch_count = (
+            prefetch_count
+            or getattr(queue_config, "prefetch_count", None)
+            or 2 * self.max_concurrency
+        )
+        if drain_timeout is None:
+            drain_timeout = getattr(queue_config, "drain_timeout", 30.0)
+        self.drain_timeout = drain_timeout
         self._running = False
         self._connection = None
         self._channel = None
+        self._consuming = None
+        # Set while taking messages, the only step stop_consuming interrupts
+        self._receiving = False
+        self._handlers = set()
+        self._slots = None
 
     async def process_message(self, message):
         # try:
-        logger.info(f"Processing message: {message}")
+        logger.info("Processing message: %s", message)
         message_body = json.loads(message.body.decode())
         message_type = message_body.get("type")
         if message_type:
             queue_handler = RabbitMQMessageHandler(self._channel, message)
             logger.info(
-                f"Processing message: {message_type} - Body: {message_body} - Handler: {queue_handler} - Method: {message}"
+                "Processing message: %s - Body: %s - Handler: %s - Method: %s",
+                message_type,
+                message_body,
+                queue_handler,
+                message,
             )
-            logger.info(f"message_processor: {self.message_processor}")
+            logger.info("message_processor: %s", self.message_processor)
             await self.message_processor.process(message_type, message_body, queue_handler)
         else:
             raise ValueError("Message type not specified")
@@ -40,20 +81,75 @@ class AsyncRabbitMQConsumer(QueueConsumer):
         #     raise e
         #     logger.error(f"Error processing message: {str(e)}")
 
+    async def _handle(self, message):
+        try:
+            await self.process_message(message)
+        except Exception as e:
+            logger.error("Error processing message: %s :: %s", e, traceback.format_exc())
+            if not message.processed:
+                await message.reject(requeue=False)
+        else:
+            # The message handler may have settled it already, e.g. nacked for a retry
+            if not message.processed:
+                await message.ack()
+
+    async def _run_handler(self, message):
+        try:
+            await self._handle(message)
+        except Exception as e:
+            # e.g. the channel closed before the ack, the broker redelivers the message
+            logger.error("Could not settle message: %s", e)
+        finally:
+            self._slots.release()
+
+    async def _drain(self):
+        """
+        Waits up to drain_timeout seconds for the handlers in progress, then cancels the rest.
+        """
+        if not self._handlers:
+            return
+        logger.info("Waiting for %d messages of %s", len(self._handlers), self.queue_name)
+        _, pending = await asyncio.wait(self._handlers, timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning(
+                "Cancelled %d messages of %s still handled after %s s, they will be redelivered",
+                len(pending),
+                self.queue_name,
+                self.drain_timeout,
+            )
+            await asyncio.wait(pending)
+
+    async def _consume(self, queue):
+        async with queue.iterator() as queue_iter:
+            self._receiving = True
+            try:
+                while self._running:
+                    # Waits for a free handler before taking the next message
+                    await self._slots.acquire()
+                    try:
+                        message = await queue_iter.__anext__()
+                    except BaseException:
+                        self._slots.release()
+                        raise
+                    task = asyncio.create_task(self._run_handler(message))
+                    self._handlers.add(task)
+                    task.add_done_callback(self._handlers.discard)
+            finally:
+                self._receiving = False
+
     async def start_consuming(self):
         self._running = True
+        self._consuming = asyncio.current_task()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
         while self._running:
             try:
                 self._connection = await self.connection_manager.get_async_connection()
                 self._channel = await self._connection.channel()
+                await self._channel.set_qos(prefetch_count=self.prefetch_count)
                 queue = await self._channel.declare_queue(self.queue_name, durable=True)
-
-                async with queue.iterator() as queue_iter:
-                    async for message in queue_iter:
-                        if not self._running:
-                            break
-                        async with message.process():
-                            await self.process_message(message)
+                await self._consume(queue)
             except asyncio.CancelledError:
                 logger.info("Consumer cancelled")
                 break
@@ -61,15 +157,27 @@ class AsyncRabbitMQConsumer(QueueConsumer):
                 logger.error(f"Error in consumer loop: {str(e)} :: {traceback.format_exc()}")
                 await asyncio.sleep(5)
             finally:
+                # Acks need the channel that delivered the messages
+                await self._drain()
                 if self._channel and not self._channel.is_closed:
                     await self._channel.close()
                 if self._connection and not self._connection.is_closed:
                     await self.connection_manager.release_async_connection(self._connection)
                     self._connection = None
                     self._channel = None
+        self._consuming = None
 
     async def stop_consuming(self):
+        """
+        Stops taking messages, and returns once the handlers in progress are done (see
+        drain_timeout) and the channel is closed.
+        """
         self._running = False
+        consuming = self._consuming
+        if consuming is not None and consuming is not asyncio.current_task():
+            if self._receiving:
+                consuming.cancel()
+            await asyncio.wait([consuming])
         if self._channel and not self._channel.is_closed:
             await self._channel.close()
         if self._connection and not self._connection.is_closed:
@@ -0,0 +1,84 @@
+"""
+Consumer throughput (messages/sec) at handler latencies of 1 ms, 10 ms and 100 ms, for the
+previous consumer (one message at a time, no basic.qos: the broker sends everything it has)
+and for bounded pools of concurrent handlers with a prefetch count.
+
+The broker is the in-memory stub of stub_broker, with 1 ms between an ack and the delivery
+it allows, as on a local network. Handlers are coroutines sleeping for their latency, i.e.
+waiting on I/O. Logging is at WARNING, to measure the consumer itself.
+
+Run with: python -m api_template.queue.core.providers.rabbitmq.tests.bench_consumer_concurrency
+"""
+
+import asyncio
+import logging
+import time
+
+from api_template.queue.core.manager.message_processor import MessageProcessor
+from api_template.queue.core.providers.rabbitmq.consumer import AsyncRabbitMQConsumer
+from api_template.queue.core.providers.rabbitmq.tests.stub_broker import StubBroker
+
+NETWORK_LATENCY = 0.001
+HANDLER_LATENCIES = (0.001, 0.01, 0.1)
+# Name, max_concurrency, prefetch_count (0: no limit)
+CONSUMERS = (
+    ("sequential, no qos", 1, 0),
+    ("sequential, prefetch 2", 1, 2),
+    ("10 handlers, prefetch 20", 10, 20),
+    ("50 handlers, prefetch 100", 50, 100),
+)
+# Each run takes about this many seconds of handler time
+RUN_SECONDS = 2.0
+MAX_MESSAGES = 20_000
+
+
+async def run(handler_latency: float, max_concurrency: int, prefetch_count: int) -> float:
+    broker = StubBroker(latency=NETWORK_LATENCY)
+    processor = MessageProcessor()
+
+    async def handler(message):
+        await asyncio.sleep(handler_latency)
+
+    processor.add_handler("job", handler)
+    consumer = AsyncRabbitMQConsumer(
+        "bench_consumer_concurrency", None, processor, max_concurrency=max_concurrency
+    )
+    consumer.prefetch_count = prefetch_count
+    consumer.connection_manager = broker
+
+    messages = min(int(RUN_SECONDS / handler_latency * max_concurrency), MAX_MESSAGES)
+    for i in range(messages):
+        broker.publish({"type": "job", "id": i})
+    done = asyncio.Event()
+    settle = broker.settle
+
+    def count_settled(*args):
+        settle(*args)
+        if len(broker.acked) == messages:
+            done.set()
+
+    broker.settle = count_settled
+    start = time.perf_counter()
+    task = asyncio.create_task(consumer.start_consuming())
+    await done.wait()
+    elapsed = time.perf_counter() - start
+    await consumer.stop_consuming()
+    await task
+    return messages / elapsed
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger().setLevel(logging.WARNING)
+    header = " | ".join(f"{latency * 1e3:>5.0f} ms" for latency in HANDLER_LATENCIES)
+    print(f"{'msg/s at handler latency':>26}: {header}")
+    for name, max_concurrency, prefetch_count in CONSUMERS:
+        rates = [
+            asyncio.run(run(latency, max_concurrency, prefetch_count))
+            for latency in HANDLER_LATENCIES
+        ]
+        print(f"{name:>26}: " + " | ".join(f"{rate:8.0f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
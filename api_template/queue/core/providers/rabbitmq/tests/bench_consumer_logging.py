@@ -0,0 +1,147 @@
+"""
+Consumer throughput with logging enabled (INFO, written to a file): messages/sec through
+AsyncRabbitMQConsumer.process_message with a no-op handler, for the previous logging
+(f-strings and json.dumps formatted in the event loop, written by a synchronous handler) and
+for the queued pipeline. "drained" also counts the time the listener thread needs to write
+the remaining records, i.e. the throughput the consumer can sustain. "loop busy" is the event
+loop time per message when messages arrive in bursts of BURST, with idle time in between (as
+when the consumer waits for the broker), which the listener thread uses to write.
+
+Run with: python -m api_template.queue.core.providers.rabbitmq.tests.bench_consumer_logging
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+from api_template.config.logging import create_handler, setup_logging, shutdown_logging
+from api_template.queue.core.manager.message_processor import MessageProcessor
+from api_template.queue.core.providers.rabbitmq.consumer import AsyncRabbitMQConsumer
+from api_template.queue.core.providers.rabbitmq.message_handler import RabbitMQMessageHandler
+
+MESSAGES = 20_000
+BURST = 200
+BODY = json.dumps({"type": "user.created", "user": {"id": 1, "email": "user@example.com"}})
+
+legacy_logger = logging.getLogger("bench.legacy")
+
+
+class StubMessage:
+    routing_key = "users"
+    body = BODY.encode()
+
+    async def nack(self, requeue=False):
+        pass
+
+    def __str__(self):
+        return f"IncomingMessage:{{routing_key={self.routing_key}, body_size={len(self.body)}}}"
+
+
+class LegacyMessageHandler(RabbitMQMessageHandler):
+    async def ack(self):
+        log_data = {
+            "action": "message_processed",
+            "queue_name": self.message.routing_key,
+            "message": self.message.body.decode(),
+            "error": None,
+        }
+        legacy_logger.info(json.dumps(log_data))
+
+
+class LegacyMessageProcessor(MessageProcessor):
+    async def process(self, message_type, message, queue_handler):
+        legacy_logger.info(
+            f"Processing message: {message_type} - Body: {message} - Handler: {queue_handler}"
+        )
+        handler = self.handlers.get(message_type)
+        handler(message)
+        await queue_handler.ack()
+
+
+class LegacyConsumer(AsyncRabbitMQConsumer):
+    async def process_message(self, message):
+        legacy_logger.info(f"Processing message: {message}")
+        message_body = json.loads(message.body.decode())
+        message_type = message_body.get("type")
+        queue_handler = LegacyMessageHandler(self._channel, message)
+        legacy_logger.info(
+            f"Processing message: {message_type} - Body: {message_body} - Handler: {queue_handler} - Method: {message}"
+        )
+        legacy_logger.info(f"message_processor: {self.message_processor}")
+        await self.message_processor.process(message_type, message_body, queue_handler)
+
+
+async def consume(consumer):
+    message = StubMessage()
+    start = time.perf_counter()
+    for _ in range(MESSAGES):
+        await consumer.process_message(message)
+    return time.perf_counter() - start
+
+
+async def consume_bursts(consumer):
+    message = StubMessage()
+    busy = 0.0
+    for _ in range(MESSAGES // BURST):
+        start = time.perf_counter()
+        for _ in range(BURST):
+            await consumer.process_message(message)
+        busy += time.perf_counter() - start
+        await asyncio.sleep(0.02)
+    return busy / MESSAGES
+
+
+def run(name, consumer, path, json_format, **logging_options):
+    with open(path, "w") as stream:
+        setup_logging(handler=create_handler(json_format, stream), **logging_options)
+        start = time.perf_counter()
+        elapsed = asyncio.run(consume(consumer))
+        shutdown_logging()
+        drained = time.perf_counter() - start
+    with open(path) as f:
+        lines = sum(1 for _ in f)
+    with open(path, "w") as stream:
+        setup_logging(handler=create_handler(json_format, stream), **logging_options)
+        busy = asyncio.run(consume_bursts(consumer))
+        shutdown_logging()
+    print(
+        f"{name:>26}: {MESSAGES / elapsed:6.0f} msg/s | drained {MESSAGES / drained:6.0f} msg/s "
+        f"({lines:,} lines) | loop busy {busy * 1e6:5.1f} us/msg"
+    )
+
+
+def main():
+    processor = MessageProcessor()
+    processor.add_handler("user.created", lambda message: None)
+    legacy_processor = LegacyMessageProcessor()
+    legacy_processor.add_handler("user.created", lambda message: None)
+    consumer = AsyncRabbitMQConsumer("bench", {}, processor)
+    legacy_consumer = LegacyConsumer("bench", {}, legacy_processor)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.log")
+        for json_format in (False, True):
+            kind = "json" if json_format else "text"
+            run(
+                f"before, sync {kind}",
+                legacy_consumer,
+                path,
+                json_format=json_format,
+                asynchronous=False,
+            )
+            run(f"after, sync {kind}", consumer, path, json_format=json_format, asynchronous=False)
+            for policy in ("block", "drop"):
+                run(
+                    f"after, queued {kind} ({policy})",
+                    consumer,
+                    path,
+                    json_format=json_format,
+                    queue_full_policy=policy,
+                )
+
+
+if __name__ == "__main__":
+    main()
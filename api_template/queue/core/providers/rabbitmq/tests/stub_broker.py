@@ -0,0 +1,197 @@
+"""
+In-memory stand-in for RabbitMQ and the parts of aio_pika AsyncRabbitMQConsumer uses:
+connections, channels with basic.qos, queue iterators and messages settled by delivery tag.
+Deliveries reach the consumer latency seconds after the broker frees a prefetch slot, to model
+the round-trip of acks and deliveries.
+"""
+
+import asyncio
+import json
+from collections import deque
+from typing import Dict, List, Optional
+
+
+class StubMessage:
+    def __init__(self, channel: "StubChannel", delivery_tag: int, body: bytes, redelivered: bool):
+        self.channel = channel
+        self.delivery_tag = delivery_tag
+        self.body = body
+        self.redelivered = redelivered
+        self.routing_key = channel.queue_name
+        self.processed = False
+
+    def _settle(self, action: str, requeue: bool = False):
+        if self.processed:
+            raise RuntimeError(f"Message {self.delivery_tag} already processed")
+        if self.channel.is_closed:
+            raise RuntimeError("Channel closed")
+        self.processed = True
+        self.channel.broker.settle(self, action, requeue)
+
+    async def ack(self, multiple: bool = False):
+        assert not multiple, "acks with multiple=True settle other messages too"
+        self._settle("ack")
+
+    async def nack(self, multiple: bool = False, requeue: bool = True):
+        assert not multiple
+        self._settle("nack", requeue)
+
+    async def reject(self, requeue: bool = False):
+        self._settle("reject", requeue)
+
+    def __str__(self):
+        return f"StubMessage:{{delivery_tag={self.delivery_tag}, body_size={len(self.body)}}}"
+
+
+class StubQueueIterator:
+    def __init__(self, channel: "StubChannel"):
+        self.channel = channel
+        self.buffer: asyncio.Queue = asyncio.Queue()
+        self.consuming = False
+
+    async def __aenter__(self):
+        self.consuming = True
+        self.channel.broker.subscribe(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> StubMessage:
+        try:
+            return await self.buffer.get()
+        except asyncio.CancelledError:
+            await self.close()
+            raise
+
+    async def close(self):
+        # Like aio_pika: cancels the subscription and requeues the messages not taken yet
+        if not self.consuming:
+            return
+        self.consuming = False
+        self.channel.broker.unsubscribe(self)
+        while not self.buffer.empty():
+            message = self.buffer.get_nowait()
+            if not self.channel.is_closed:
+                await message.nack(requeue=True)
+
+
+class StubQueue:
+    def __init__(self, channel: "StubChannel"):
+        self.channel = channel
+
+    def iterator(self) -> StubQueueIterator:
+        return StubQueueIterator(self.channel)
+
+
+class StubChannel:
+    def __init__(self, broker: "StubBroker"):
+        self.broker = broker
+        self.queue_name = None
+        self.prefetch_count = 0
+        self.unacked: Dict[int, StubMessage] = {}
+        self.is_closed = False
+
+    async def set_qos(self, prefetch_count: int = 0):
+        self.prefetch_count = prefetch_count
+
+    async def declare_queue(self, name: str, durable: bool = False) -> StubQueue:
+        self.queue_name = name
+        return StubQueue(self)
+
+    async def close(self):
+        if not self.is_closed:
+            self.is_closed = True
+            self.broker.channel_closed(self)
+
+
+class StubConnection:
+    def __init__(self, broker: "StubBroker"):
+        self.broker = broker
+        self.is_closed = False
+
+    async def channel(self) -> StubChannel:
+        return StubChannel(self.broker)
+
+    async def close(self):
+        self.is_closed = True
+
+
+class StubBroker:
+    """
+    One queue and at most one subscription. Also stands for the connection manager of the
+    consumer (get_async_connection and release_async_connection).
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.ready = deque()
+        self.subscriber: Optional[StubQueueIterator] = None
+        self._delivery_tag = 0
+        # Delivery tags in the order the broker received their settlement
+        self.acked: List[int] = []
+        self.rejected: List[int] = []
+        self.requeued: List[int] = []
+        self.max_unacked = 0
+
+    def publish(self, message: dict, redelivered: bool = False):
+        self.ready.append((json.dumps(message).encode(), redelivered))
+        self._schedule_delivery()
+
+    async def get_async_connection(self) -> StubConnection:
+        return StubConnection(self)
+
+    async def release_async_connection(self, connection: StubConnection):
+        await connection.close()
+
+    def subscribe(self, iterator: StubQueueIterator):
+        self.subscriber = iterator
+        self._schedule_delivery()
+
+    def unsubscribe(self, iterator: StubQueueIterator):
+        if self.subscriber is iterator:
+            self.subscriber = None
+
+    def settle(self, message: StubMessage, action: str, requeue: bool):
+        del message.channel.unacked[message.delivery_tag]
+        if action == "ack":
+            self.acked.append(message.delivery_tag)
+        elif requeue:
+            self.requeued.append(message.delivery_tag)
+            self.ready.appendleft((message.body, True))
+        else:
+            self.rejected.append(message.delivery_tag)
+        self._schedule_delivery()
+
+    def channel_closed(self, channel: StubChannel):
+        for message in sorted(channel.unacked.values(), key=lambda m: m.delivery_tag, reverse=True):
+            self.requeued.append(message.delivery_tag)
+            self.ready.appendleft((message.body, True))
+        channel.unacked.clear()
+        if self.subscriber is not None and self.subscriber.channel is channel:
+            self.subscriber = None
+
+    def _schedule_delivery(self):
+        loop = asyncio.get_running_loop()
+        if self.latency:
+            loop.call_later(self.latency, self._deliver)
+        else:
+            loop.call_soon(self._deliver)
+
+    def _deliver(self):
+        iterator = self.subscriber
+        if iterator is None or not iterator.consuming:
+            return
+        channel = iterator.channel
+        while self.ready and (
+            not channel.prefetch_count or len(channel.unacked) < channel.prefetch_count
+        ):
+            body, redelivered = self.ready.popleft()
+            self._delivery_tag += 1
+            message = StubMessage(channel, self._delivery_tag, body, redelivered)
+            channel.unacked[message.delivery_tag] = message
+            iterator.buffer.put_nowait(message)
+        self.max_unacked = max(self.max_unacked, len(channel.unacked))
@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+
+from api_template.queue.config.queue_settings import QueueConfig
+from api_template.queue.core.manager.message_processor import MessageProcessor
+from api_template.queue.core.providers.rabbitmq.consumer import AsyncRabbitMQConsumer
+from api_template.queue.core.providers.rabbitmq.tests.stub_broker import StubBroker
+
+
+class Handler:
+    """
+    Async handler recording how many messages it handles at a time. Each message waits for
+    the event of its "id", when there is one.
+    """
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.events = {}
+        self.running = 0
+        self.max_running = 0
+        self.handled = []
+
+    async def __call__(self, message):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            if message.get("fail"):
+                raise ValueError("Handler failed")
+            event = self.events.get(message["id"])
+            if event is not None:
+                await event.wait()
+            await asyncio.sleep(self.delay)
+            self.handled.append(message["id"])
+        finally:
+            self.running -= 1
+
+
+def make_consumer(broker, handler, **kwargs):
+    processor = MessageProcessor()
+    processor.add_handler("job", handler)
+    consumer = AsyncRabbitMQConsumer("test_async_consumer", None, processor, **kwargs)
+    consumer.connection_manager = broker
+    return consumer
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "Condition not met in time"
+        await asyncio.sleep(0.001)
+
+
+def test_concurrency_and_prefetch_come_from_the_queue_config():
+    config = QueueConfig(name="q", type="rabbitmq", port=5672, heartbeat=60, max_concurrency=4)
+    consumer = AsyncRabbitMQConsumer("test_async_consumer_config", config, MessageProcessor())
+    assert (consumer.max_concurrency, consumer.prefetch_count) == (4, 8)
+
+    config.prefetch_count = 5
+    consumer = AsyncRabbitMQConsumer("test_async_consumer_config", config, MessageProcessor())
+    assert (consumer.max_concurrency, consumer.prefetch_count) == (4, 5)
+
+
+@pytest.mark.asyncio
+async def test_handlers_run_concurrently_up_to_max_concurrency():
+    broker = StubBroker()
+    handler = Handler(delay=0.01)
+    consumer = make_consumer(broker, handler, max_concurrency=3, prefetch_count=5)
+    for i in range(10):
+        broker.publish({"type": "job", "id": i})
+
+    task = asyncio.create_task(consumer.start_consuming())
+    await wait_for(lambda: len(broker.acked) == 10)
+    await consumer.stop_consuming()
+    await task
+
+    assert handler.max_running == 3
+    assert broker.max_unacked == 5
+    assert sorted(handler.handled) == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_messages_are_acked_in_completion_order():
+    broker = StubBroker()
+    handler = Handler()
+    handler.events = {0: asyncio.Event(), 1: asyncio.Event()}
+    consumer = make_consumer(broker, handler, max_concurrency=3)
+    for i in range(3):
+        broker.publish({"type": "job", "id": i})
+
+    task = asyncio.create_task(consumer.start_consuming())
+    await wait_for(lambda: broker.acked == [3])
+    handler.events[1].set()
+    await wait_for(lambda: broker.acked == [3, 2])
+    handler.events[0].set()
+    await wait_for(lambda: broker.acked == [3, 2, 1])
+    await consumer.stop_consuming()
+    await task
+
+
+@pytest.mark.asyncio
+async def test_failed_messages_are_rejected_and_others_still_acked():
+    broker = StubBroker()
+    consumer = make_consumer(broker, Handler(), max_concurrency=2)
+    broker.publish({"type": "job", "id": 0, "fail": True})
+    broker.publish({"type": "job", "id": 1})
+    broker.publish({"id": 2})
+
+    task = asyncio.create_task(consumer.start_consuming())
+    await wait_for(lambda: len(broker.acked) + len(broker.rejected) == 3)
+    await consumer.stop_consuming()
+    await task
+
+    assert broker.acked == [2]
+    assert sorted(broker.rejected) == [1, 3]
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_messages_in_progress_and_requeues_the_others():
+    broker = StubBroker()
+    handler = Handler(delay=0.05)
+    consumer = make_consumer(broker, handler, max_concurrency=2, prefetch_count=4)
+    for i in range(6):
+        broker.publish({"type": "job", "id": i})
+
+    task = asyncio.create_task(consumer.start_consuming())
+    await wait_for(lambda: handler.running == 2)
+    await consumer.stop_consuming()
+
+    assert task.done()
+    assert sorted(handler.handled) == [0, 1]
+    assert sorted(broker.acked) == [1, 2]
+    # The prefetched messages go back to the queue, and nothing more is delivered
+    assert sorted(broker.requeued) == [3, 4]
+    assert len(broker.ready) == 4
+
+
+@pytest.mark.asyncio
+async def test_stop_cancels_handlers_after_the_drain_timeout():
+    broker = StubBroker()
+    handler = Handler()
+    handler.events = {0: asyncio.Event()}
+    consumer = make_consumer(broker, handler, max_concurrency=2, drain_timeout=0.01)
+    broker.publish({"type": "job", "id": 0})
+    broker.publish({"type": "job", "id": 1})
+
+    task = asyncio.create_task(consumer.start_consuming())
+    await wait_for(lambda: broker.acked == [2])
+    await consumer.stop_consuming()
+    await task
+
+    # Never settled, the broker redelivers it when the channel closes
+    assert handler.handled == [1]
+    assert broker.requeued == [1]
+    assert list(broker.ready) == [(b'{"type": "job", "id": 0}', True)]
@@ -1,17 +1,16 @@
 import logging
 
-from api_template.api.v1.dependencies import get_db
 from api_template.api.v1.services.user_service import UserService
+from api_template.db.session import AsyncSessionLocal
 
 logger = logging.getLogger(__name__)
 
 
 class UserHandler:
-    def __init__(self):
-        self.user_service = UserService(get_db())
-
-    def send_audio(self, message):
-        self.user_service.notify_user(message["user_id"], "audio", message["content"])
+    async def send_audio(self, message):
+        # A session per message: messages are handled concurrently
+        async with AsyncSessionLocal() as db:
+            await UserService(db).notify_user(message["user_id"], "audio", message["content"])
         print(f"Sending audio message: {message}")
 
     def test_message(self, message):
@@ -6,6 +6,12 @@ from contextlib import asynccontextmanager
 import psutil
 from fastapi import FastAPI
 
+from api_template.api.v1.auth.password_hasher import password_hasher
+from api_template.api.v1.auth.revocation import token_revocations
+from api_template.config.logging import shutdown_logging
+from api_template.config.settings import settings
+from api_template.db.session import async_engine, replica_router
+from api_template.external.core.manager import APIManager
 from api_template.queue.config.queue_settings import load_queue_settings
 from api_template.queue.config.queue_types import QueueType
 from api_template.queue.core.manager.message_processor import MessageProcessor
@@ -29,7 +35,12 @@ async def lifespan_handler(app: FastAPI):
     """
     logger.info("Starting lifespan_handler...")
     app.state.executor = ProcessPoolExecutor()
-    consumers_publishers = setup_queue()
+    await replica_router.start()
+    await token_revocations.start()
+    message_processor = MessageProcessor(
+        process_pool=app.state.executor, max_threads=settings.QUEUE_HANDLER_THREADS
+    )
+    consumers_publishers = setup_queue(message_processor)
 
     yield
 
@@ -39,8 +50,15 @@ async def lifespan_handler(app: FastAPI):
             await consumer.close_connection()
         if publisher:
             await publisher.close_connection()
+    message_processor.close()
 
+    await APIManager().aclose()
+    await token_revocations.close()
+    await replica_router.close()
+    await async_engine.dispose()
     app.state.executor.shutdown()
+    password_hasher.close()
+    shutdown_logging()
 
 
 def setup_parallel_consumers(queue_config, consumer, num_consumers=5):
@@ -134,21 +152,23 @@ def setup_channel(queue_config):
     return consumer, publisher
 
 
-def setup_queue():
+def setup_queue(message_processor: MessageProcessor = None):
     """
     Setup queue and register them to the QueueManager
-    :param app:
+    :param message_processor: Processor of the consumed messages, one with its own thread pool
+    when not given.
     :return:
     """
-    settings = load_queue_settings()
+    queue_settings = load_queue_settings()
     consumers_publishers = []
 
     # Setup message processor and register handlers
-    message_processor = MessageProcessor()
+    if message_processor is None:
+        message_processor = MessageProcessor(max_threads=settings.QUEUE_HANDLER_THREADS)
 
     register_user_handlers(message_processor)
 
-    for queue_config in settings.queues:
+    for queue_config in queue_settings.queues:
         if queue_config.type == QueueType.RABBITMQ.value:
             try:
                 logger.info(f"Setting up RabbitMQ queue: {queue_config.name}")
@@ -5,11 +5,16 @@ from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from http import HTTPStatus
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, Response
 
 from api_template.api.common.api_exceptions import BaseAPIException
 from api_template.api.v1 import router
+from api_template.config.logging import setup_logging
 from api_template.config.settings import settings
+from api_template.db.metrics import pool_metrics
+from api_template.middleware.metrics import PROMETHEUS_CONTENT_TYPE, RequestMetrics
+from api_template.middleware.query_stats_middleware import QueryStatsMiddleware
+from api_template.middleware.rate_limiter import create_rate_limiter
 from api_template.middleware.ratelimit_middleware import RateLimitMiddleware
 from api_template.middleware.request_middleware import RequestContextLogMiddleware
 from api_template.middleware.security_headers_middleware import SecurityHeadersMiddleware
@@ -20,15 +25,41 @@ load_dotenv()
 app = FastAPI(**settings.api_description, lifespan=lifespan_handler)
 
 # Set up logging
+setup_logging(
+    level=settings.LOG_LEVEL,
+    json_format=settings.LOG_JSON,
+    asynchronous=settings.LOG_ASYNC,
+    queue_size=settings.LOG_QUEUE_SIZE,
+    queue_full_policy=settings.LOG_QUEUE_FULL_POLICY,
+)
 logger = logging.getLogger(__name__)
 
+request_metrics = RequestMetrics() if settings.METRICS_ENABLED else None
+
 app.include_router(router.router)
-app.add_middleware(RequestContextLogMiddleware)
+# Added first to run inside RequestContextLogMiddleware, which sets the correlation id
+if settings.DB_QUERY_STATS_ENABLED:
+    app.add_middleware(QueryStatsMiddleware, n_plus_one_threshold=settings.DB_N_PLUS_ONE_THRESHOLD)
+app.add_middleware(
+    RequestContextLogMiddleware,
+    max_body_bytes=settings.LOG_BODY_MAX_BYTES,
+    sample_rate=settings.LOG_BODY_SAMPLE_RATE,
+    route_sample_rates=settings.LOG_BODY_ROUTE_SAMPLE_RATES,
+    status_sample_rates=settings.LOG_BODY_STATUS_SAMPLE_RATES,
+    metrics=request_metrics,
+)
 app.add_middleware(
     RateLimitMiddleware,
     max_requests=settings.RATE_LIMIT_MAX_REQUESTS,
     period=settings.RATE_LIMIT_PERIOD,
     hash_ips=settings.HASH_IPS,
+    limiter=create_rate_limiter(
+        settings.RATE_LIMIT_MAX_REQUESTS,
+        settings.RATE_LIMIT_PERIOD,
+        max_keys=settings.RATE_LIMIT_MAX_KEYS,
+        redis_url=settings.RATE_LIMIT_REDIS_URL,
+        redis_timeout=settings.RATE_LIMIT_REDIS_TIMEOUT,
+    ),
 )
 
 whitelist_paths = ["/docs", "/redoc", "/openapi.json"]
@@ -53,3 +84,12 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 @app.get("/", tags=["Base"])
 async def root():
     return {"message": "API Template!", "datetime": datetime.datetime.now()}
+
+
+if request_metrics is not None:
+
+    @app.get("/metrics", tags=["Base"], include_in_schema=False)
+    async def metrics():
+        return Response(
+            request_metrics.render() + pool_metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE
+        )
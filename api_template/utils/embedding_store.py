@@ -0,0 +1,241 @@
+import fcntl
+import hashlib
+import logging
+import os
+import struct
+from contextlib import contextmanager
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"EMB1"
+_HEADER = struct.Struct("<4sI")
+_DIGEST_SIZE = 16
+
+
+class EmbeddingStore:
+    """
+    Persistent, content-addressed store of embedding vectors.
+
+    Vectors are kept in a float32 file that is memory-mapped on load, so opening the store
+    does not deserialize it. A compact index file holds one fixed-size digest of
+    (model, text) per row; the position of the digest is the row of the vector.
+    Both files are append-only: new vectors are written at the end, existing ones are never
+    rewritten.
+
+    The index is memory-mapped too, and sorted on the first lookup to be searched by
+    bisection; rows appended since are looked up in a small dict until the next sort.
+    Processes sharing the store (API and worker processes) append under an exclusive lock
+    of the lock file, and pick up each other's rows.
+    """
+
+    # Rows appended since the sort that trigger a new sort, at least
+    MIN_RESORT_ROWS = 1024
+
+    def __init__(self, directory: str, name: str = "embeddings", dimension: int = 1536):
+        self.directory = directory
+        self.dimension = dimension
+        self.vectors_path = os.path.join(directory, f"{name}.f32")
+        self.index_path = os.path.join(directory, f"{name}.idx")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self._count = 0
+        self._digests = np.empty(0, dtype=f"S{_DIGEST_SIZE}")
+        # Digests sorted, and the row of each, built on the first lookup
+        self._sorted = None
+        self._sorted_rows = None
+        # Rows not in the sorted digests yet
+        self._recent = {}
+        self._vectors = np.empty((0, dimension), dtype=np.float32)
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @staticmethod
+    def key(model: str, text: str) -> bytes:
+        """
+        Content address of an embedding: a digest of the model name and the embedded text.
+        :param model:
+        :param text:
+        :return:
+        """
+        return hashlib.blake2b(
+            f"{model}\0{text}".encode("utf-8"), digest_size=_DIGEST_SIZE
+        ).digest()
+
+    @contextmanager
+    def _locked(self):
+        """
+        Holds the exclusive lock of the store, shared by every process that opens it.
+        """
+        with open(self.lock_path, "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _stored_count(self) -> int:
+        # Vectors are appended before their digests, so a digest never points past the vectors
+        digests = (os.path.getsize(self.index_path) - _HEADER.size) // _DIGEST_SIZE
+        return min(digests, os.path.getsize(self.vectors_path) // (self.dimension * 4))
+
+    def _load(self):
+        """
+        Checks the index header and memory-maps both files.
+        :return:
+        """
+        with self._locked():
+            if not os.path.exists(self.index_path):
+                with open(self.index_path, "wb") as f:
+                    f.write(_HEADER.pack(_MAGIC, self.dimension))
+                open(self.vectors_path, "wb").close()
+                logger.info(f"Created embedding store at {self.index_path}")
+                return
+
+            with open(self.index_path, "rb") as f:
+                magic, dimension = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC:
+                raise ValueError(f"{self.index_path} is not an embedding store index.")
+            if dimension != self.dimension:
+                raise ValueError(
+                    f"Embedding store {self.index_path} has dimension {dimension}, "
+                    f"expected {self.dimension}."
+                )
+
+            # A crash between the two appends may leave one file longer than the other: only
+            # rows present in both are valid, and the tails are dropped so appends stay aligned.
+            # Writers hold the lock, so a longer file here is not an append in progress.
+            count = self._stored_count()
+            if os.path.getsize(self.index_path) != _HEADER.size + count * _DIGEST_SIZE:
+                os.truncate(self.index_path, _HEADER.size + count * _DIGEST_SIZE)
+            if os.path.getsize(self.vectors_path) != count * self.dimension * 4:
+                os.truncate(self.vectors_path, count * self.dimension * 4)
+        self._map(count)
+        logger.info(f"Loaded {count} embeddings from {self.vectors_path}")
+
+    def _map(self, count: int):
+        """
+        Maps the first `count` rows of the index and vectors files.
+        :param count:
+        :return:
+        """
+        self._count = count
+        if count == 0:
+            self._digests = np.empty(0, dtype=f"S{_DIGEST_SIZE}")
+            self._vectors = np.empty((0, self.dimension), dtype=np.float32)
+            return
+        self._digests = np.memmap(
+            self.index_path, dtype=f"S{_DIGEST_SIZE}", mode="r", offset=_HEADER.size, shape=count
+        )
+        self._vectors = np.memmap(
+            self.vectors_path, dtype=np.float32, mode="r", shape=(count, self.dimension)
+        )
+
+    def _refresh(self):
+        """
+        Maps the rows other processes appended since the last refresh.
+        :return:
+        """
+        count = self._stored_count()
+        if count <= self._count:
+            return
+        start = self._count
+        self._map(count)
+        if self._sorted is not None:
+            for row in range(start, count):
+                self._recent[self._digests[row]] = row
+
+    def _sort(self):
+        rows = np.argsort(self._digests, kind="stable")
+        self._sorted = self._digests[rows]
+        self._sorted_rows = rows
+        self._recent = {}
+
+    def _row(self, key: bytes):
+        """
+        Returns the row of key, or None if it is not in the store.
+        :param key:
+        :return:
+        """
+        if self._sorted is None or len(self._recent) > max(self.MIN_RESORT_ROWS, self._count // 16):
+            self._sort()
+        # Item access strips the trailing NUL bytes of "S" arrays, so keys are compared alike
+        key = key.rstrip(b"\0")
+        row = self._recent.get(key)
+        if row is not None:
+            return row
+        i = int(np.searchsorted(self._sorted, key))
+        if i < len(self._sorted) and self._sorted[i] == key:
+            return int(self._sorted_rows[i])
+        return None
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, key: bytes):
+        return self._row(key) is not None
+
+    def get(self, model: str, text: str):
+        """
+        Returns the stored vector for (model, text), or None if it is not in the store.
+        :param model:
+        :param text:
+        :return: Read-only float32 array view.
+        """
+        row = self._row(self.key(model, text))
+        if row is None:
+            return None
+        return self._vectors[row]
+
+    def missing(self, model: str, texts) -> list:
+        """
+        Returns the distinct texts that have no stored vector for the model, in input order.
+        :param model:
+        :param texts:
+        :return:
+        """
+        self._refresh()
+        seen = set()
+        result = []
+        for text in texts:
+            if text in seen:
+                continue
+            seen.add(text)
+            if self._row(self.key(model, text)) is None:
+                result.append(text)
+        return result
+
+    def put_many(self, model: str, texts, vectors):
+        """
+        Appends the vectors of texts that are not yet stored, also by another process.
+        :param model:
+        :param texts:
+        :param vectors:
+        :return: Number of vectors appended.
+        """
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if len(matrix) and (matrix.ndim != 2 or matrix.shape[1] != self.dimension):
+            raise ValueError(
+                f"Expected vectors of dimension {self.dimension}, got {matrix.shape[-1]}."
+            )
+
+        with self._locked():
+            # Rows are numbered by their position in the files
+            self._refresh()
+            new_keys, new_rows = {}, []
+            for i, text in enumerate(texts):
+                key = self.key(model, text)
+                if key in new_keys or self._row(key) is not None:
+                    continue
+                new_keys[key] = None
+                new_rows.append(i)
+            if not new_keys:
+                return 0
+
+            # Vectors first, then the index: an index entry never points past the vectors file.
+            with open(self.vectors_path, "ab") as f:
+                f.write(matrix[new_rows].tobytes())
+            with open(self.index_path, "ab") as f:
+                f.write(b"".join(new_keys))
+            self._refresh()
+        return len(new_keys)
@@ -0,0 +1,99 @@
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data) -> str:
+    """
+    Stable hash of a text or of any JSON-serializable value.
+    :param data:
+    :return:
+    """
+    if not isinstance(data, str):
+        data = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.blake2b(data.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def point_id_for(key: str) -> int:
+    """
+    Stable vector point id for an indexed key, independent of the order of the specs.
+    :param key:
+    :return:
+    """
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") >> 1
+
+
+class IndexManifest:
+    """
+    Record of what is currently indexed: for each key (operation id), the hash of the source
+    it was derived from, its description, the hash of that description and its point id.
+    Persisted as JSON next to the vector collection.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.exists = os.path.exists(path)
+        self.entries = {}
+        if self.exists:
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+            logger.info(f"Loaded index manifest with {len(self.entries)} entries from {path}")
+
+    def description_for(self, key: str, source_hash: str):
+        """
+        Returns the description previously derived for key, if its source did not change.
+        :param key:
+        :param source_hash:
+        :return:
+        """
+        entry = self.entries.get(key)
+        if entry and entry.get("source_hash") == source_hash:
+            return entry.get("description")
+        return None
+
+    def diff(self, specs: dict):
+        """
+        Compares specs ({key: description}) with the manifest.
+        :param specs:
+        :return: Tuple (keys to upsert, keys to delete).
+        """
+        changed = [
+            key
+            for key, description in specs.items()
+            if self.entries.get(key, {}).get("description_hash") != content_hash(description)
+        ]
+        removed = [key for key in self.entries if key not in specs]
+        return changed, removed
+
+    def update(self, specs: dict, source_hashes: dict = None):
+        """
+        Replaces the manifest entries with the given specs.
+        :param specs:
+        :param source_hashes:
+        :return:
+        """
+        source_hashes = source_hashes or {}
+        self.entries = {
+            key: {
+                "source_hash": source_hashes.get(key),
+                "description": description,
+                "description_hash": content_hash(description),
+                "point_id": point_id_for(key),
+            }
+            for key, description in specs.items()
+        }
+
+    def save(self):
+        """
+        Writes the manifest atomically.
+        :return:
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.exists = True
@@ -1,9 +1,11 @@
-import json
 import logging
 
+from api_template.config.logging import StructuredMessage
+
 logger = logging.getLogger(__name__)
 
 
 def log_message(action, queue_name, message=None, error=None):
     log_data = {"action": action, "queue_name": queue_name, "message": message, "error": error}
-    logger.info(json.dumps(log_data))
+    # Serialized by the logging handler, only if the record is emitted
+    logger.info(StructuredMessage(log_data))
@@ -1,12 +1,19 @@
+import hashlib
 import logging
 import os
-import pickle
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 import openai
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, PointStruct, VectorParams
+from cachetools import LRUCache, TTLCache
 
 from api_template.config.settings import settings
+from api_template.utils.embedding_store import EmbeddingStore
+from api_template.utils.index_manifest import IndexManifest, point_id_for
+from api_template.utils.vector_backends import NumpyBackend, QdrantBackend, VectorBackend
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -15,115 +22,336 @@ logging.basicConfig(level=logging.INFO)
 class SemanticSearch:
     def __init__(
         self,
-        cache_file="embeddings_cache.pkl",
+        cache_file="embeddings_cache",
         cache_path=None,
         collection_name="local_embeddings",
         vector_size=1536,
+        embedding_model="text-embedding-3-small",
+        embedding_fn=None,
+        batch_size=100,
+        max_batch_tokens=8000,
+        max_concurrency=4,
+        max_retries=3,
+        retry_backoff=1.0,
+        query_cache_size=1024,
+        query_cache_ttl=3600,
+        result_cache_size=1024,
+        result_cache_ttl=300,
+        backend="qdrant",
     ):
         self.cache_path = os.path.join(os.path.dirname(__file__), "../data")
         if cache_path:
             self.cache_path = cache_path
 
         self.path = os.path.join(os.path.dirname(__file__), f"{self.cache_path}/{collection_name}")
-        self.client = QdrantClient(path=self.path)
         self.cache_file = cache_file
         self.collection_name = collection_name
         self.vector_size = vector_size
-        self.embeddings_cache = self._load_cache()
-        self._initialize_qdrant()
+        self.embedding_model = embedding_model
+        self.embedding_fn = embedding_fn
+        self.batch_size = batch_size
+        self.max_batch_tokens = max_batch_tokens
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.batch_latencies = []
+        self._openai_client = None
+        self.collection_version = 0
+        self.cache_stats = Counter()
+        self._cache_lock = threading.Lock()
+        self._query_cache = self._make_cache(query_cache_size, query_cache_ttl)
+        self._result_cache = self._make_cache(result_cache_size, result_cache_ttl)
+        self.embedding_store = EmbeddingStore(
+            self.cache_path, name=cache_file, dimension=vector_size
+        )
+        self.backend = self._initialize_backend(backend)
+        self.manifest = IndexManifest(
+            os.path.join(self.cache_path, f"{collection_name}.manifest.json")
+        )
 
-    def _initialize_qdrant(self):
+    def _initialize_backend(self, backend):
         """
-        Initializes Qdrant with the collection name and vector size.
+        Initializes the vector backend: "qdrant", "numpy" or a VectorBackend instance.
+        :param backend:
         :return:
         """
-        logger.info("Initializing Qdrant...")
-        if not self.client.collection_exists(self.collection_name):
-            logger.info("Creating collection...")
-            self.client.create_collection(
-                self.collection_name,
-                vectors_config=VectorParams(
-                    size=self.vector_size,
-                    distance=Distance.COSINE,
-                ),
-            )
+        if isinstance(backend, VectorBackend):
+            return backend
+        if backend == "qdrant":
+            return QdrantBackend(self.path, self.collection_name, self.vector_size)
+        if backend == "numpy":
+            return NumpyBackend(self.vector_size)
+        raise ValueError(f"Unsupported vector backend: {backend}")
 
-    def _load_cache(self):
+    @staticmethod
+    def _make_cache(maxsize, ttl):
         """
-        Load embeddings cache from a Pickle file.
+        Returns an LRU cache, expiring entries after ttl seconds when ttl is set.
+        :param maxsize:
+        :param ttl:
         :return:
         """
-        cache_file_path = f"{self.cache_path}/{self.cache_file}"
-        if os.path.exists(cache_file_path):
-            logger.info(f"Loading embeddings cache from {cache_file_path}")
-            with open(cache_file_path, "rb") as f:
-                return pickle.load(f)
-        else:
-            logger.info("No cache found, creating new cache.")
-            return {}
+        return TTLCache(maxsize=maxsize, ttl=ttl) if ttl else LRUCache(maxsize=maxsize)
 
-    def _save_cache(self):
+    def _get_openai_client(self):
         """
-        Save embeddings cache to a Pickle file.
+        Returns the OpenAI client, creating it on first use so every batch shares its connection pool.
         :return:
         """
-        cache_file_path = f"{self.cache_path}/{self.cache_file}"
-        logger.info(f"Saving embeddings cache to {cache_file_path}...")
-        with open(cache_file_path, "wb") as f:
-            pickle.dump(self.embeddings_cache, f)
+        if self._openai_client is None:
+            self._openai_client = openai.Client(api_key=settings.OPENAI_API_KEY)
+        return self._openai_client
 
     def _calculate_embeddings(self, texts):
         """
-        Calculates embeddings for a list of texts.
+        Calculates embeddings for a list of texts in a single request.
+        :param texts:
+        :return: List of embedding vectors, in the same order as the texts.
+        """
+        if self.embedding_fn is not None:
+            return list(self.embedding_fn(texts))
+
+        client = self._get_openai_client()
+        response = client.embeddings.create(input=texts, model=self.embedding_model)
+        return [item.embedding for item in response.data]
+
+    @staticmethod
+    def _estimate_tokens(text):
+        """
+        Cheap upper-bound estimate of the number of tokens of a text (~4 chars per token).
+        :param text:
+        :return:
+        """
+        return len(text) // 4 + 1
+
+    def _make_batches(self, texts):
+        """
+        Groups the texts into batches bounded by batch_size and max_batch_tokens.
+        :param texts:
+        :return: List of batches, each one a list of indexes into texts.
+        """
+        batches = []
+        current, current_tokens = [], 0
+        for idx, text in enumerate(texts):
+            tokens = self._estimate_tokens(text)
+            if current and (
+                len(current) >= self.batch_size or current_tokens + tokens > self.max_batch_tokens
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(idx)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(self, texts):
+        """
+        Embeds a single batch, recording its latency.
         :param texts:
         :return:
         """
-        logger.info("Calculating embeddings...")
-        client = openai.Client(api_key=settings.OPENAI_API_KEY)
-        response = client.embeddings.create(input=texts, model="text-embedding-3-small")
-        return response.data
+        start = time.perf_counter()
+        embeddings = self._calculate_embeddings(texts)
+        self.batch_latencies.append(time.perf_counter() - start)
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+        return embeddings
+
+    def embed_texts(self, texts):
+        """
+        Calculates embeddings for many texts using bounded, concurrent batches.
+        Only the batches that fail are retried, with exponential backoff.
+        :param texts:
+        :return: List of embedding vectors, in the same order as the texts.
+        """
+        texts = list(texts)
+        embeddings = [None] * len(texts)
+        pending = self._make_batches(texts)
+        self.batch_latencies = []
+
+        logger.info(f"Calculating embeddings for {len(texts)} texts in {len(pending)} batches...")
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            for attempt in range(self.max_retries + 1):
+                futures = [
+                    (batch, executor.submit(self._embed_batch, [texts[i] for i in batch]))
+                    for batch in pending
+                ]
+                failed, last_error = [], None
+                for batch, future in futures:
+                    try:
+                        for idx, embedding in zip(batch, future.result()):
+                            embeddings[idx] = embedding
+                    except Exception as e:
+                        last_error = e
+                        failed.append(batch)
+
+                if not failed:
+                    return embeddings
+
+                logger.warning(
+                    f"{len(failed)} embedding batches failed (attempt {attempt + 1}): {last_error}"
+                )
+                pending = failed
+                if attempt < self.max_retries:
+                    time.sleep(self.retry_backoff * (2**attempt))
+
+        raise RuntimeError(
+            f"Failed to calculate embeddings for {len(pending)} batches after "
+            f"{self.max_retries} retries: {last_error}"
+        )
 
-    def index_specs(self, specs):
+    def index_specs(self, specs, source_hashes=None):
         """
         Indexes the descriptions of the APIs in the semantic search engine.
-        :param specs:
+        Only new or changed descriptions are embedded and upserted, and removed ones are deleted,
+        based on the index manifest. Point ids are derived from the keys, so they are stable.
+        :param specs: Dict of key (operation id) to description.
+        :param source_hashes: Optional dict of key to the hash of the data the description was
+            derived from, recorded so callers can skip re-deriving unchanged descriptions.
         :return:
         """
         logger.info("Indexing API descriptions...")
-        points = []
-
-        for idx, (path, description) in enumerate(specs.items()):
-            logger.info(f"Indexing API {idx}. {path} - {description}...")
-            if path not in self.embeddings_cache:
-                embedding = self._calculate_embeddings([description])
-                embedding = embedding[0]
-                logger.info(f"Embedding for {path}: {embedding}")
-                self.embeddings_cache[path] = embedding.embedding
-
-            points.append(
-                PointStruct(id=idx, vector=self.embeddings_cache[path], payload={"path": path})
+        in_sync = (
+            self.backend.persistent
+            and self.manifest.exists
+            and self.backend.count() == len(self.manifest.entries)
+        )
+        if in_sync:
+            changed, removed = self.manifest.diff(specs)
+        else:
+            logger.info("Index manifest missing or out of sync, rebuilding the collection.")
+            self.backend.clear()
+            changed, removed = list(specs), []
+
+        if changed or removed:
+            texts = [specs[key] for key in changed]
+            uncached = self.embedding_store.missing(self.embedding_model, texts)
+            if uncached:
+                embeddings = self.embed_texts(uncached)
+                self.embedding_store.put_many(self.embedding_model, uncached, embeddings)
+
+            self.backend.delete([point_id_for(key) for key in removed])
+            self.backend.upsert(
+                [point_id_for(key) for key in changed],
+                [self.embedding_store.get(self.embedding_model, text) for text in texts],
+                [{"path": key} for key in changed],
             )
+            self._invalidate_results()
+            logger.info(
+                f"Indexed {len(changed)} changed APIs ({len(uncached)} new embeddings), "
+                f"removed {len(removed)}."
+            )
+        else:
+            logger.info(f"All {len(specs)} API descriptions are up to date.")
+
+        previous = self.manifest.entries
+        self.manifest.update(specs, source_hashes)
+        if self.manifest.entries != previous or not self.manifest.exists:
+            self.manifest.save()
+
+    def _invalidate_results(self):
+        """
+        Bumps the collection version so cached search results of older versions are never served.
+        :return:
+        """
+        with self._cache_lock:
+            self.collection_version += 1
+            self._result_cache.clear()
+
+    def _get_query_embedding(self, query):
+        """
+        Returns the embedding of a query, from the query cache when possible.
+        :param query:
+        :return:
+        """
+        with self._cache_lock:
+            embedding = self._query_cache.get(query)
+            self.cache_stats["embedding_hits" if embedding is not None else "embedding_misses"] += 1
+        if embedding is not None:
+            return embedding
 
-        self._save_cache()
-        self.client.upsert(self.collection_name, points)
+        start = time.perf_counter()
+        embedding = tuple(self._calculate_embeddings([query])[0])
+        with self._cache_lock:
+            self.cache_stats["embedding_seconds"] += time.perf_counter() - start
+            self._query_cache[query] = embedding
+        return embedding
 
-    def search(self, query):
+    def cache_info(self):
+        """
+        Returns the hit/miss counters of the query and result caches, and an estimate of the
+        embedding latency saved by the query cache.
+        :return:
+        """
+        stats = dict(self.cache_stats)
+        misses = stats.get("embedding_misses", 0)
+        hits = stats.get("embedding_hits", 0)
+        avg_latency = stats.get("embedding_seconds", 0.0) / misses if misses else 0.0
+        return {
+            "embedding_hits": hits,
+            "embedding_misses": misses,
+            "result_hits": stats.get("result_hits", 0),
+            "result_misses": stats.get("result_misses", 0),
+            "embedding_seconds_saved": hits * avg_latency,
+            "collection_version": self.collection_version,
+        }
+
+    def search(self, query, limit=5, score_threshold=0.4):
         """
         Searches for APIs with a semantic query.
         :param query: Search query.
+        :param limit: Maximum number of results.
+        :param score_threshold: Minimum similarity score of the results.
         :return: List of search results.
         """
         logger.info(f"Searching for APIs with query: {query}")
-        query_embedding = self._calculate_embeddings([query])
-        query_embedding = query_embedding[0]
-        logger.info(f"Query embedding: {query_embedding.embedding}")
-
-        search_result = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=query_embedding.embedding,
-            limit=5,
-            score_threshold=0.4,
+        query_embedding = self._get_query_embedding(query)
+
+        embedding_key = hashlib.blake2b(
+            np.asarray(query_embedding, dtype=np.float32).tobytes(), digest_size=16
+        ).digest()
+        with self._cache_lock:
+            result_key = (embedding_key, limit, score_threshold, self.collection_version)
+            search_result = self._result_cache.get(result_key)
+            self.cache_stats["result_hits" if search_result is not None else "result_misses"] += 1
+        if search_result is not None:
+            return search_result
+
+        search_result = self.backend.search(
+            query_embedding, limit=limit, score_threshold=score_threshold
         )
         logger.info(f"Search results: {search_result}")
 
+        with self._cache_lock:
+            # Results fetched while index_specs was upserting must not outlive that version.
+            if result_key[3] == self.collection_version:
+                self._result_cache[result_key] = search_result
         return search_result
+
+    def search_batch(self, queries, limit=5, score_threshold=0.4):
+        """
+        Searches for APIs with several semantic queries at once.
+        Queries missing from the query cache are embedded in a single request.
+        :param queries: Search queries.
+        :param limit: Maximum number of results per query.
+        :param score_threshold: Minimum similarity score of the results.
+        :return: One list of search results per query.
+        """
+        queries = list(queries)
+        with self._cache_lock:
+            embeddings = [self._query_cache.get(query) for query in queries]
+            missing = [query for query, embedding in zip(queries, embeddings) if embedding is None]
+            self.cache_stats["embedding_hits"] += len(queries) - len(missing)
+            self.cache_stats["embedding_misses"] += len(missing)
+
+        if missing:
+            computed = dict(zip(missing, map(tuple, self.embed_texts(missing))))
+            with self._cache_lock:
+                self._query_cache.update(computed)
+            embeddings = [
+                computed[query] if embedding is None else embedding
+                for query, embedding in zip(queries, embeddings)
+            ]
+
+        return self.backend.search_batch(embeddings, limit=limit, score_threshold=score_threshold)
@@ -0,0 +1,65 @@
+"""
+Benchmark of the embedding cache load at startup: legacy pickle dict vs EmbeddingStore.
+
+Run with: python -m api_template.utils.tests.bench_embedding_store
+"""
+
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+
+from api_template.utils.embedding_store import EmbeddingStore
+
+NUM_VECTORS = 10_000
+VECTOR_SIZE = 1536
+MODEL = "text-embedding-3-small"
+
+
+def main():
+    texts = [f"Operation {i} returns the details of resource {i}" for i in range(NUM_VECTORS)]
+    vectors = np.random.default_rng(0).random((NUM_VECTORS, VECTOR_SIZE), dtype=np.float32)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pickle_path = os.path.join(tmp_dir, "embeddings_cache.pkl")
+        with open(pickle_path, "wb") as f:
+            pickle.dump({f"op_{i}": v.tolist() for i, v in enumerate(vectors)}, f)
+
+        EmbeddingStore(tmp_dir, dimension=VECTOR_SIZE).put_many(MODEL, texts, vectors)
+
+        start = time.perf_counter()
+        with open(pickle_path, "rb") as f:
+            cache = pickle.load(f)
+        pickle_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store = EmbeddingStore(tmp_dir, dimension=VECTOR_SIZE)
+        store_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        missing = store.missing(MODEL, texts)
+        store_lookup = time.perf_counter() - start
+
+        start = time.perf_counter()
+        store.put_many(MODEL, ["a new description"], vectors[:1])
+        store_append = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cache["op_new"] = vectors[0].tolist()
+        with open(pickle_path, "wb") as f:
+            pickle.dump(cache, f)
+        pickle_save = time.perf_counter() - start
+
+    assert not missing
+    print(f"{NUM_VECTORS} cached vectors of dimension {VECTOR_SIZE}")
+    print(f"pickle load:                  {pickle_load * 1000:9.1f}ms")
+    print(f"EmbeddingStore load:          {store_load * 1000:9.1f}ms")
+    print(f"EmbeddingStore lookup (all):  {store_lookup * 1000:9.1f}ms")
+    print(f"pickle save after 1 new:      {pickle_save * 1000:9.1f}ms")
+    print(f"EmbeddingStore append 1 new:  {store_append * 1000:9.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark of SemanticSearch.index_specs with a local stub embedding function.
+
+Run with: python -m api_template.utils.tests.bench_semantic_search
+"""
+
+import statistics
+import tempfile
+import time
+
+from api_template.utils.semantic_search import SemanticSearch
+
+NUM_SPECS = 1000
+VECTOR_SIZE = 1536
+REQUEST_LATENCY = 0.05  # Simulated round-trip of the embeddings API, in seconds
+PER_TEXT_LATENCY = 0.0005
+
+
+def stub_embedding_fn(texts):
+    time.sleep(REQUEST_LATENCY + PER_TEXT_LATENCY * len(texts))
+    return [[0.1] * VECTOR_SIZE for _ in texts]
+
+
+def run(label, **kwargs):
+    specs = {
+        f"op_{i}": f"Operation {i} returns the details of resource {i}" for i in range(NUM_SPECS)
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        search = SemanticSearch(
+            cache_path=tmp_dir,
+            collection_name="bench",
+            vector_size=VECTOR_SIZE,
+            embedding_fn=stub_embedding_fn,
+            **kwargs,
+        )
+        start = time.perf_counter()
+        search.index_specs(specs)
+        elapsed = time.perf_counter() - start
+
+    latencies = sorted(search.batch_latencies)
+    print(
+        f"{label:<28} total={elapsed:7.2f}s batches={len(latencies):5d} "
+        f"batch p50={statistics.median(latencies) * 1000:7.1f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:7.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    run("serial, one text per call", batch_size=1, max_concurrency=1)
+    run("batched (100), 1 worker", batch_size=100, max_concurrency=1)
+    run("batched (100), 4 workers", batch_size=100, max_concurrency=4)
+    run("batched (50), 8 workers", batch_size=50, max_concurrency=8)
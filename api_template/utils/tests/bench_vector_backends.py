@@ -0,0 +1,81 @@
+"""
+Benchmark of the vector backends: recall@k, query latency and RSS at several catalog sizes.
+Each measurement runs in a fresh process so RSS figures are not polluted by earlier runs.
+
+Run with: python -m api_template.utils.tests.bench_vector_backends [dimension]
+"""
+
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import psutil
+
+from api_template.utils.vector_backends import NumpyBackend, QdrantBackend
+
+SIZES = [1_000, 10_000, 100_000]
+NUM_QUERIES = 100
+TOP_K = 5
+UPSERT_CHUNK = 1_000
+
+
+def measure(backend_name, size, dimension, results):
+    process = psutil.Process(os.getpid())
+    rss_before = process.memory_info().rss
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(size, dimension)).astype(np.float32)
+    queries = rng.normal(size=(NUM_QUERIES, dimension)).astype(np.float32)
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    truth = np.argsort(-(queries @ normalized.T), axis=1)[:, :TOP_K]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        start = time.perf_counter()
+        if backend_name == "qdrant":
+            backend = QdrantBackend(os.path.join(tmp_dir, "qdrant"), "bench", dimension)
+        else:
+            backend = NumpyBackend(dimension)
+        for offset in range(0, size, UPSERT_CHUNK):
+            chunk = vectors[offset : offset + UPSERT_CHUNK]
+            backend.upsert(range(offset, offset + len(chunk)), chunk, [{}] * len(chunk))
+        build = time.perf_counter() - start
+        del vectors, normalized  # Only the backend's copy counts towards RSS
+
+        latencies, found = [], []
+        for query in queries:
+            start = time.perf_counter()
+            hits = backend.search(query, limit=TOP_K)
+            latencies.append(time.perf_counter() - start)
+            found.append([hit.id for hit in hits])
+
+        start = time.perf_counter()
+        backend.search_batch(queries, limit=TOP_K)
+        batch = time.perf_counter() - start
+
+        rss = process.memory_info().rss - rss_before
+
+    recall = np.mean([len(set(f) & set(t)) / TOP_K for f, t in zip(found, truth.tolist())])
+    latencies.sort()
+    results.put(
+        f"{backend_name:<7} n={size:>7} build={build:8.2f}s recall@{TOP_K}={recall:.3f} "
+        f"p50={statistics.median(latencies) * 1000:8.2f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1] * 1000:8.2f}ms "
+        f"batch({NUM_QUERIES})={batch * 1000:8.1f}ms rss=+{rss / 2**20:7.1f}MiB"
+    )
+
+
+if __name__ == "__main__":
+    dimension = int(sys.argv[1]) if len(sys.argv) > 1 else 384
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    print(f"dimension={dimension}")
+    for size in SIZES:
+        for backend_name in ("numpy", "qdrant"):
+            process = context.Process(target=measure, args=(backend_name, size, dimension, results))
+            process.start()
+            process.join()
+            print(results.get() if process.exitcode == 0 else f"{backend_name} n={size} failed")
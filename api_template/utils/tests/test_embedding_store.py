@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from api_template.utils.embedding_store import EmbeddingStore
+
+MODEL = "text-embedding-3-small"
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EmbeddingStore(str(tmp_path), dimension=4)
+
+
+def test_put_and_get(store):
+    store.put_many(MODEL, ["a", "b"], [[1, 2, 3, 4], [5, 6, 7, 8]])
+
+    assert store.get(MODEL, "b").tolist() == [5, 6, 7, 8]
+    assert store.get(MODEL, "c") is None
+    assert store.get("other-model", "a") is None
+    assert len(store) == 2
+
+
+def test_vectors_persist_across_reopen(store, tmp_path):
+    store.put_many(MODEL, ["a"], [[1, 2, 3, 4]])
+
+    reopened = EmbeddingStore(str(tmp_path), dimension=4)
+
+    assert reopened.get(MODEL, "a").dtype == np.float32
+    assert reopened.get(MODEL, "a").tolist() == [1, 2, 3, 4]
+
+
+def test_put_many_appends_only_new_vectors(store):
+    store.put_many(MODEL, ["a", "b"], [[1, 1, 1, 1], [2, 2, 2, 2]])
+    size = os.path.getsize(store.vectors_path)
+
+    appended = store.put_many(MODEL, ["a", "c", "c"], [[9, 9, 9, 9], [3, 3, 3, 3], [4, 4, 4, 4]])
+
+    assert appended == 1
+    assert os.path.getsize(store.vectors_path) == size + 4 * 4
+    assert store.get(MODEL, "a").tolist() == [1, 1, 1, 1]
+    assert store.get(MODEL, "c").tolist() == [3, 3, 3, 3]
+
+
+def test_missing_returns_distinct_unknown_texts(store):
+    store.put_many(MODEL, ["a"], [[1, 1, 1, 1]])
+
+    assert store.missing(MODEL, ["a", "b", "b", "c"]) == ["b", "c"]
+
+
+def test_truncated_vectors_file_is_recovered(store, tmp_path):
+    store.put_many(MODEL, ["a", "b"], [[1, 1, 1, 1], [2, 2, 2, 2]])
+    os.truncate(store.vectors_path, 4 * 4 + 3)
+
+    reopened = EmbeddingStore(str(tmp_path), dimension=4)
+    reopened.put_many(MODEL, ["c"], [[3, 3, 3, 3]])
+
+    assert reopened.get(MODEL, "b") is None
+    assert reopened.get(MODEL, "c").tolist() == [3, 3, 3, 3]
+
+
+def test_dimension_mismatch_is_rejected(store, tmp_path):
+    with pytest.raises(ValueError):
+        EmbeddingStore(str(tmp_path), dimension=8)
+    with pytest.raises(ValueError):
+        store.put_many(MODEL, ["a"], [[1, 2]])
+
+
+def test_digests_ending_with_nul_bytes_are_found(store, tmp_path):
+    # "S" arrays strip trailing NUL bytes, the store must not confuse or lose these digests
+    texts = [f"text {i}" for i in range(4096)]
+    text = next(text for text in texts if EmbeddingStore.key(MODEL, text).endswith(b"\0"))
+    store.put_many(MODEL, ["a", text], [[1, 1, 1, 1], [2, 2, 2, 2]])
+    assert store.get(MODEL, text).tolist() == [2, 2, 2, 2]
+
+    reopened = EmbeddingStore(str(tmp_path), dimension=4)
+    assert reopened.get(MODEL, text).tolist() == [2, 2, 2, 2]
+    assert reopened.get(MODEL, "a").tolist() == [1, 1, 1, 1]
+
+
+def test_lookups_sort_the_index_once_then_use_recent_rows(store, tmp_path):
+    store.put_many(MODEL, ["a", "b"], [[1, 1, 1, 1], [2, 2, 2, 2]])
+    store = EmbeddingStore(str(tmp_path), dimension=4)
+    assert store._sorted is None
+
+    assert store.get(MODEL, "a").tolist() == [1, 1, 1, 1]
+    sorted_digests = store._sorted
+
+    store.put_many(MODEL, ["c"], [[3, 3, 3, 3]])
+
+    assert store.get(MODEL, "c").tolist() == [3, 3, 3, 3]
+    assert store._sorted is sorted_digests
+    assert len(store._recent) == 1
+
+
+def test_rows_appended_by_another_store_are_seen(store, tmp_path):
+    other = EmbeddingStore(str(tmp_path), dimension=4)
+    store.put_many(MODEL, ["a"], [[1, 1, 1, 1]])
+    other.put_many(MODEL, ["b"], [[2, 2, 2, 2]])
+
+    # Stale row numbers would misalign the files: "a" must not be appended again
+    assert other.put_many(MODEL, ["a", "c"], [[9, 9, 9, 9], [3, 3, 3, 3]]) == 1
+    assert store.missing(MODEL, ["a", "b", "c", "d"]) == ["d"]
+    assert store.get(MODEL, "c").tolist() == [3, 3, 3, 3]
+    assert len(EmbeddingStore(str(tmp_path), dimension=4)) == 3
+
+
+def _put_from_process(directory, worker):
+    store = EmbeddingStore(directory, dimension=4)
+    for batch in range(20):
+        texts = [f"{worker}-{batch}-{i}" for i in range(10)]
+        store.put_many(MODEL, texts, [[worker, batch, i, 0] for i in range(10)])
+
+
+def test_concurrent_appends_from_processes_stay_aligned(tmp_path):
+    EmbeddingStore(str(tmp_path), dimension=4)
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=_put_from_process, args=(str(tmp_path), worker))
+        for worker in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    store = EmbeddingStore(str(tmp_path), dimension=4)
+    assert len(store) == 4 * 20 * 10
+    for worker in range(4):
+        for batch in range(20):
+            for i in range(10):
+                assert store.get(MODEL, f"{worker}-{batch}-{i}").tolist() == [worker, batch, i, 0]
@@ -0,0 +1,30 @@
+from api_template.utils.index_manifest import IndexManifest, content_hash, point_id_for
+
+
+def test_diff_reports_changed_and_removed_keys(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.json"))
+    manifest.update({"a": "alpha", "b": "beta"})
+
+    changed, removed = manifest.diff({"a": "alpha", "b": "beta v2", "c": "gamma"})
+
+    assert changed == ["b", "c"]
+    assert removed == []
+    assert manifest.diff({"a": "alpha"}) == ([], ["b"])
+
+
+def test_manifest_round_trip(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = IndexManifest(path)
+    manifest.update({"a": "alpha"}, {"a": content_hash({"summary": "alpha"})})
+    manifest.save()
+
+    reloaded = IndexManifest(path)
+
+    assert reloaded.exists
+    assert reloaded.description_for("a", content_hash({"summary": "alpha"})) == "alpha"
+    assert reloaded.description_for("a", content_hash({"summary": "changed"})) is None
+    assert reloaded.entries["a"]["point_id"] == point_id_for("a")
+
+
+def test_content_hash_ignores_key_order():
+    assert content_hash({"a": 1, "b": [1, 2]}) == content_hash({"b": [1, 2], "a": 1})
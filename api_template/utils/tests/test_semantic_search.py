@@ -0,0 +1,207 @@
+import threading
+
+import pytest
+
+from api_template.utils.semantic_search import SemanticSearch
+
+VECTOR_SIZE = 8
+
+
+class StubEmbeddings:
+    """
+    Local stand-in for the embeddings API: deterministic vectors, records every batch.
+    """
+
+    def __init__(self, fail_texts=None):
+        self.calls = []
+        self.fail_texts = set(fail_texts or [])
+        self._lock = threading.Lock()
+
+    def __call__(self, texts):
+        with self._lock:
+            self.calls.append(list(texts))
+            failing = self.fail_texts & set(texts)
+            self.fail_texts -= failing
+        if failing:
+            raise ConnectionError("stub failure")
+        return [self.vector(text) for text in texts]
+
+    @staticmethod
+    def vector(text):
+        return [float((hash(text) >> shift) % 7 + 1) for shift in range(VECTOR_SIZE)]
+
+
+@pytest.fixture(params=["qdrant", "numpy"])
+def make_search(request, tmp_path):
+    def _make(embedding_fn, **kwargs):
+        return SemanticSearch(
+            cache_path=str(tmp_path),
+            collection_name="test_embeddings",
+            vector_size=VECTOR_SIZE,
+            embedding_fn=embedding_fn,
+            retry_backoff=0,
+            backend=request.param,
+            **kwargs,
+        )
+
+    return _make
+
+
+def test_make_batches_respects_size_and_token_bounds(make_search):
+    search = make_search(StubEmbeddings(), batch_size=3, max_batch_tokens=10)
+    texts = ["a" * 4, "b" * 4, "c" * 4, "d" * 4, "e" * 40, "f"]
+
+    batches = search._make_batches(texts)
+
+    assert [i for batch in batches for i in batch] == list(range(len(texts)))
+    assert all(len(batch) <= 3 for batch in batches)
+    assert [4] in batches  # an oversized text goes alone in its own batch
+
+
+def test_index_specs_embeds_in_batches(make_search):
+    stub = StubEmbeddings()
+    search = make_search(stub, batch_size=10, max_concurrency=3)
+    specs = {f"op_{i}": f"description {i}" for i in range(35)}
+
+    search.index_specs(specs)
+
+    assert len(stub.calls) == 4
+    assert sorted(t for call in stub.calls for t in call) == sorted(specs.values())
+    stored = search.embedding_store.get(search.embedding_model, "description 7")
+    assert stored.tolist() == StubEmbeddings.vector("description 7")
+    assert search.backend.count() == 35
+
+
+def test_index_specs_skips_cached_descriptions(make_search):
+    stub = StubEmbeddings()
+    search = make_search(stub, batch_size=10)
+    search.index_specs({"op_1": "first"})
+
+    search.index_specs({"op_1": "first", "op_2": "second"})
+
+    assert stub.calls == [["first"], ["second"]]
+
+
+def test_index_specs_reembeds_edited_description(make_search):
+    stub = StubEmbeddings()
+    search = make_search(stub)
+    search.index_specs({"op_1": "old description"})
+
+    search.index_specs({"op_1": "new description"})
+
+    assert stub.calls == [["old description"], ["new description"]]
+
+
+def test_embed_texts_retries_only_failed_batches(make_search):
+    stub = StubEmbeddings(fail_texts=["text 5"])
+    search = make_search(stub, batch_size=4, max_concurrency=2)
+    texts = [f"text {i}" for i in range(12)]
+
+    embeddings = search.embed_texts(texts)
+
+    assert embeddings == [StubEmbeddings.vector(t) for t in texts]
+    assert len(stub.calls) == 4
+    assert stub.calls.count(["text 4", "text 5", "text 6", "text 7"]) == 2
+
+
+def test_embed_texts_gives_up_after_max_retries(make_search):
+    def always_fail(texts):
+        raise ConnectionError("down")
+
+    search = make_search(always_fail, max_retries=2)
+
+    with pytest.raises(RuntimeError):
+        search.embed_texts(["a", "b"])
+
+
+def test_search_caches_query_embeddings_and_results(make_search):
+    stub = StubEmbeddings()
+    search = make_search(stub)
+    search.index_specs({"op_1": "list users", "op_2": "create user"})
+    stub.calls.clear()
+
+    first = search.search("list users", score_threshold=0.0)
+    second = search.search("list users", score_threshold=0.0)
+
+    assert stub.calls == [["list users"]]
+    assert second is first
+    info = search.cache_info()
+    assert info["embedding_hits"] == 1 and info["embedding_misses"] == 1
+    assert info["result_hits"] == 1 and info["result_misses"] == 1
+
+
+def test_search_results_are_keyed_by_limit_and_threshold(make_search):
+    stub = StubEmbeddings()
+    search = make_search(stub)
+    search.index_specs({"op_1": "list users", "op_2": "create user"})
+
+    search.search("list users", limit=1, score_threshold=0.0)
+    search.search("list users", limit=2, score_threshold=0.0)
+
+    assert search.cache_info()["result_misses"] == 2
+    assert search.cache_info()["embedding_hits"] == 1
+
+
+def test_index_specs_invalidates_cached_results(make_search):
+    stub = StubEmbeddings()
+    search = make_search(stub)
+    search.index_specs({"op_1": "list users"})
+    before = search.search("list users", score_threshold=0.0)
+
+    search.index_specs({"op_1": "list users", "op_2": "list users again"})
+    after = search.search("list users", score_threshold=0.0)
+
+    assert len(before) == 1 and len(after) == 2
+    assert search.cache_info()["result_hits"] == 0
+    assert search.cache_info()["embedding_hits"] == 1
+
+
+def test_search_batch_embeds_missing_queries_once(make_search):
+    stub = StubEmbeddings()
+    search = make_search(stub)
+    search.index_specs({"op_1": "list users", "op_2": "create user"})
+    search.search("list users", score_threshold=0.0)
+    stub.calls.clear()
+
+    results = search.search_batch(["list users", "create user"], limit=1, score_threshold=0.0)
+
+    assert stub.calls == [["create user"]]
+    assert [hits[0].payload["path"] for hits in results] == ["op_1", "op_2"]
+
+
+def test_restart_with_unchanged_specs_does_no_work(make_search):
+    specs = {f"op_{i}": f"description {i}" for i in range(5)}
+    stub = StubEmbeddings()
+    search = make_search(stub)
+    search.index_specs(specs)
+    if hasattr(search.backend, "client"):
+        search.backend.client.close()
+
+    restarted = make_search(stub)
+    stub.calls.clear()
+    version = restarted.collection_version
+    restarted.index_specs(specs)
+
+    assert stub.calls == []
+    assert restarted.backend.count() == 5
+    if restarted.backend.persistent:
+        assert restarted.collection_version == version
+
+
+def test_index_specs_applies_only_the_diff(make_search):
+    stub = StubEmbeddings()
+    search = make_search(stub)
+    search.index_specs({"op_1": "one", "op_2": "two", "op_3": "three"})
+    ids_before = {
+        hit.payload["path"]: hit.id for hit in search.search("one", limit=3, score_threshold=-1)
+    }
+    stub.calls.clear()
+
+    search.index_specs({"op_3": "three", "op_1": "one (edited)", "op_4": "four"})
+
+    assert sorted(t for call in stub.calls for t in call) == ["four", "one (edited)"]
+    hits = {
+        hit.payload["path"]: hit.id for hit in search.search("four", limit=5, score_threshold=-1)
+    }
+    assert set(hits) == {"op_1", "op_3", "op_4"}
+    assert hits["op_1"] == ids_before["op_1"] and hits["op_3"] == ids_before["op_3"]
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from api_template.utils.vector_backends import NumpyBackend, QdrantBackend
+
+VECTOR_SIZE = 16
+
+
+@pytest.fixture(params=["qdrant", "numpy"])
+def backend(request, tmp_path):
+    if request.param == "qdrant":
+        return QdrantBackend(str(tmp_path / "qdrant"), "test", VECTOR_SIZE)
+    return NumpyBackend(VECTOR_SIZE, initial_capacity=2)
+
+
+@pytest.fixture
+def vectors():
+    return np.random.default_rng(42).normal(size=(50, VECTOR_SIZE)).astype(np.float32)
+
+
+def exact_top_k(vectors, query, k):
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normalized @ (query / np.linalg.norm(query))
+    return np.argsort(-scores)[:k].tolist()
+
+
+def test_search_returns_exact_top_k(backend, vectors):
+    backend.upsert(list(range(50)), vectors, [{"row": i} for i in range(50)])
+
+    hits = backend.search(vectors[7], limit=5)
+
+    assert [hit.id for hit in hits] == exact_top_k(vectors, vectors[7], 5)
+    assert hits[0].payload == {"row": 7}
+    assert hits[0].score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_search_batch_matches_single_searches(backend, vectors):
+    backend.upsert(list(range(50)), vectors, [{} for _ in range(50)])
+
+    batch = backend.search_batch(vectors[:3], limit=4)
+
+    assert [[hit.id for hit in hits] for hits in batch] == [
+        exact_top_k(vectors, query, 4) for query in vectors[:3]
+    ]
+
+
+def test_score_threshold_filters_hits(backend, vectors):
+    backend.upsert(list(range(50)), vectors, [{} for _ in range(50)])
+
+    hits = backend.search(vectors[0], limit=10, score_threshold=0.99)
+
+    assert [hit.id for hit in hits] == [0]
+
+
+def test_upsert_overwrites_and_delete_removes(backend, vectors):
+    backend.upsert([1, 2, 3], vectors[:3], [{"v": 1}, {"v": 2}, {"v": 3}])
+    backend.upsert([1], vectors[10:11], [{"v": 10}])
+    backend.delete([2])
+
+    assert backend.count() == 2
+    assert backend.search(vectors[10], limit=1)[0].payload == {"v": 10}
+    assert backend.search(vectors[2], limit=1)[0].id != 2
+    assert backend.search(vectors[2], limit=1)[0].payload is not None
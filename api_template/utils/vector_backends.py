@@ -0,0 +1,220 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointIdsList, PointStruct, SearchRequest, VectorParams
+
+logger = logging.getLogger(__name__)
+
+
+class SearchHit(NamedTuple):
+    id: Any
+    score: float
+    payload: Optional[Dict[str, Any]]
+
+
+class VectorBackend(ABC):
+    # Whether points survive a restart of the process
+    persistent = False
+
+    @abstractmethod
+    def upsert(self, ids: Sequence, vectors, payloads: Sequence[dict]):
+        pass
+
+    @abstractmethod
+    def delete(self, ids: Sequence):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    @abstractmethod
+    def count(self) -> int:
+        pass
+
+    @abstractmethod
+    def search(
+        self, query_vector, limit: int = 5, score_threshold: float = None
+    ) -> List[SearchHit]:
+        pass
+
+    @abstractmethod
+    def search_batch(
+        self, query_vectors, limit: int = 5, score_threshold: float = None
+    ) -> List[List[SearchHit]]:
+        pass
+
+
+class QdrantBackend(VectorBackend):
+    """
+    Vector backend on an embedded Qdrant collection, persisted at `path`.
+    """
+
+    persistent = True
+
+    def __init__(self, path: str, collection_name: str, vector_size: int):
+        self.client = QdrantClient(path=path)
+        self.collection_name = collection_name
+        self.vector_size = vector_size
+
+        logger.info("Initializing Qdrant...")
+        if not self.client.collection_exists(collection_name):
+            self._create_collection()
+
+    def _create_collection(self):
+        logger.info("Creating collection...")
+        self.client.create_collection(
+            self.collection_name,
+            vectors_config=VectorParams(size=self.vector_size, distance=Distance.COSINE),
+        )
+
+    @staticmethod
+    def _to_hits(points) -> List[SearchHit]:
+        return [SearchHit(point.id, point.score, point.payload) for point in points]
+
+    def upsert(self, ids, vectors, payloads):
+        points = [
+            PointStruct(id=point_id, vector=np.asarray(vector).tolist(), payload=payload)
+            for point_id, vector, payload in zip(ids, vectors, payloads)
+        ]
+        if points:
+            self.client.upsert(self.collection_name, points)
+
+    def delete(self, ids):
+        if ids:
+            self.client.delete(self.collection_name, points_selector=PointIdsList(points=list(ids)))
+
+    def clear(self):
+        if self.count():
+            self.client.delete_collection(self.collection_name)
+            self._create_collection()
+
+    def count(self) -> int:
+        return self.client.count(self.collection_name).count
+
+    def search(self, query_vector, limit=5, score_threshold=None):
+        return self._to_hits(
+            self.client.search(
+                collection_name=self.collection_name,
+                query_vector=np.asarray(query_vector).tolist(),
+                limit=limit,
+                score_threshold=score_threshold,
+            )
+        )
+
+    def search_batch(self, query_vectors, limit=5, score_threshold=None):
+        requests = [
+            SearchRequest(
+                vector=np.asarray(vector).tolist(),
+                limit=limit,
+                score_threshold=score_threshold,
+                with_payload=True,
+            )
+            for vector in query_vectors
+        ]
+        results = self.client.search_batch(collection_name=self.collection_name, requests=requests)
+        return [self._to_hits(points) for points in results]
+
+
+class NumpyBackend(VectorBackend):
+    """
+    In-process exact cosine search over a normalized float32 matrix.
+
+    Meant for catalogs of up to tens of thousands of vectors, where one matrix product is
+    cheaper than running an index. Nothing is persisted: the owner re-upserts on startup.
+    """
+
+    def __init__(self, vector_size: int, initial_capacity: int = 1024):
+        self.vector_size = vector_size
+        self._matrix = np.zeros((initial_capacity, vector_size), dtype=np.float32)
+        self._ids = []
+        self._payloads = []
+        self._rows = {}
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _reserve(self, size: int):
+        capacity = self._matrix.shape[0]
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        matrix = np.zeros((capacity, self.vector_size), dtype=np.float32)
+        matrix[: len(self._ids)] = self._matrix[: len(self._ids)]
+        self._matrix = matrix
+
+    def upsert(self, ids, vectors, payloads):
+        vectors = self._normalize(
+            np.asarray(vectors, dtype=np.float32).reshape(-1, self.vector_size)
+        )
+        self._reserve(len(self._ids) + len(ids))
+        for point_id, vector, payload in zip(ids, vectors, payloads):
+            row = self._rows.get(point_id)
+            if row is None:
+                row = len(self._ids)
+                self._rows[point_id] = row
+                self._ids.append(point_id)
+                self._payloads.append(payload)
+            else:
+                self._payloads[row] = payload
+            self._matrix[row] = vector
+
+    def delete(self, ids):
+        for point_id in ids:
+            row = self._rows.pop(point_id, None)
+            if row is None:
+                continue
+            # Move the last row into the hole so the matrix stays dense.
+            last = len(self._ids) - 1
+            if row != last:
+                self._matrix[row] = self._matrix[last]
+                self._ids[row] = self._ids[last]
+                self._payloads[row] = self._payloads[last]
+                self._rows[self._ids[row]] = row
+            self._ids.pop()
+            self._payloads.pop()
+
+    def clear(self):
+        self._ids, self._payloads, self._rows = [], [], {}
+
+    def count(self) -> int:
+        return len(self._ids)
+
+    def search(self, query_vector, limit=5, score_threshold=None):
+        return self.search_batch([query_vector], limit=limit, score_threshold=score_threshold)[0]
+
+    def search_batch(self, query_vectors, limit=5, score_threshold=None):
+        queries = self._normalize(
+            np.asarray(query_vectors, dtype=np.float32).reshape(-1, self.vector_size)
+        )
+        size = len(self._ids)
+        if size == 0 or limit <= 0:
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ self._matrix[:size].T
+        k = min(limit, size)
+        if k < size:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.broadcast_to(np.arange(size), (len(queries), size))
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        results = []
+        for rows, row_scores in zip(top, top_scores):
+            hits = []
+            for row, score in zip(rows.tolist(), row_scores.tolist()):
+                if score_threshold is not None and score < score_threshold:
+                    break
+                hits.append(SearchHit(self._ids[row], score, self._payloads[row]))
+            results.append(hits)
+        return results